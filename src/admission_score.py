@@ -0,0 +1,164 @@
+"""
+Module Tính Điểm Xét tuyển
+Điểm xét tuyển của mọi cặp (thí sinh, ngành) bằng phép toán mảng theo từng khối thí sinh:
+tổng điểm tổ hợp có hệ số (quy về thang 30) cộng điểm ưu tiên khu vực/đối tượng,
+điểm ưu tiên giảm dần khi tổng điểm đạt từ 22.5 trở lên
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Mức điểm ưu tiên theo quy chế tuyển sinh (thang 30), thứ tự là mã lưu trong kho điểm
+KHU_VUC = {'KV3': 0.0, 'KV2': 0.25, 'KV2-NT': 0.5, 'KV1': 0.75}
+DOI_TUONG = {'': 0.0, 'UT2': 1.0, 'UT1': 2.0}
+
+THANG_DIEM = 30.0
+NGUONG_GIAM_UU_TIEN = 22.5
+
+
+def priority_codes(values, levels):
+    """Chuyển cột khu vực/đối tượng (chuỗi) thành mã uint8 theo thứ tự của levels"""
+    values = pd.Series(values).fillna('').astype(str)
+    unknown = set(values.unique()) - set(levels)
+    if unknown:
+        raise ValueError(f"Mức ưu tiên không hợp lệ: {sorted(unknown)} (chọn {list(levels)})")
+    return pd.Categorical(values, categories=list(levels)).codes.astype(np.uint8)
+
+
+def priority_points(khu_vuc=None, doi_tuong=None, n=None):
+    """Tổng mức điểm ưu tiên (khu vực + đối tượng) của từng thí sinh từ mã uint8"""
+    points = np.zeros(n if n is not None else len(khu_vuc if khu_vuc is not None else doi_tuong))
+    if khu_vuc is not None:
+        points += np.array(list(KHU_VUC.values()))[np.asarray(khu_vuc)]
+    if doi_tuong is not None:
+        points += np.array(list(DOI_TUONG.values()))[np.asarray(doi_tuong)]
+    return points
+
+
+def tapered_priority(diem, points):
+    """
+    Điểm ưu tiên thực hưởng: giữ nguyên khi tổng điểm < 22.5,
+    từ 22.5 trở lên = (30 - tổng điểm) / 7.5 x mức điểm ưu tiên
+    diem (N, P) thang 30, points (N,) -> (N, P)
+    """
+    points = np.asarray(points)[:, None]
+    scale = (THANG_DIEM - diem) / (THANG_DIEM - NGUONG_GIAM_UU_TIEN)
+    return np.where(diem >= NGUONG_GIAM_UU_TIEN, np.clip(scale, 0, None) * points, points)
+
+
+class AdmissionScorer:
+    """
+    Bộ tính điểm xét tuyển cho một danh sách ngành
+    programs: DataFrame có cột ma_to_hop và (tùy chọn) mon_he_so_2 - môn nhân hệ số 2
+    combos: dict mã tổ hợp -> [môn viết tắt]; subjects: thứ tự cột môn của ma trận điểm
+    """
+
+    def __init__(self, programs, combos, subjects):
+        self.programs = programs.reset_index(drop=True)
+        self.subjects = list(subjects)
+        sub_idx = {mon: i for i, mon in enumerate(self.subjects)}
+
+        # Ma trận hệ số (ngành x môn); ngành có tổ hợp thiếu môn trong dữ liệu bị bỏ qua
+        self.weights = np.zeros((len(self.programs), len(self.subjects)))
+        doubled = self.programs.get('mon_he_so_2', pd.Series('', index=self.programs.index)).fillna('')
+        for p, (code, double) in enumerate(zip(self.programs['ma_to_hop'], doubled)):
+            mons = combos.get(code, [])
+            if not mons or any(mon not in sub_idx for mon in mons):
+                continue
+            for mon in mons:
+                self.weights[p, sub_idx[mon]] = 2.0 if mon == double else 1.0
+
+        self.required = self.weights > 0
+        self.n_required = self.required.sum(axis=1)
+        self.valid = self.n_required > 0
+        # Quy tổng có hệ số về thang 30: nhân THANG_DIEM / (10 x tổng hệ số)
+        with np.errstate(divide='ignore'):
+            self.to_30 = np.where(self.valid, THANG_DIEM / (10 * self.weights.sum(axis=1)), np.nan)
+
+        skipped = int((~self.valid).sum())
+        if skipped:
+            logger.warning(f"Bỏ qua {skipped} ngành có tổ hợp không đủ môn trong dữ liệu điểm")
+
+    def score(self, scores, points=None):
+        """
+        Điểm xét tuyển (N, P) cho một khối điểm (N, môn), NaN khi thí sinh thiếu môn của tổ hợp
+        points: mức điểm ưu tiên của từng thí sinh (N,), xem priority_points
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        present = ~np.isnan(scores)
+
+        diem = (np.where(present, scores, 0.0) @ self.weights.T) * self.to_30
+        complete = (present.astype(np.float64) @ self.required.T) == self.n_required
+        diem = np.where(complete & self.valid, diem, np.nan)
+
+        if points is not None:
+            diem = diem + tapered_priority(diem, points)
+        return np.round(diem, 2)
+
+    def chunk_size(self, memory_budget_mb=64):
+        """Số thí sinh mỗi khối để vài mảng (thí sinh x ngành) nằm trong ngân sách bộ nhớ"""
+        per_row = 8 * (len(self.programs) * 4 + len(self.subjects) * 2)
+        return max(1, int(memory_budget_mb * 1024 * 1024 // per_row))
+
+    def iter_scores(self, score_year, use_priority=True, memory_budget_mb=64):
+        """
+        Duyệt điểm xét tuyển của cả năm theo khối: trả về (start, stop, điểm khối (n, P))
+        Điểm ưu tiên lấy từ kho điểm nếu có cột khu vực/đối tượng
+        """
+        chunk = self.chunk_size(memory_budget_mb)
+        priority = score_year.uu_tien if use_priority else {}
+        columns = [score_year.scores.get(mon) for mon in self.subjects]
+
+        for start in range(0, len(score_year), chunk):
+            stop = min(start + chunk, len(score_year))
+            block = np.full((stop - start, len(self.subjects)), np.nan)
+            for i, column in enumerate(columns):
+                if column is not None:
+                    block[:, i] = column[start:stop]
+
+            points = None
+            if priority:
+                points = priority_points(
+                    priority['khu_vuc'][start:stop] if 'khu_vuc' in priority else None,
+                    priority['doi_tuong'][start:stop] if 'doi_tuong' in priority else None,
+                    n=stop - start
+                )
+            yield start, stop, self.score(block, points)
+
+    def count_reaching(self, score_year, cutoffs, use_priority=True, memory_budget_mb=64):
+        """
+        Số thí sinh có điểm xét tuyển >= điểm chuẩn cho từng ngành (P,), cùng số thí sinh
+        đủ môn tổ hợp; cộng dồn qua các khối nên không giữ ma trận đầy đủ trong bộ nhớ
+        """
+        cutoffs = np.asarray(cutoffs, dtype=np.float64)
+        reaching = np.zeros(len(self.programs), dtype=np.int64)
+        eligible = np.zeros(len(self.programs), dtype=np.int64)
+
+        for _, _, diem in self.iter_scores(score_year, use_priority, memory_budget_mb):
+            eligible += (~np.isnan(diem)).sum(axis=0)
+            with np.errstate(invalid='ignore'):
+                reaching += (diem >= cutoffs - 1e-9).sum(axis=0)
+
+        return reaching, eligible
+
+
+def admission_reach(score_year, programs, combos, use_priority=True, memory_budget_mb=64):
+    """
+    Bảng số thí sinh toàn quốc đạt điểm chuẩn từng ngành trong năm của score_year
+    programs: các dòng diem_chuan cùng năm (cần ma_to_hop, diem_chuan, chi_tieu)
+    """
+    scorer = AdmissionScorer(programs, combos, score_year.subjects)
+    reaching, eligible = scorer.count_reaching(
+        score_year, scorer.programs['diem_chuan'].to_numpy(), use_priority, memory_budget_mb)
+
+    result = scorer.programs.copy()
+    result['so_thi_sinh_du_mon'] = eligible
+    result['so_thi_sinh_dat'] = reaching
+    result['ty_le_dat'] = np.where(eligible > 0, reaching / np.maximum(eligible, 1), np.nan)
+    if 'chi_tieu' in result:
+        result['so_thi_sinh_dat_moi_chi_tieu'] = reaching / result['chi_tieu'].replace(0, np.nan)
+    return result
@@ -0,0 +1,200 @@
+"""
+Module Ghi nhận Thay đổi Dữ liệu (Change Data Capture)
+Băm từng dòng theo các cột nghiệp vụ (bỏ ngay_cap_nhat) bằng pd.util.hash_pandas_object,
+so với hash đã lưu trong một lượt vectorized để tìm dòng thêm/sửa/xóa; chỉ các dòng
+thay đổi được ghi vào change_log, dòng không đổi giữ nguyên ngày cập nhật cũ.
+Hash và change_log chỉ được ghi (record_changes) sau khi bảng đã ghi thành công
+"""
+
+import json
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bảng -> cột khóa nghiệp vụ (bảng không khai báo dùng mọi cột nghiệp vụ làm khóa)
+BUSINESS_KEYS = {
+    'to_hop_mon': ('ma_to_hop',),
+    'diem_chuan': ('nam', 'truong', 'nganh', 'ma_to_hop'),
+    'pho_diem': ('nam', 'ma_to_hop'),
+    'pho_diem_chi_tiet': ('nam', 'ma_to_hop', 'tong_diem'),
+}
+
+# Cột kỹ thuật không tính vào nội dung dòng
+IGNORED_COLUMNS = ('ngay_cap_nhat',)
+
+HASH_TABLE = 'row_hashes'
+LOG_TABLE = 'change_log'
+RUN_TABLE = 'change_runs'
+
+
+def _normalize(frame):
+    """Đưa về kiểu ổn định để cùng giá trị luôn cho cùng hash (số -> float64, còn lại -> chuỗi)"""
+    normalized = {}
+    for col in frame.columns:
+        series = frame[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            normalized[col] = series.astype(np.float64)
+        else:
+            normalized[col] = series.astype(object).where(series.notna(), None).astype(str)
+    return pd.DataFrame(normalized, index=frame.index)
+
+
+def _hash(frame):
+    """Hash uint64 của từng dòng, lưu trong SQLite dưới dạng int64"""
+    if frame.columns.empty:
+        return np.zeros(len(frame), dtype=np.int64)
+    return pd.util.hash_pandas_object(_normalize(frame), index=False).to_numpy().view(np.int64)
+
+
+def row_hashes(df, table):
+    """
+    Trả về (khoa_hash, gia_tri_hash, cột khóa) cho mọi dòng
+    Khóa trùng nhau được phân biệt bằng thứ tự xuất hiện để mỗi dòng có một khóa riêng
+    """
+    business = [col for col in df.columns if col not in IGNORED_COLUMNS]
+    keys = [col for col in BUSINESS_KEYS.get(table, business) if col in df.columns] or business
+
+    key_frame = df[keys]
+    if key_frame.duplicated().any():
+        key_frame = key_frame.assign(_thu_tu=key_frame.groupby(keys, dropna=False).cumcount())
+    return _hash(key_frame), _hash(df[business]), keys
+
+
+def _table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')", (name,)
+    ).fetchone() is not None
+
+
+def _ensure_tables(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {HASH_TABLE} "
+                 "(bang TEXT, khoa_hash INTEGER, gia_tri_hash INTEGER, ngay_cap_nhat TEXT)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{HASH_TABLE}_bang ON {HASH_TABLE} (bang)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {RUN_TABLE} "
+                 "(lan_chay INTEGER PRIMARY KEY AUTOINCREMENT, bang TEXT, so_them INTEGER, "
+                 "so_sua INTEGER, so_xoa INTEGER, so_khong_doi INTEGER, thoi_gian TEXT)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {LOG_TABLE} "
+                 "(lan_chay INTEGER, bang TEXT, loai TEXT, khoa TEXT, khoa_hash INTEGER)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{LOG_TABLE}_lan_chay ON {LOG_TABLE} (lan_chay, bang)")
+
+
+def _key_json(frame):
+    """Giá trị khóa của từng dòng dạng JSON (chỉ gọi cho các dòng thay đổi)"""
+    records = frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+    return [json.dumps(record, ensure_ascii=False, default=str) for record in records]
+
+
+def capture_changes(conn, df, table):
+    """
+    So DataFrame sắp ghi với hash đã lưu của bảng (chỉ đọc, không ghi gì vào database)
+    Trả về (DataFrame với ngay_cap_nhat cũ cho dòng không đổi, số liệu, thay đổi chờ ghi);
+    gọi record_changes sau khi ghi bảng thành công, cùng giao dịch với lần commit đó.
+    Lần đầu (chưa có hash) mọi dòng được tính là thêm mới.
+    """
+    key_hash, value_hash, keys = row_hashes(df, table)
+
+    if _table_exists(conn, HASH_TABLE):
+        stored = pd.read_sql_query(
+            f"SELECT khoa_hash, gia_tri_hash, ngay_cap_nhat FROM {HASH_TABLE} WHERE bang = ?", conn, params=(table,))
+    else:
+        stored = pd.DataFrame({'khoa_hash': [], 'gia_tri_hash': [], 'ngay_cap_nhat': []})
+    old_keys = stored['khoa_hash'].to_numpy(dtype=np.int64)
+
+    # Vị trí khóa mới trong hash đã lưu (-1: dòng mới)
+    position = pd.Index(old_keys).get_indexer(key_hash) if len(old_keys) else np.full(len(df), -1)
+    found = position >= 0
+    inserted = ~found
+    updated = np.zeros(len(df), dtype=bool)
+    if found.any():
+        updated[found] = stored['gia_tri_hash'].to_numpy(dtype=np.int64)[position[found]] != value_hash[found]
+    unchanged = found & ~updated
+    deleted = ~np.isin(old_keys, key_hash)
+
+    # Dòng không đổi giữ ngày cập nhật lần trước
+    if 'ngay_cap_nhat' in df.columns and unchanged.any():
+        df = df.copy()
+        old_dates = stored['ngay_cap_nhat'].to_numpy(dtype=object)[position[unchanged]]
+        df.loc[unchanged, 'ngay_cap_nhat'] = np.where(pd.isna(old_dates), df.loc[unchanged, 'ngay_cap_nhat'], old_dates)
+
+    counts = {
+        'so_them': int(inserted.sum()),
+        'so_sua': int(updated.sum()),
+        'so_xoa': int(deleted.sum()),
+        'so_khong_doi': int(unchanged.sum())
+    }
+
+    log = []
+    for kind, mask in (('them', inserted), ('sua', updated)):
+        if mask.any():
+            log.extend(zip([kind] * int(mask.sum()), _key_json(df.loc[mask, keys]), key_hash[mask].tolist()))
+    if deleted.any():
+        # Giá trị khóa của dòng bị xóa lấy từ bảng cũ (chỉ đọc các cột khóa)
+        old_key_frame = pd.DataFrame()
+        if _table_exists(conn, table):
+            quoted = ', '.join(f'"{col}"' for col in keys)
+            old_key_frame = pd.read_sql_query(f'SELECT {quoted} FROM "{table}"', conn)
+        deleted_hashes = old_keys[deleted]
+        khoa = [None] * len(deleted_hashes)
+        if len(old_key_frame) and list(old_key_frame.columns) == keys:
+            old_hash, _, _ = row_hashes(old_key_frame, table)
+            match = pd.Index(old_hash).get_indexer(deleted_hashes)
+            values = _key_json(old_key_frame)
+            khoa = [values[i] if i >= 0 else None for i in match]
+        log.extend(zip(['xoa'] * len(khoa), khoa, deleted_hashes.tolist()))
+
+    dates = df['ngay_cap_nhat'].tolist() if 'ngay_cap_nhat' in df.columns else [None] * len(df)
+    pending = {
+        'bang': table,
+        'log': log,
+        'hashes': list(zip(key_hash.tolist(), value_hash.tolist(),
+                           [None if pd.isna(d) else str(d) for d in dates])),
+    }
+
+    logger.info(f"Thay đổi {table}: +{counts['so_them']} ~{counts['so_sua']} -{counts['so_xoa']} "
+                f"(không đổi {counts['so_khong_doi']})")
+    return df, counts, pending
+
+
+def record_changes(conn, counts, pending):
+    """
+    Ghi change_runs, change_log và thay hash đã lưu bằng trạng thái mới (không commit);
+    người gọi commit sau khi bảng đã ghi xong để hash không bao giờ đi trước dữ liệu.
+    Gán counts['lan_chay'] và trả về counts
+    """
+    _ensure_tables(conn)
+    table = pending['bang']
+    run = conn.execute(
+        f"INSERT INTO {RUN_TABLE} (bang, so_them, so_sua, so_xoa, so_khong_doi, thoi_gian) VALUES (?, ?, ?, ?, ?, ?)",
+        (table, counts['so_them'], counts['so_sua'], counts['so_xoa'], counts['so_khong_doi'],
+         datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    ).lastrowid
+
+    conn.executemany(f"INSERT INTO {LOG_TABLE} (lan_chay, bang, loai, khoa, khoa_hash) VALUES (?, ?, ?, ?, ?)",
+                     [(run, table, loai, khoa, khoa_hash) for loai, khoa, khoa_hash in pending['log']])
+
+    conn.execute(f"DELETE FROM {HASH_TABLE} WHERE bang = ?", (table,))
+    conn.executemany(f"INSERT INTO {HASH_TABLE} (bang, khoa_hash, gia_tri_hash, ngay_cap_nhat) VALUES (?, ?, ?, ?)",
+                     [(table, *row) for row in pending['hashes']])
+
+    counts['lan_chay'] = run
+    return counts
+
+
+def has_changes(counts):
+    return bool(counts['so_them'] or counts['so_sua'] or counts['so_xoa'])
+
+
+def changes_since(conn, lan_chay=0, table=None):
+    """Các dòng change_log sau một lần chạy (để phân tích tăng dần chỉ tính lại dòng đã đổi)"""
+    if not _table_exists(conn, LOG_TABLE):
+        return pd.DataFrame(columns=['lan_chay', 'bang', 'loai', 'khoa', 'khoa_hash'])
+    sql = f"SELECT * FROM {LOG_TABLE} WHERE lan_chay > ?"
+    params = [lan_chay]
+    if table is not None:
+        sql += " AND bang = ?"
+        params.append(table)
+    return pd.read_sql_query(sql + " ORDER BY lan_chay", conn, params=params)
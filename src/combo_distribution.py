@@ -0,0 +1,243 @@
+"""
+Module Phổ điểm Tổ hợp từ Phổ điểm Từng môn
+Suy ra phân phối tổng điểm của mọi tổ hợp (theo năm, tỉnh) bằng tích chập FFT
+các histogram môn học do Bộ GD-ĐT công bố, có hiệu chỉnh tương quan giữa các môn
+hiệu chuẩn từ những năm có điểm thi từng thí sinh
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Lưới điểm chung: bước 0.05 (bội chung của 0.2 và 0.25)
+GRID_STEP = 0.05
+N_SUBJECT_BINS = int(round(10 / GRID_STEP)) + 1    # 0 .. 10
+N_TOTAL_BINS = int(round(30 / GRID_STEP)) + 1      # 0 .. 30
+FFT_SIZE = 1 << int(np.ceil(np.log2(N_TOTAL_BINS)))
+
+# Tên môn trong bảng to_hop_mon -> tên viết tắt dùng trong kho điểm
+MON_VIET_TAT = {
+    'Toán': 'Toán', 'Văn': 'Văn', 'Ngữ văn': 'Văn',
+    'Vật lý': 'Lý', 'Hóa học': 'Hóa', 'Sinh học': 'Sinh',
+    'Tiếng Anh': 'Anh', 'Sử': 'Sử', 'Lịch sử': 'Sử',
+    'Địa': 'Địa', 'Địa lý': 'Địa'
+}
+
+GROUP_KEYS = ['nam', 'ma_tinh']
+TOAN_QUOC = '00'    # Mã nhóm cho phổ điểm toàn quốc
+
+
+def combos_from_to_hop(df_to_hop):
+    """Đọc bảng to_hop_mon thành dict mã tổ hợp -> [môn viết tắt]"""
+    return {
+        row['ma_to_hop']: [MON_VIET_TAT.get(row[f'mon_{k}'], row[f'mon_{k}']) for k in (1, 2, 3)]
+        for _, row in df_to_hop.iterrows()
+    }
+
+
+def subject_histograms_from_scores(score_year, by_province=True):
+    """
+    Tạo histogram từng môn (dạng Bộ GD-ĐT công bố) từ điểm từng thí sinh
+    Trả về DataFrame dài: nam, ma_tinh, mon, diem, so_thi_sinh
+    """
+    tinh = np.asarray(score_year.ma_tinh, dtype=np.int64) if by_province else None
+    n_tinh = int(tinh.max()) + 1 if by_province and len(tinh) else 1
+
+    frames = []
+    for mon in score_year.subjects:
+        scores = np.asarray(score_year.scores[mon], dtype=np.float64)
+        valid = ~np.isnan(scores)
+        bins = np.clip(np.round(scores[valid] / GRID_STEP).astype(np.int64), 0, N_SUBJECT_BINS - 1)
+
+        group = tinh[valid] if by_province else np.zeros(len(bins), dtype=np.int64)
+        counts = np.bincount(group * N_SUBJECT_BINS + bins, minlength=n_tinh * N_SUBJECT_BINS)
+        counts = counts.reshape(n_tinh, N_SUBJECT_BINS)
+
+        g_idx, b_idx = np.nonzero(counts)
+        frames.append(pd.DataFrame({
+            'nam': score_year.year,
+            'ma_tinh': [f"{g:02d}" for g in g_idx] if by_province else TOAN_QUOC,
+            'mon': mon,
+            'diem': np.round(b_idx * GRID_STEP, 2),
+            'so_thi_sinh': counts[g_idx, b_idx]
+        }))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def calibrate_correlations(score_years):
+    """
+    Hệ số tương quan giữa các môn (theo cặp thí sinh có cả hai môn),
+    gộp trên các năm có điểm từng thí sinh
+    """
+    subjects = sorted(set().union(*(y.subjects for y in score_years)))
+    n_sub = len(subjects)
+
+    n = np.zeros((n_sub, n_sub))
+    sx = np.zeros((n_sub, n_sub))
+    sy = np.zeros((n_sub, n_sub))
+    sxx = np.zeros((n_sub, n_sub))
+    syy = np.zeros((n_sub, n_sub))
+    sxy = np.zeros((n_sub, n_sub))
+
+    for score_year in score_years:
+        X = np.column_stack([
+            np.asarray(score_year.scores[mon], dtype=np.float64) if mon in score_year.scores
+            else np.full(len(score_year), np.nan)
+            for mon in subjects
+        ])
+        M = (~np.isnan(X)).astype(np.float64)
+        Z = np.nan_to_num(X)
+
+        # Các tổng theo cặp (i, j) chỉ trên thí sinh có cả hai môn, tính bằng tích ma trận
+        n += M.T @ M
+        sx += Z.T @ M
+        sy += M.T @ Z
+        sxx += (Z * Z).T @ M
+        syy += M.T @ (Z * Z)
+        sxy += Z.T @ Z
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        corr = cov / np.sqrt((sxx - sx ** 2 / n) * (syy - sy ** 2 / n))
+
+    corr = np.where(n > 2, corr, 0.0)
+    np.fill_diagonal(corr, 1.0)
+    return pd.DataFrame(corr, index=subjects, columns=subjects)
+
+
+def _histogram_array(histograms):
+    """Chuyển histogram dạng dài thành mảng (nhóm, môn, bin) và số thí sinh (nhóm, môn)"""
+    df = histograms.copy()
+    df['bin'] = np.clip(np.round(df['diem'] / GRID_STEP).astype(int), 0, N_SUBJECT_BINS - 1)
+
+    groups = df[GROUP_KEYS].drop_duplicates().sort_values(GROUP_KEYS).reset_index(drop=True)
+    subjects = sorted(df['mon'].unique())
+
+    g_idx = df.merge(groups.reset_index(), on=GROUP_KEYS)['index'].to_numpy()
+    s_idx = pd.Categorical(df['mon'], categories=subjects).codes
+
+    H = np.zeros((len(groups), len(subjects), N_SUBJECT_BINS))
+    np.add.at(H, (g_idx, s_idx, df['bin'].to_numpy()), df['so_thi_sinh'].to_numpy(dtype=np.float64))
+    return groups, subjects, H
+
+
+def _batched_interp(x, xp_step, fp):
+    """Nội suy tuyến tính theo lô: fp (..., K) trên lưới đều, x (..., K) theo đơn vị điểm"""
+    pos = np.clip(x / xp_step, 0, fp.shape[-1] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, fp.shape[-1] - 1)
+    frac = pos - lo
+    return (np.take_along_axis(fp, lo, axis=-1) * (1 - frac) +
+            np.take_along_axis(fp, hi, axis=-1) * frac)
+
+
+def convolve_combos(histograms, combos, correlations=None):
+    """
+    Phân phối tổng điểm của mọi tổ hợp cho mọi nhóm (năm, tỉnh) trong một phép tính theo lô
+
+    histograms: DataFrame dài (nam, ma_tinh, mon, diem, so_thi_sinh)
+    combos: dict mã tổ hợp -> [3 môn]
+    correlations: ma trận tương quan môn (DataFrame) để hiệu chỉnh; None = giả định độc lập
+
+    Trả về (groups, combo_codes, P, n_combo): P có dạng (nhóm, tổ hợp, N_TOTAL_BINS) là xác suất,
+    n_combo (nhóm, tổ hợp) là số thí sinh ước lượng = số thí sinh ít nhất trong 3 môn (cận trên)
+    """
+    groups, subjects, H = _histogram_array(histograms)
+    counts = H.sum(axis=2)
+
+    combo_codes = [code for code, mons in combos.items() if all(m in subjects for m in mons)]
+    idx = np.array([[subjects.index(m) for m in combos[code]] for code in combo_codes])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pmf = np.nan_to_num(H / counts[:, :, None])
+
+    # Tích chập 3 môn = tích phổ Fourier, tính cho mọi nhóm x tổ hợp một lần
+    spectra = np.fft.rfft(pmf, n=FFT_SIZE, axis=2)                  # (G, S, F)
+    combined = spectra[:, idx].prod(axis=2)                         # (G, C, F)
+    P = np.fft.irfft(combined, n=FFT_SIZE, axis=2)[:, :, :N_TOTAL_BINS]
+    P = np.clip(P, 0, None)
+
+    if correlations is not None:
+        P = _correlation_correction(P, pmf, idx, subjects, correlations)
+
+    total = P.sum(axis=2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        P = np.nan_to_num(P / total)
+
+    n_combo = counts[:, idx].min(axis=2)
+    logger.info(f"Đã tính phổ điểm {len(combo_codes)} tổ hợp x {len(groups)} nhóm (năm, tỉnh)")
+    return groups, combo_codes, P, n_combo
+
+
+def _correlation_correction(P, pmf, idx, subjects, correlations):
+    """
+    Hiệu chỉnh tương quan kiểu copula Gauss xấp xỉ: giãn phân phối quanh trung bình
+    để phương sai bằng sum(var) + 2*sum(rho*sd*sd) thay vì sum(var) của giả định độc lập
+    """
+    grid_sub = np.arange(N_SUBJECT_BINS) * GRID_STEP
+    grid_tot = np.arange(N_TOTAL_BINS) * GRID_STEP
+
+    mean_sub = (pmf * grid_sub).sum(axis=2)
+    sd_sub = np.sqrt(np.clip((pmf * grid_sub ** 2).sum(axis=2) - mean_sub ** 2, 0, None))
+
+    rho = correlations.reindex(index=subjects, columns=subjects).fillna(0).to_numpy()
+    sd = sd_sub[:, idx]                                             # (G, C, 3)
+    var_indep = (sd ** 2).sum(axis=2)
+    cross = np.zeros_like(var_indep)
+    for a, b in ((0, 1), (0, 2), (1, 2)):
+        cross += 2 * rho[idx[:, a], idx[:, b]] * sd[:, :, a] * sd[:, :, b]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.nan_to_num(np.sqrt(np.clip(var_indep + cross, 0, None) / var_indep), nan=1.0)
+
+    mean = (P * grid_tot).sum(axis=2) / np.maximum(P.sum(axis=2), 1e-12)
+
+    # F'(x) = F(mean + (x - mean) / scale), lấy chênh lệch để ra xác suất từng bin
+    cdf = np.cumsum(P, axis=2)
+    half = GRID_STEP / 2
+    upper = mean[:, :, None] + (grid_tot + half - mean[:, :, None]) / scale[:, :, None]
+    cdf_new = _batched_interp(upper - half, GRID_STEP, cdf)
+    cdf_new[:, :, -1] = cdf[:, :, -1]    # Phần đuôi vượt quá 30 dồn vào bin cuối
+    return np.diff(cdf_new, axis=2, prepend=0.0).clip(min=0)
+
+
+def distributions_frame(groups, combo_codes, P, min_prob=1e-7):
+    """Phân phối dạng bảng dài: nam, ma_tinh, ma_to_hop, tong_diem, ty_le"""
+    g_idx, c_idx, b_idx = np.nonzero(P > min_prob)
+    return pd.DataFrame({
+        'nam': groups['nam'].to_numpy()[g_idx],
+        'ma_tinh': groups['ma_tinh'].to_numpy()[g_idx],
+        'ma_to_hop': np.array(combo_codes)[c_idx],
+        'tong_diem': np.round(b_idx * GRID_STEP, 2),
+        'ty_le': P[g_idx, c_idx, b_idx]
+    })
+
+
+def summarize_distributions(groups, combo_codes, P, n_combo, pass_mark=15.0):
+    """Tóm tắt phổ điểm tổ hợp theo schema bảng pho_diem (thang 30)"""
+    grid = np.arange(N_TOTAL_BINS) * GRID_STEP
+    mean = (P * grid).sum(axis=2)
+    std = np.sqrt(np.clip((P * grid ** 2).sum(axis=2) - mean ** 2, 0, None))
+    cdf = np.cumsum(P, axis=2)
+
+    def quantile(q):
+        return (cdf < q).sum(axis=2) * GRID_STEP
+
+    pass_rate = P[:, :, grid >= pass_mark - 1e-9].sum(axis=2) * 100
+
+    n_groups, n_combos = mean.shape
+    return pd.DataFrame({
+        'nam': np.repeat(groups['nam'].to_numpy(), n_combos),
+        'ma_tinh': np.repeat(groups['ma_tinh'].to_numpy(), n_combos),
+        'ma_to_hop': np.tile(combo_codes, n_groups),
+        'diem_trung_binh': mean.ravel().round(2),
+        'do_lech_chuan': std.ravel().round(2),
+        'diem_cao_nhat': quantile(0.999).ravel().round(2),
+        'diem_thap_nhat': quantile(0.001).ravel().round(2),
+        'so_thi_sinh': n_combo.ravel().astype(int),
+        'ty_le_dat': pass_rate.ravel().round(1)
+    })
@@ -0,0 +1,118 @@
+"""
+Module Quét Toàn bộ Tổ hợp Môn
+Tính phân phối tổng điểm của mọi bộ 3 môn (và các biến thể nhân hệ số)
+từ điểm từng thí sinh bằng phép toán mảng, không lặp theo từng tổ hợp
+"""
+
+import itertools
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Biến thể trọng số: cân bằng và nhân đôi từng môn (hệ số 2)
+DEFAULT_WEIGHT_VARIANTS = {
+    '1-1-1': (1, 1, 1),
+    '2-1-1': (2, 1, 1),
+    '1-2-1': (1, 2, 1),
+    '1-1-2': (1, 1, 2),
+}
+
+# Ngưỡng tổng điểm (thang 30) coi là "dưới trung bình"
+THRESHOLD_30 = 15.0
+
+
+def all_triples(subjects):
+    """Mọi bộ 3 môn khác nhau, dạng mảng chỉ số (C, 3)"""
+    return np.array(list(itertools.combinations(range(len(subjects)), 3)), dtype=np.int64)
+
+
+def scan_combos(score_year, subjects=None, weight_variants=None, threshold=THRESHOLD_30,
+                memory_budget_mb=64):
+    """
+    Quét mọi bộ 3 môn x biến thể trọng số trên điểm thi một năm
+
+    Tổng điểm được quy về thang 30 (tổng có trọng số * 3 / tổng trọng số).
+    Thí sinh chỉ được tính cho tổ hợp khi có đủ điểm 3 môn.
+    Trả về DataFrame theo (tỉnh, tổ hợp, biến thể) với count/sum/sumsq/số dưới ngưỡng
+    để có thể cộng dồn sang cấp toàn quốc hoặc giữa các phân đoạn dữ liệu.
+    """
+    subjects = subjects or score_year.subjects
+    weight_variants = weight_variants or DEFAULT_WEIGHT_VARIANTS
+
+    triples = all_triples(subjects)
+    variant_names = list(weight_variants)
+    weights = np.array([weight_variants[v] for v in variant_names], dtype=np.float64)
+    weights = weights * 3 / weights.sum(axis=1, keepdims=True)    # (V, 3) quy về thang 30
+
+    n_combos, n_variants = len(triples), len(variant_names)
+    n_tinh = int(np.max(score_year.ma_tinh)) + 1 if len(score_year) else 1
+    size = n_tinh * n_combos
+
+    count = np.zeros(size)
+    total = np.zeros((n_variants, size))
+    total_sq = np.zeros((n_variants, size))
+    below = np.zeros((n_variants, size))
+
+    # Số thí sinh mỗi khối sao cho mảng (n, C, V) nằm trong giới hạn bộ nhớ
+    chunk_size = max(1, int(memory_budget_mb * 1024 * 1024 // (n_combos * n_variants * 8)))
+
+    for start in range(0, len(score_year), chunk_size):
+        stop = start + chunk_size
+        scores = np.column_stack([score_year.scores[mon][start:stop] for mon in subjects])
+        scores = np.round(scores.astype(np.float64), 2)
+        tinh = np.asarray(score_year.ma_tinh[start:stop], dtype=np.int64)
+
+        grouped = scores[:, triples]                        # (n, C, 3)
+        valid = ~np.isnan(grouped).any(axis=2)              # (n, C)
+        totals = np.einsum('nck,vk->ncv', np.nan_to_num(grouped), weights)
+
+        keys = (tinh[:, None] * n_combos + np.arange(n_combos))[valid]
+        count += np.bincount(keys, minlength=size)
+        for v in range(n_variants):
+            values = totals[:, :, v][valid]
+            total[v] += np.bincount(keys, weights=values, minlength=size)
+            total_sq[v] += np.bincount(keys, weights=values * values, minlength=size)
+            below[v] += np.bincount(keys, weights=(values < threshold), minlength=size)
+
+    # Dựng bảng dài (tỉnh, tổ hợp, biến thể)
+    tinh_idx = np.repeat(np.arange(n_tinh), n_combos)
+    combo_idx = np.tile(np.arange(n_combos), n_tinh)
+    frames = []
+    for v, name in enumerate(variant_names):
+        frames.append(pd.DataFrame({
+            'ma_tinh': tinh_idx,
+            'combo_idx': combo_idx,
+            'bien_the': name,
+            'so_thi_sinh': count,
+            'tong': total[v],
+            'tong_binh_phuong': total_sq[v],
+            'so_duoi_nguong': below[v]
+        }))
+    result = pd.concat(frames, ignore_index=True)
+    result = result[result['so_thi_sinh'] > 0].reset_index(drop=True)
+
+    names = np.array(subjects, dtype=object)
+    for k in range(3):
+        result[f'mon_{k + 1}'] = names[triples[result['combo_idx'], k]]
+    result['ma_tinh'] = result['ma_tinh'].map(lambda code: f"{code:02d}")
+    result['so_thi_sinh'] = result['so_thi_sinh'].astype(int)
+
+    logger.info(f"Đã quét {n_combos} bộ 3 môn x {n_variants} biến thể trên {len(score_year)} thí sinh")
+    return result.drop(columns='combo_idx')
+
+
+def summarize(moments, by=('mon_1', 'mon_2', 'mon_3', 'bien_the')):
+    """Cộng dồn moment theo nhóm rồi tính điểm TB, độ lệch chuẩn, % dưới ngưỡng"""
+    grouped = moments.groupby(list(by), sort=False)[
+        ['so_thi_sinh', 'tong', 'tong_binh_phuong', 'so_duoi_nguong']
+    ].sum().reset_index()
+
+    n = grouped['so_thi_sinh']
+    grouped['diem_tb'] = grouped['tong'] / n
+    grouped['phuong_sai'] = ((grouped['tong_binh_phuong'] - grouped['tong'] ** 2 / n) / (n - 1)).clip(lower=0)
+    grouped['do_lech_chuan'] = np.sqrt(grouped['phuong_sai'])
+    grouped['pct_duoi_nguong'] = grouped['so_duoi_nguong'] / n * 100
+    return grouped
@@ -0,0 +1,305 @@
+"""
+Module Dự báo Điểm chuẩn
+Dự báo điểm chuẩn năm tới cho mọi chuỗi (trường, ngành, tổ hợp) dưới dạng ma trận
+(chuỗi x năm): xu hướng tắt dần (Holt damped trend) chọn tham số theo lưới cho từng chuỗi
+cùng lúc, và hồi quy ridge gộp mọi chuỗi trên điểm chuẩn gần nhất, chỉ tiêu và độ khó
+tổ hợp (phổ điểm). Backtest rolling-origin chạy song song theo năm gốc trên process pool,
+sai số backtest cho khoảng dự báo
+"""
+
+import logging
+import warnings
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SERIES_KEYS = ('truong', 'nganh', 'ma_to_hop')
+
+# Lưới tham số (alpha, beta, phi) của xu hướng tắt dần; khi hòa sai số (chuỗi quá ngắn)
+# bộ đứng trước được chọn nên alpha lớn (bám sát năm gần nhất) xếp đầu
+DAMPED_GRID = ((0.8, 0.5, 0.2), (0.2, 0.05), (0.9, 0.8, 0.98))
+
+RIDGE_ALPHA = 1.0
+
+# Số năm tối thiểu trước năm gốc đầu tiên của backtest
+MIN_TRAIN_YEARS = 3
+
+INTERVALS = (0.8, 0.95)
+
+MODELS = ('xu_huong', 'ridge', 'ket_hop')
+
+
+def build_panel(diem_chuan, pho_diem=None):
+    """
+    Ma trận (chuỗi x năm) của điểm chuẩn, chỉ tiêu và điểm trung bình tổ hợp;
+    nhiều dòng cùng chuỗi trong một năm được lấy trung bình (chỉ tiêu cộng dồn)
+    """
+    keys = list(SERIES_KEYS)
+    df = diem_chuan.dropna(subset=keys + ['nam'])
+    grouped = df.groupby(keys + ['nam'], observed=True)
+
+    cutoff = grouped['diem_chuan'].mean().unstack('nam').sort_index(axis=1)
+    years = [int(y) for y in cutoff.columns]
+
+    if 'chi_tieu' in df.columns:
+        quota = grouped['chi_tieu'].sum(min_count=1).unstack('nam').reindex(index=cutoff.index, columns=cutoff.columns)
+        quota = quota.to_numpy(dtype=np.float64)
+    else:
+        quota = np.full(cutoff.shape, np.nan)
+
+    difficulty = np.full(cutoff.shape, np.nan)
+    if pho_diem is not None and len(pho_diem):
+        combo_mean = pho_diem.groupby(['ma_to_hop', 'nam'], observed=True)['diem_trung_binh'].mean().unstack('nam')
+        combo_mean = combo_mean.reindex(columns=cutoff.columns)
+        codes = cutoff.index.get_level_values('ma_to_hop')
+        difficulty = combo_mean.reindex(codes).to_numpy(dtype=np.float64)
+
+    return {
+        'index': cutoff.index,
+        'years': years,
+        'y': cutoff.to_numpy(dtype=np.float64),
+        'quota': quota,
+        'difficulty': difficulty
+    }
+
+
+def _ffill(values):
+    """Điền tiến theo trục năm (giá trị gần nhất đã quan sát)"""
+    idx = np.where(~np.isnan(values), np.arange(values.shape[1]), -1)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = values[np.arange(values.shape[0])[:, None], np.maximum(idx, 0)]
+    return np.where(idx >= 0, filled, np.nan)
+
+
+def damped_trend_forecast(y, grid=DAMPED_GRID):
+    """
+    Dự báo một bước của xu hướng tắt dần cho mọi chuỗi y (S, T) cùng lúc
+    Mỗi bộ tham số trong lưới chạy song song trên trục đầu (G, S); mỗi chuỗi chọn bộ có
+    tổng bình phương sai số một bước nhỏ nhất. Năm thiếu dữ liệu chỉ truyền xu hướng tiếp.
+    """
+    params = np.array(list(product(*grid)))
+    alpha, beta, phi = (params[:, i, None] for i in range(3))
+    S, T = y.shape
+
+    observed = ~np.isnan(y)
+    first_idx = np.argmax(observed, axis=1)
+    has_any = observed.any(axis=1)
+    first = np.where(has_any, y[np.arange(S), first_idx], np.nan)
+
+    level = np.broadcast_to(first, (len(params), S)).copy()
+    trend = np.zeros((len(params), S))
+    sse = np.zeros((len(params), S))
+
+    for t in range(T):
+        pred = level + phi * trend
+        active = observed[:, t] & (t > first_idx)
+        err = np.where(active, np.nan_to_num(y[:, t]) - pred, 0.0)
+        sse += err * err
+        level = np.where(active | (t > first_idx), pred + alpha * err, level)
+        trend = np.where(active | (t > first_idx), phi * trend + alpha * beta * err, trend)
+
+    best = np.argmin(sse, axis=0)
+    cols = np.arange(S)
+    forecast = level[best, cols] + phi[best, 0] * trend[best, cols]
+    return np.where(has_any, forecast, np.nan)
+
+
+def _ridge_design(panel, t):
+    """
+    Đặc trưng tại năm t để dự báo năm t+1 (chỉ dùng thông tin đến năm t):
+    điểm chuẩn gần nhất, thay đổi năm trước, độ lệch so với trung bình chuỗi,
+    log chỉ tiêu, điểm TB tổ hợp và thay đổi của nó
+    """
+    y = panel['y_filled']
+    last = y[:, t]
+    prev = y[:, t - 1] if t > 0 else last
+    with np.errstate(invalid='ignore', divide='ignore'):
+        counts = np.cumsum(~np.isnan(panel['y'][:, :t + 1]), axis=1)[:, -1]
+        mean = np.nansum(panel['y'][:, :t + 1], axis=1) / np.where(counts > 0, counts, np.nan)
+
+    quota = _ffill(panel['quota'][:, :t + 1])[:, -1]
+    difficulty = panel['difficulty'][:, t]
+    difficulty_prev = panel['difficulty'][:, t - 1] if t > 0 else difficulty
+
+    features = np.column_stack([
+        last,
+        np.nan_to_num(last - prev),
+        np.nan_to_num(last - mean),
+        np.log1p(quota),
+        difficulty,
+        np.nan_to_num(difficulty - difficulty_prev),
+    ])
+    return last, features
+
+
+def ridge_forecast(panel, origin, alpha=RIDGE_ALPHA):
+    """
+    Hồi quy ridge gộp mọi chuỗi: mục tiêu là thay đổi điểm chuẩn năm t -> t+1 với t < origin,
+    nghiệm dạng đóng (X'X + alpha I) w = X'y; dự báo năm origin+1 từ đặc trưng năm origin
+    """
+    rows, targets = [], []
+    for t in range(origin):
+        last, features = _ridge_design(panel, t)
+        target = panel['y'][:, t + 1] - last
+        rows.append(features)
+        targets.append(target)
+
+    last, current = _ridge_design(panel, origin)
+    if not rows:
+        return last
+
+    X = np.vstack(rows)
+    target = np.concatenate(targets)
+
+    # Cột thiếu (chỉ tiêu, độ khó) thay bằng trung bình lúc huấn luyện rồi chuẩn hóa;
+    # cột gần như hằng số (sai số làm tròn) bị loại để không khuếch đại nhiễu
+    center = np.nan_to_num(np.nanmean(np.where(np.isfinite(X), X, np.nan), axis=0))
+    X = np.where(np.isfinite(X), X, center)
+    current = np.where(np.isfinite(current), current, center)
+    scale = X.std(axis=0)
+    scale = np.where(scale > 1e-8 * np.maximum(np.abs(center), 1.0), scale, np.inf)
+
+    valid = np.isfinite(target) & np.isfinite(X[:, 0])
+    if valid.sum() < X.shape[1] + 1:
+        return last
+
+    Z = np.column_stack([np.ones(valid.sum()), (X[valid] - center) / scale])
+    penalty = alpha * np.eye(Z.shape[1])
+    penalty[0, 0] = 0.0
+    weights = np.linalg.solve(Z.T @ Z + penalty, Z.T @ target[valid])
+
+    Z_now = np.column_stack([np.ones(len(current)), (current - center) / scale])
+    return last + Z_now @ weights
+
+
+def _prepare(panel):
+    panel = dict(panel)
+    panel['y_filled'] = _ffill(panel['y'])
+    return panel
+
+
+def forecast_at(panel, origin):
+    """Dự báo năm origin+1 của cả ba mô hình chỉ từ dữ liệu đến năm origin: dict mô hình -> (S,)"""
+    truncated = dict(panel, y=panel['y'][:, :origin + 1], quota=panel['quota'][:, :origin + 1],
+                     difficulty=panel['difficulty'][:, :origin + 1])
+    truncated = _prepare(truncated)
+
+    # Chuỗi chưa có dữ liệu đủ năm cho ra NaN, không cần cảnh báo
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        damped = damped_trend_forecast(truncated['y'])
+        ridge = ridge_forecast(truncated, origin)
+        combined = np.nanmean(np.vstack([damped, ridge]), axis=0)
+    return {'xu_huong': damped, 'ridge': ridge, 'ket_hop': combined}
+
+
+def _backtest_origin(args):
+    """Một phần việc backtest: dự báo năm origin+1 từ dữ liệu đến năm gốc origin"""
+    panel, origin = args
+    return origin, forecast_at(panel, origin)
+
+
+def backtest(panel, min_train_years=MIN_TRAIN_YEARS, max_workers=None):
+    """
+    Backtest rolling-origin: với mỗi năm gốc (từ năm thứ min_train_years) chỉ dùng dữ liệu đến
+    năm đó để dự báo năm kế tiếp; các năm gốc chạy song song trên process pool
+    Trả về dict năm gốc -> dict mô hình -> dự báo (S,)
+    """
+    origins = list(range(min_train_years - 1, len(panel['years']) - 1))
+    tasks = [(panel, origin) for origin in origins]
+    if len(tasks) <= 1:
+        results = [_backtest_origin(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_backtest_origin, tasks))
+    return dict(results)
+
+
+def _error_table(panel, backtests):
+    """
+    Sai số backtest theo (năm dự báo, mô hình) và tổng hợp mọi năm
+    Cột pham_vi phân biệt dòng 'theo_nam' với dòng 'tat_ca' (nam_du_bao để trống)
+    để nam_du_bao luôn là số nguyên
+    """
+    rows = []
+    errors = {model: [] for model in MODELS}
+    for origin, forecasts in sorted(backtests.items()):
+        actual = panel['y'][:, origin + 1]
+        for model in MODELS:
+            err = actual - forecasts[model]
+            err = err[np.isfinite(err)]
+            errors[model].append(err)
+            rows.append(_error_row('theo_nam', int(panel['years'][origin + 1]), model, err))
+    for model in MODELS:
+        err = np.concatenate(errors[model]) if errors[model] else np.array([])
+        rows.append(_error_row('tat_ca', pd.NA, model, err))
+    table = pd.DataFrame(rows)
+    if len(table):
+        table['nam_du_bao'] = table['nam_du_bao'].astype('Int64')
+    return table, {model: np.concatenate(e) if e else np.array([]) for model, e in errors.items()}
+
+
+def _error_row(scope, year, model, err):
+    return {
+        'pham_vi': scope,
+        'nam_du_bao': year,
+        'mo_hinh': model,
+        'so_du_bao': len(err),
+        'mae': float(np.abs(err).mean()) if len(err) else np.nan,
+        'rmse': float(np.sqrt((err ** 2).mean())) if len(err) else np.nan,
+        'do_lech': float(err.mean()) if len(err) else np.nan
+    }
+
+
+def forecast_cutoffs(diem_chuan, pho_diem=None, min_train_years=MIN_TRAIN_YEARS, max_workers=None):
+    """
+    Dự báo điểm chuẩn năm tới cho mọi (trường, ngành, tổ hợp)
+    Trả về (bảng dự báo kèm khoảng dự báo và MAE backtest của từng chuỗi, bảng sai số backtest)
+    Khoảng dự báo lấy từ phân vị sai số backtest của mô hình kết hợp (gộp mọi chuỗi)
+    """
+    panel = build_panel(diem_chuan, pho_diem)
+    S, T = panel['y'].shape
+    if not S or not T:
+        return pd.DataFrame(), pd.DataFrame()
+    logger.info(f"Dự báo điểm chuẩn cho {S} chuỗi, {T} năm ({panel['years'][0]}-{panel['years'][-1]})")
+
+    backtests = backtest(panel, min_train_years=min_train_years, max_workers=max_workers)
+    errors, pooled = _error_table(panel, backtests)
+
+    forecasts = forecast_at(panel, T - 1)
+
+    result = panel['index'].to_frame(index=False)
+    result['nam_du_bao'] = panel['years'][-1] + 1
+    result['diem_chuan_gan_nhat'] = _ffill(panel['y'])[:, -1]
+    result['so_nam_du_lieu'] = (~np.isnan(panel['y'])).sum(axis=1)
+    result['du_bao_xu_huong'] = forecasts['xu_huong']
+    result['du_bao_ridge'] = forecasts['ridge']
+    result['du_bao'] = forecasts['ket_hop']
+
+    residuals = pooled['ket_hop']
+    for level in INTERVALS:
+        pct = int(round(level * 100))
+        if len(residuals):
+            low, high = np.quantile(residuals, [(1 - level) / 2, (1 + level) / 2])
+        else:
+            low = high = np.nan
+        result[f'can_duoi_{pct}'] = result['du_bao'] + low
+        result[f'can_tren_{pct}'] = result['du_bao'] + high
+
+    # MAE backtest từng chuỗi của mô hình kết hợp
+    if backtests:
+        series_err = np.vstack([panel['y'][:, origin + 1] - f['ket_hop'] for origin, f in sorted(backtests.items())])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result['mae_backtest'] = np.nanmean(np.abs(series_err), axis=0)
+    else:
+        result['mae_backtest'] = np.nan
+
+    overall = errors[(errors['pham_vi'] == 'tat_ca') & (errors['mo_hinh'] == 'ket_hop')]
+    if len(overall) and overall['so_du_bao'].iloc[0]:
+        logger.info(f"Backtest {len(backtests)} năm gốc: MAE kết hợp {overall['mae'].iloc[0]:.3f}")
+    return result, errors
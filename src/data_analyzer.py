@@ -46,33 +46,76 @@ logger = logging.getLogger(__name__)
 plt.rcParams['font.family'] = 'DejaVu Sans'
 sns.set_style("whitegrid")
 
+# Tên phân tích -> phương thức thực hiện (cùng tên với ANALYSIS_AGGREGATES của query_planner)
+ANALYSIS_METHODS = {
+    'popularity': 'analyze_to_hop_popularity',
+    'trends': 'analyze_diem_chuan_trends',
+    'regional': 'analyze_regional_differences',
+    'difficulty': 'analyze_difficulty_ranking',
+    'clusters': 'cluster_analysis',
+}
+
 class THPTDataAnalyzer:
     """Class chính để phân tích dữ liệu THPT"""
     
-    def __init__(self, db_path="data/thpt_data.db"):
-        """Khởi tạo analyzer với database"""
+    def __init__(self, db_path="data/thpt_data.db", score_store_path="data/score_store", table_format='csv',
+                 shard_by=None, workers=None, model_path="data/models"):
+        """
+        Khởi tạo analyzer với database
+        shard_by: 'nam' hoặc 'ma_tinh' để tính bảng tổng hợp song song theo phân đoạn
+        (ngầm bật pushdown), workers: số tiến trình (mặc định theo số CPU)
+        model_path: kho mô hình scaler/KMeans dùng lại giữa các lần chạy
+        """
+        from output_sink import OutputSink
+        from model_registry import ModelRegistry
+        
         self.db_path = db_path
+        self.score_store_path = score_store_path
+        self.shard_by = shard_by
+        self.workers = workers
+        self.models = ModelRegistry(model_path)
         self.data = {}
+        self.aggregates = {}
+        self.row_counts = {}
+        self.scores = {}
+        self.tables = {}
+        self.results = {}
         
         # Tạo thư mục output
         os.makedirs("output/reports", exist_ok=True)
         os.makedirs("output/charts", exist_ok=True)
         os.makedirs("output/tables", exist_ok=True)
         
-    def load_data(self):
-        """Tải dữ liệu từ database"""
+        # Bảng kết quả được ghi trên luồng nền, song song với các phân tích tiếp theo
+        self.sink = OutputSink("output/tables", fmt=table_format)
+        
+    def load_data(self, pushdown=False, tables=None):
+        """
+        Tải dữ liệu từ database
+        
+        Với pushdown=True chỉ tải các bảng tổng hợp GROUP BY do SQLite tính,
+        phù hợp khi database lớn hơn bộ nhớ
+        tables: chỉ tải lại các bảng này (mặc định cả ba bảng)
+        """
+        if pushdown or self.shard_by:
+            return self.load_aggregates()
+        
+        from star_schema import read_table
+        
         logger.info("Đang tải dữ liệu từ database...")
         
         try:
             conn = sqlite3.connect(self.db_path)
             
-            # Tải các bảng dữ liệu
-            self.data['to_hop_mon'] = pd.read_sql_query("SELECT * FROM to_hop_mon", conn)
-            self.data['diem_chuan'] = pd.read_sql_query("SELECT * FROM diem_chuan", conn)
-            self.data['pho_diem'] = pd.read_sql_query("SELECT * FROM pho_diem", conn)
+            # Tải các bảng dữ liệu (bảng hình sao: cột chiều thành Categorical từ mã khóa)
+            for table in tables or ('to_hop_mon', 'diem_chuan', 'pho_diem'):
+                self.data[table] = read_table(conn, table)
             
             conn.close()
             
+            self.aggregates = {}
+            self.row_counts = {table: len(df) for table, df in self.data.items()}
+            
             logger.info(f"Đã tải {len(self.data)} bảng dữ liệu")
             for table, df in self.data.items():
                 logger.info(f"  - {table}: {len(df)} bản ghi")
@@ -81,25 +124,155 @@ class THPTDataAnalyzer:
             logger.error(f"Lỗi khi tải dữ liệu: {e}")
             raise
     
+    def load_frames(self, frames):
+        """
+        Nhận trực tiếp các DataFrame vừa thu thập (cùng tiến trình), không đọc lại database
+        frames: dict tên bảng -> DataFrame, cần to_hop_mon, diem_chuan, pho_diem
+        """
+        self.data = {table: frames[table] for table in ('to_hop_mon', 'diem_chuan', 'pho_diem')}
+        self.aggregates = {}
+        self.row_counts = {table: len(df) for table, df in self.data.items()}
+        
+        logger.info(f"Nhận {len(self.data)} bảng dữ liệu trong bộ nhớ")
+        for table, df in self.data.items():
+            logger.info(f"  - {table}: {len(df)} bản ghi")
+    
+    def load_aggregates(self, analyses=None):
+        """Tải các bảng tổng hợp mà các phân tích khai báo (SQL push-down)"""
+        from query_planner import QueryPlanner, SMALL_TABLES
+        
+        logger.info("Đang tính các bảng tổng hợp trong database...")
+        
+        try:
+            planner = QueryPlanner(self.db_path)
+            self.aggregates = self._execute_aggregates(planner, analyses)
+            self.row_counts = planner.row_counts(['to_hop_mon', 'diem_chuan', 'pho_diem'])
+            
+            # Bảng nhỏ vẫn tải đầy đủ, bảng lớn không đưa vào bộ nhớ
+            conn = sqlite3.connect(self.db_path)
+            self.data = {
+                table: pd.read_sql_query(f"SELECT * FROM {table}", conn)
+                for table in SMALL_TABLES
+            }
+            conn.close()
+            
+            logger.info(f"Đã tải {len(self.aggregates)} bảng tổng hợp")
+            
+        except Exception as e:
+            logger.error(f"Lỗi khi tải dữ liệu tổng hợp: {e}")
+            raise
+    
+    def _execute_aggregates(self, planner, analyses=None):
+        """Một truy vấn GROUP BY cho mỗi bảng tổng hợp, hoặc chia phân đoạn cho process pool nếu có shard_by"""
+        if self.shard_by:
+            return planner.execute_sharded(analyses, shard_by=self.shard_by, max_workers=self.workers)
+        return planner.execute(analyses)
+    
+    def load_scores(self, years=None):
+        """Mở điểm thi từng thí sinh từ kho .npy (memory-mapped, không đọc hết vào RAM)"""
+        from score_store import ScoreStore
+        
+        store = ScoreStore(self.score_store_path)
+        years = years or store.years()
+        self.scores = {year: store.open_year(year) for year in years}
+        
+        logger.info(f"Đã mở điểm thi {len(self.scores)} năm từ {self.score_store_path}")
+        for year, score_year in self.scores.items():
+            logger.info(f"  - {year}: {len(score_year)} thí sinh, {len(score_year.subjects)} môn")
+        
+        return self.scores
+    
+    def _group_stats(self, table, group_by, measures):
+        """
+        Thống kê count/sum/mean/std theo nhóm cho các cột đo lường
+        Dùng bảng tổng hợp push-down nếu có, ngược lại groupby trên DataFrame; cả hai đều đi qua
+        moments_to_stats với tổng chính xác nên cho cùng kết quả tới từng bit
+        """
+        from query_planner import aggregate_key, moments_to_stats, exact_sum
+        
+        key = aggregate_key(table, group_by)
+        if key in self.aggregates:
+            return moments_to_stats(self.aggregates[key], measures)
+        
+        grouped = self.data[table].groupby(list(group_by), observed=True)
+        moments = {}
+        for col in measures:
+            moments[f'{col}_count'] = grouped[col].count()
+            moments[f'{col}_sum'] = grouped[col].agg(exact_sum)
+            moments[f'{col}_sumsq'] = grouped[col].agg(lambda values: exact_sum(values, square=True))
+        return moments_to_stats(pd.DataFrame(moments), measures)
+    
+    def run_analysis(self, name):
+        """Chạy một phân tích theo tên (xem ANALYSIS_METHODS), dùng lại kết quả đã có"""
+        if name not in self.results:
+            self.results[name] = getattr(self, ANALYSIS_METHODS[name])()
+        return self.results[name]
+    
+    def refresh(self, tables, pushdown=False):
+        """
+        Tính lại có chọn lọc sau khi các bảng đã cho thay đổi:
+        chỉ tải lại dữ liệu liên quan và chạy lại các phân tích phụ thuộc, rồi tạo lại báo cáo
+        Trả về danh sách phân tích đã chạy lại
+        """
+        from query_planner import QueryPlanner, analyses_for_tables
+        
+        if not self.results:
+            self.run_full_analysis(pushdown=pushdown)
+            return list(ANALYSIS_METHODS)
+        
+        analyses = analyses_for_tables(tables)
+        if not analyses:
+            return []
+        
+        logger.info(f"Tính lại {analyses} do thay đổi ở {list(tables)}")
+        
+        if pushdown or self.shard_by:
+            planner = QueryPlanner(self.db_path)
+            self.aggregates.update(self._execute_aggregates(planner, analyses))
+            self.row_counts.update(planner.row_counts(['to_hop_mon', 'diem_chuan', 'pho_diem']))
+        else:
+            reload = [t for t in tables if t in self.data]
+            if reload:
+                self.load_data(tables=reload)
+        
+        for name in analyses:
+            self.results.pop(name, None)
+            self.run_analysis(name)
+        
+        self.generate_summary_report()
+        self.sink.flush()
+        return analyses
+    
+    def _save_table(self, df, name):
+        """Gửi bảng kết quả cho luồng ghi nền (output/tables/<name>) và giữ lại để xuất Excel"""
+        self.tables[name] = df
+        self.sink.write(df, name)
+    
+    def export_excel(self, path="output/thpt_analysis.xlsx"):
+        """Xuất mọi bảng kết quả đã tính vào một workbook nhiều sheet"""
+        from excel_export import export_tables
+        
+        return export_tables(self.tables, path)
+    
     def analyze_to_hop_popularity(self):
         """Phân tích độ phổ biến của các tổ hợp môn"""
         logger.info("Đang phân tích độ phổ biến tổ hợp môn...")
         
-        df_diem_chuan = self.data['diem_chuan']
+        stats_dc = self._group_stats('diem_chuan', ['ma_to_hop'], ['diem_chuan', 'chi_tieu'])
         
         # Tính số lượng ngành theo tổ hợp
-        popularity = df_diem_chuan.groupby('ma_to_hop').agg({
-            'nganh': 'count',
-            'chi_tieu': 'sum',
-            'diem_chuan': ['mean', 'std']
+        popularity = pd.DataFrame({
+            'so_nganh': stats_dc['diem_chuan_count'],
+            'tong_chi_tieu': stats_dc['chi_tieu_sum'],
+            'diem_chuan_tb': stats_dc['diem_chuan_mean'],
+            'diem_chuan_std': stats_dc['diem_chuan_std']
         }).round(2)
         
-        popularity.columns = ['so_nganh', 'tong_chi_tieu', 'diem_chuan_tb', 'diem_chuan_std']
         popularity = popularity.reset_index()
         popularity = popularity.sort_values('so_nganh', ascending=False)
         
         # Lưu kết quả
-        popularity.to_csv("output/tables/to_hop_popularity.csv", index=False, encoding='utf-8-sig')
+        self._save_table(popularity, "to_hop_popularity")
         
         logger.info("Hoàn thành phân tích độ phổ biến")
         return popularity
@@ -108,14 +281,15 @@ class THPTDataAnalyzer:
         """Phân tích xu hướng điểm chuẩn theo thời gian"""
         logger.info("Đang phân tích xu hướng điểm chuẩn...")
         
-        df_diem_chuan = self.data['diem_chuan']
+        stats_dc = self._group_stats('diem_chuan', ['nam', 'ma_to_hop'], ['diem_chuan'])
         
         # Tính điểm chuẩn trung bình theo năm và tổ hợp
-        trends = df_diem_chuan.groupby(['nam', 'ma_to_hop']).agg({
-            'diem_chuan': ['mean', 'std', 'count']
+        trends = pd.DataFrame({
+            'diem_chuan_tb': stats_dc['diem_chuan_mean'],
+            'diem_chuan_std': stats_dc['diem_chuan_std'],
+            'so_nganh': stats_dc['diem_chuan_count']
         }).round(2)
         
-        trends.columns = ['diem_chuan_tb', 'diem_chuan_std', 'so_nganh']
         trends = trends.reset_index()
         
         # Tính xu hướng (slope) cho mỗi tổ hợp
@@ -135,8 +309,8 @@ class THPTDataAnalyzer:
         trend_df = pd.DataFrame(trend_analysis)
         
         # Lưu kết quả
-        trends.to_csv("output/tables/diem_chuan_trends.csv", index=False, encoding='utf-8-sig')
-        trend_df.to_csv("output/tables/trend_analysis.csv", index=False, encoding='utf-8-sig')
+        self._save_table(trends, "diem_chuan_trends")
+        self._save_table(trend_df, "trend_analysis")
         
         logger.info("Hoàn thành phân tích xu hướng")
         return trends, trend_df
@@ -145,40 +319,49 @@ class THPTDataAnalyzer:
         """Phân tích sự khác biệt giữa các vùng miền"""
         logger.info("Đang phân tích sự khác biệt vùng miền...")
         
-        df_diem_chuan = self.data['diem_chuan']
+        stats_dc = self._group_stats('diem_chuan', ['vung_mien', 'ma_to_hop'], ['diem_chuan'])
         
         # So sánh điểm chuẩn giữa các vùng miền
-        regional_stats = df_diem_chuan.groupby(['vung_mien', 'ma_to_hop']).agg({
-            'diem_chuan': ['mean', 'std', 'count']
+        regional_stats = pd.DataFrame({
+            'diem_chuan_tb': stats_dc['diem_chuan_mean'],
+            'diem_chuan_std': stats_dc['diem_chuan_std'],
+            'so_nganh': stats_dc['diem_chuan_count']
         }).round(2)
         
-        regional_stats.columns = ['diem_chuan_tb', 'diem_chuan_std', 'so_nganh']
         regional_stats = regional_stats.reset_index()
         
-        # Kiểm định t-test giữa Miền Bắc và Miền Nam
+        # Kiểm định t-test giữa Miền Bắc và Miền Nam (tính từ thống kê nhóm)
         t_test_results = []
-        for to_hop in df_diem_chuan['ma_to_hop'].unique():
-            mien_bac = df_diem_chuan[(df_diem_chuan['ma_to_hop'] == to_hop) & 
-                                   (df_diem_chuan['vung_mien'] == 'Miền Bắc')]['diem_chuan']
-            mien_nam = df_diem_chuan[(df_diem_chuan['ma_to_hop'] == to_hop) & 
-                                   (df_diem_chuan['vung_mien'] == 'Miền Nam')]['diem_chuan']
+        to_hop_codes = stats_dc.index.get_level_values('ma_to_hop').unique()
+        for to_hop in to_hop_codes:
+            if (('Miền Bắc', to_hop) not in stats_dc.index or
+                    ('Miền Nam', to_hop) not in stats_dc.index):
+                continue
             
-            if len(mien_bac) > 0 and len(mien_nam) > 0:
-                t_stat, p_value = stats.ttest_ind(mien_bac, mien_nam)
-                t_test_results.append({
-                    'ma_to_hop': to_hop,
-                    't_statistic': round(t_stat, 3),
-                    'p_value': round(p_value, 3),
-                    'khac_biet_co_y_nghia': 'Có' if p_value < 0.05 else 'Không',
-                    'mien_bac_tb': round(mien_bac.mean(), 2),
-                    'mien_nam_tb': round(mien_nam.mean(), 2)
-                })
+            mien_bac = stats_dc.loc[('Miền Bắc', to_hop)]
+            mien_nam = stats_dc.loc[('Miền Nam', to_hop)]
+            
+            # Nhóm chỉ có 1 phần tử không đóng góp vào phương sai gộp
+            t_stat, p_value = stats.ttest_ind_from_stats(
+                mien_bac['diem_chuan_mean'], np.nan_to_num(mien_bac['diem_chuan_std']),
+                mien_bac['diem_chuan_count'],
+                mien_nam['diem_chuan_mean'], np.nan_to_num(mien_nam['diem_chuan_std']),
+                mien_nam['diem_chuan_count']
+            )
+            t_test_results.append({
+                'ma_to_hop': to_hop,
+                't_statistic': round(t_stat, 3),
+                'p_value': round(p_value, 3),
+                'khac_biet_co_y_nghia': 'Có' if p_value < 0.05 else 'Không',
+                'mien_bac_tb': round(mien_bac['diem_chuan_mean'], 2),
+                'mien_nam_tb': round(mien_nam['diem_chuan_mean'], 2)
+            })
         
         t_test_df = pd.DataFrame(t_test_results)
         
         # Lưu kết quả
-        regional_stats.to_csv("output/tables/regional_stats.csv", index=False, encoding='utf-8-sig')
-        t_test_df.to_csv("output/tables/regional_t_test.csv", index=False, encoding='utf-8-sig')
+        self._save_table(regional_stats, "regional_stats")
+        self._save_table(t_test_df, "regional_t_test")
         
         logger.info("Hoàn thành phân tích vùng miền")
         return regional_stats, t_test_df
@@ -187,27 +370,28 @@ class THPTDataAnalyzer:
         """Phân tích và xếp hạng độ khó của các tổ hợp"""
         logger.info("Đang phân tích độ khó tổ hợp môn...")
         
-        df_pho_diem = self.data['pho_diem']
-        df_diem_chuan = self.data['diem_chuan']
+        stats_pd = self._group_stats('pho_diem', ['ma_to_hop'],
+                                     ['diem_trung_binh', 'do_lech_chuan', 'ty_le_dat'])
+        stats_dc = self._group_stats('diem_chuan', ['ma_to_hop'], ['diem_chuan'])
         
         # Tính các chỉ số độ khó
-        difficulty_stats = df_pho_diem.groupby('ma_to_hop').agg({
-            'diem_trung_binh': 'mean',
-            'do_lech_chuan': 'mean',
-            'ty_le_dat': 'mean'
+        difficulty_stats = pd.DataFrame({
+            'diem_trung_binh': stats_pd['diem_trung_binh_mean'],
+            'do_lech_chuan': stats_pd['do_lech_chuan_mean'],
+            'ty_le_dat': stats_pd['ty_le_dat_mean']
         }).round(2)
         
         # Tính điểm chuẩn trung bình
-        avg_cutoff = df_diem_chuan.groupby('ma_to_hop')['diem_chuan'].mean()
+        avg_cutoff = stats_dc['diem_chuan_mean']
         
         # Kết hợp dữ liệu
         difficulty_stats['diem_chuan_tb'] = avg_cutoff
         difficulty_stats = difficulty_stats.reset_index()
         
-        # Chuẩn hóa các chỉ số (Z-score)
-        scaler = StandardScaler()
+        # Chuẩn hóa các chỉ số (Z-score), scaler lấy từ kho mô hình nếu dữ liệu ít thay đổi
         features = ['diem_trung_binh', 'do_lech_chuan', 'diem_chuan_tb']
-        difficulty_stats[features] = scaler.fit_transform(difficulty_stats[features])
+        scaler, _ = self.models.fit_or_load('difficulty_scaler', difficulty_stats[features], StandardScaler)
+        difficulty_stats[features] = scaler.transform(difficulty_stats[features].to_numpy())
         
         # Tính điểm tổng hợp độ khó (điểm càng cao = càng khó)
         difficulty_stats['diem_do_kho'] = (
@@ -228,7 +412,7 @@ class THPTDataAnalyzer:
         )
         
         # Lưu kết quả
-        difficulty_stats.to_csv("output/tables/difficulty_ranking.csv", index=False, encoding='utf-8-sig')
+        self._save_table(difficulty_stats, "difficulty_ranking")
         
         logger.info("Hoàn thành phân tích độ khó")
         return difficulty_stats
@@ -237,28 +421,30 @@ class THPTDataAnalyzer:
         """Phân cụm các tổ hợp môn dựa trên đặc điểm"""
         logger.info("Đang thực hiện phân cụm tổ hợp môn...")
         
-        df_pho_diem = self.data['pho_diem']
-        df_diem_chuan = self.data['diem_chuan']
+        stats_pd = self._group_stats('pho_diem', ['ma_to_hop'],
+                                     ['diem_trung_binh', 'do_lech_chuan', 'so_thi_sinh', 'ty_le_dat'])
+        stats_dc = self._group_stats('diem_chuan', ['ma_to_hop'], ['diem_chuan'])
         
         # Tính features cho clustering
-        features_df = df_pho_diem.groupby('ma_to_hop').agg({
-            'diem_trung_binh': 'mean',
-            'do_lech_chuan': 'mean',
-            'so_thi_sinh': 'mean',
-            'ty_le_dat': 'mean'
+        features_df = pd.DataFrame({
+            'diem_trung_binh': stats_pd['diem_trung_binh_mean'],
+            'do_lech_chuan': stats_pd['do_lech_chuan_mean'],
+            'so_thi_sinh': stats_pd['so_thi_sinh_mean'],
+            'ty_le_dat': stats_pd['ty_le_dat_mean']
         }).round(2)
         
         # Thêm điểm chuẩn trung bình
-        avg_cutoff = df_diem_chuan.groupby('ma_to_hop')['diem_chuan'].mean()
+        avg_cutoff = stats_dc['diem_chuan_mean']
         features_df['diem_chuan_tb'] = avg_cutoff
         
         # Chuẩn hóa dữ liệu
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(features_df)
+        scaler, refitted = self.models.fit_or_load('cluster_scaler', features_df, StandardScaler)
+        features_scaled = pd.DataFrame(scaler.transform(features_df.to_numpy()), columns=features_df.columns)
         
-        # K-means clustering
-        kmeans = KMeans(n_clusters=3, random_state=42)
-        clusters = kmeans.fit_predict(features_scaled)
+        # K-means clustering (scaler đổi thì tâm cụm cũ không còn cùng thang đo, phải huấn luyện lại)
+        kmeans, _ = self.models.fit_or_load('cluster_kmeans', features_scaled, KMeans,
+                                            params={'n_clusters': 3, 'random_state': 42}, force=refitted)
+        clusters = kmeans.predict(features_scaled.to_numpy())
         
         # Thêm kết quả clustering
         features_df['cluster'] = clusters
@@ -271,7 +457,7 @@ class THPTDataAnalyzer:
         features_df = features_df.reset_index()
         
         # Lưu kết quả
-        features_df.to_csv("output/tables/cluster_analysis.csv", index=False, encoding='utf-8-sig')
+        self._save_table(features_df, "cluster_analysis")
         
         logger.info("Hoàn thành phân cụm")
         return features_df
@@ -280,12 +466,12 @@ class THPTDataAnalyzer:
         """Tạo báo cáo tổng quan"""
         logger.info("Đang tạo báo cáo tổng quan...")
         
-        # Chạy tất cả các phân tích
-        popularity = self.analyze_to_hop_popularity()
-        trends, trend_analysis = self.analyze_diem_chuan_trends()
-        regional_stats, t_test = self.analyze_regional_differences()
-        difficulty = self.analyze_difficulty_ranking()
-        clusters = self.cluster_analysis()
+        # Lấy kết quả các phân tích (chỉ chạy phân tích chưa có kết quả)
+        popularity = self.run_analysis('popularity')
+        trends, trend_analysis = self.run_analysis('trends')
+        regional_stats, t_test = self.run_analysis('regional')
+        difficulty = self.run_analysis('difficulty')
+        clusters = self.run_analysis('clusters')
         
         # Tạo báo cáo văn bản
         report = f"""
@@ -293,9 +479,9 @@ class THPTDataAnalyzer:
 Ngày tạo: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}
 
 ## 1. TỔNG QUAN DỮ LIỆU
-- Số tổ hợp môn: {len(self.data['to_hop_mon'])}
-- Số bản ghi điểm chuẩn: {len(self.data['diem_chuan'])}
-- Số bản ghi phổ điểm: {len(self.data['pho_diem'])}
+- Số tổ hợp môn: {self.row_counts['to_hop_mon']}
+- Số bản ghi điểm chuẩn: {self.row_counts['diem_chuan']}
+- Số bản ghi phổ điểm: {self.row_counts['pho_diem']}
 
 ## 2. ĐỘ PHỔ BIẾN CỦA CÁC TỔ HỢP MÔN
 Top 3 tổ hợp được sử dụng nhiều nhất:
@@ -335,29 +521,82 @@ Top 3 tổ hợp khó nhất:
         logger.info("Đã tạo báo cáo tổng quan")
         return report
     
-    def run_full_analysis(self):
-        """Chạy toàn bộ phân tích"""
+    def run_full_analysis(self, pushdown=False, frames=None):
+        """Chạy toàn bộ phân tích (frames: dữ liệu trong bộ nhớ thay cho database, xem load_frames)"""
         logger.info("Bắt đầu phân tích dữ liệu THPT đầy đủ...")
         
         # Tải dữ liệu
-        self.load_data()
+        if frames is not None:
+            self.load_frames(frames)
+        else:
+            self.load_data(pushdown=pushdown)
         
         # Chạy các phân tích
-        results = {
-            'popularity': self.analyze_to_hop_popularity(),
-            'trends': self.analyze_diem_chuan_trends(),
-            'regional': self.analyze_regional_differences(),
-            'difficulty': self.analyze_difficulty_ranking(),
-            'clusters': self.cluster_analysis()
-        }
+        self.results = {}
+        results = {name: self.run_analysis(name) for name in ANALYSIS_METHODS}
         
         # Tạo báo cáo tổng quan
         report = self.generate_summary_report()
         
+        # Chờ luồng nền ghi xong mọi bảng trước khi báo hoàn thành
+        self.sink.flush()
+        
         logger.info("Hoàn thành phân tích đầy đủ!")
         
         return results, report
 
+# Giá trị dự đoán 2025 dựa trên insight, chỉ dùng khi chưa có điểm thi thực tế
+PREDICTED_2025 = {
+    'Toán': {
+        'avg_score': 5.3,     # Giảm mạnh từ 6.5
+        'std_dev': 2.1,       # Phân hóa cao
+        'pct_below5': 45.2,   # "Kẻ hủy diệt"
+        'difficulty_sentiment': 8.5  # Media: rất khó
+    },
+    'Anh': {
+        'avg_score': 5.1,     # "Ngang IELTS"  
+        'std_dev': 2.3,       # Phân hóa cực cao
+        'pct_below5': 48.7,   # "Kẻ hủy diệt" 
+        'difficulty_sentiment': 9.0  # Media: khó nhất
+    },
+    'Lý': {
+        'avg_score': 6.8,     # "Dễ thở" như insight
+        'std_dev': 1.4,       # Ít phân hóa
+        'pct_below5': 18.3,   # Thấp
+        'difficulty_sentiment': 4.2  # Media: dễ
+    },
+    'Hóa': {
+        'avg_score': 6.2,     # Trung bình
+        'std_dev': 1.7,       # Vừa phải
+        'pct_below5': 28.1,   # Trung bình
+        'difficulty_sentiment': 5.8  # Media: vừa
+    },
+    'Văn': {
+        'avg_score': 6.9,     # Ổn định
+        'std_dev': 1.2,       # Ít biến động
+        'pct_below5': 15.4,   # Thấp
+        'difficulty_sentiment': 3.8  # Media: dễ
+    },
+    'Sinh': {
+        'avg_score': 6.1,     # Trung bình
+        'std_dev': 1.8,       # Vừa phải  
+        'pct_below5': 31.2,   # Trung bình
+        'difficulty_sentiment': 6.1  # Media: vừa
+    },
+    'Sử': {
+        'avg_score': 6.0,     # Đã cải thiện sau khi thành môn bắt buộc
+        'std_dev': 1.6,       # Vừa phải
+        'pct_below5': 27.5,   # Trung bình
+        'difficulty_sentiment': 4.5  # Media: khá dễ
+    },
+    'Địa': {
+        'avg_score': 6.7,     # Ổn định
+        'std_dev': 1.3,       # Ít phân hóa
+        'pct_below5': 14.8,   # Thấp
+        'difficulty_sentiment': 4.0  # Media: dễ
+    }
+}
+
 class DifficultyAnalyzer:
     """
     Class phân tích độ khó tổ hợp môn theo framework:
@@ -367,11 +606,20 @@ class DifficultyAnalyzer:
     4. Trực quan hóa & báo cáo
     """
     
-    def __init__(self, db_path="data/thpt_data.db"):
+    def __init__(self, db_path="data/thpt_data.db", score_store_path="data/score_store",
+                 score_cube_path="data/score_cube"):
         self.db_path = db_path
+        self.score_store_path = score_store_path
+        self.score_cube_path = score_cube_path
+        self.year = None
         self.subject_data = {}
+        self.subject_province_stats = {}
         self.combo_difficulty = {}
+        self.combo_scan = {}
+        self.combo_scan_province = {}
         self.media_sentiment = {}
+        self.score_drift = pd.DataFrame()
+        self._year_stats = {}
         
         # Định nghĩa trọng số cho từng môn (insight: Toán-Anh khó nhất)
         self.subject_weights = {
@@ -397,79 +645,204 @@ class DifficultyAnalyzer:
             'D07': ['Toán', 'Hóa', 'Anh']
         }
     
-    def calculate_subject_difficulty(self, year=2025):
+    def load_media_sentiment(self, articles, cache_path="data/sentiment_cache.db"):
+        """
+        Tính chỉ số cảm xúc độ khó theo môn từ các bài báo đã thu thập
+        (DataFrame/list có cột tieu_de, noi_dung); bài đã chấm được lấy từ cache
+        """
+        from media_sentiment import MediaSentimentPipeline
+        
+        sentiment_df = MediaSentimentPipeline(cache_path=cache_path).run(articles)
+        self.media_sentiment = dict(zip(sentiment_df['mon'], sentiment_df['difficulty_sentiment']))
+        
+        logger.info(f"Media sentiment cho {len(self.media_sentiment)} môn từ {len(articles)} bài viết")
+        return sentiment_df
+    
+    def _subject_stats(self, year, chunk_size=1_000_000):
+        """
+        Thống kê điểm từng môn theo tỉnh cho một năm, tính trong một lượt quét
+        kho điểm memory-mapped: count, sum, sumsq và số điểm < 5 qua np.bincount
+        Kết quả được cache theo năm
+        """
+        if year in self._year_stats:
+            return self._year_stats[year]
+        
+        from score_store import ScoreStore
+        
+        store = ScoreStore(self.score_store_path)
+        cube = self._load_cube(store)
+        if cube is not None and year in cube.nam:
+            return self._subject_stats_from_cube(cube, year)
+        
+        score_year = store.open_year(year)
+        subjects = score_year.subjects
+        n_subjects = len(subjects)
+        n_tinh = int(score_year.ma_tinh.max()) + 1 if len(score_year) else 1
+        size = n_tinh * n_subjects
+        
+        count = np.zeros(size)
+        total = np.zeros(size)
+        total_sq = np.zeros(size)
+        below5 = np.zeros(size)
+        
+        # Quét theo khối để bộ nhớ không phụ thuộc số thí sinh
+        for start in range(0, len(score_year), chunk_size):
+            stop = start + chunk_size
+            # float32 -> float64 rồi làm tròn để bỏ sai số biểu diễn (điểm là bội của 0.05)
+            scores = np.column_stack([score_year.scores[mon][start:stop] for mon in subjects])
+            scores = np.round(scores.astype(np.float64), 2)
+            tinh = np.asarray(score_year.ma_tinh[start:stop], dtype=np.int64)
+            
+            valid = ~np.isnan(scores)
+            keys = (tinh[:, None] * n_subjects + np.arange(n_subjects))[valid]
+            values = scores[valid]
+            
+            count += np.bincount(keys, minlength=size)
+            total += np.bincount(keys, weights=values, minlength=size)
+            total_sq += np.bincount(keys, weights=values * values, minlength=size)
+            below5 += np.bincount(keys, weights=(values < 5.0), minlength=size)
+        
+        tinh_codes = np.repeat(np.arange(n_tinh), n_subjects)
+        mon = np.tile(subjects, n_tinh)
+        province = pd.DataFrame({
+            'nam': year,
+            'ma_tinh': [f"{code:02d}" for code in tinh_codes],
+            'mon': mon,
+            'so_thi_sinh': count.astype(int),
+            'tong': total,
+            'tong_binh_phuong': total_sq,
+            'so_duoi_5': below5.astype(int)
+        })
+        province = province[province['so_thi_sinh'] > 0].reset_index(drop=True)
+        
+        # Toàn quốc = cộng dồn các tỉnh
+        national = province.groupby('mon', sort=False)[
+            ['so_thi_sinh', 'tong', 'tong_binh_phuong', 'so_duoi_5']
+        ].sum()
+        
+        for df in (province, national):
+            n = df['so_thi_sinh']
+            df['avg_score'] = df['tong'] / n
+            df['std_dev'] = np.sqrt(((df['tong_binh_phuong'] - df['tong'] ** 2 / n) / (n - 1)).clip(lower=0))
+            df['pct_below5'] = df['so_duoi_5'] / n * 100
+        
+        self._year_stats[year] = (national, province)
+        return national, province
+    
+    def _load_cube(self, store):
+        """Khối tổng hợp đã dựng sẵn, chỉ dùng khi còn khớp với kho điểm"""
+        from score_cube import ScoreCube
+        
+        if not os.path.exists(os.path.join(self.score_cube_path, 'cube.json')):
+            return None
+        cube = ScoreCube.load(self.score_cube_path)
+        if not cube.is_current(store):
+            logger.warning(f"Khối tổng hợp {self.score_cube_path} đã cũ so với kho điểm, quét lại kho điểm")
+            return None
+        return cube
+    
+    def _subject_stats_from_cube(self, cube, year):
+        """Thống kê từng môn theo tỉnh tra từ khối tổng hợp (ô ALL x môn)"""
+        from score_cube import TAT_CA
+        from combo_distribution import GRID_STEP
+        
+        provinces = [d for d in cube.dia_ban if d.isdigit()]
+        frame, hist = cube.histograms(nam=year, dia_ban=provinces + [TAT_CA], ma_to_hop=TAT_CA)
+        frame = frame.rename(columns={'dia_ban': 'ma_tinh'})
+        frame['so_duoi_5'] = hist[:, :int(round(5.0 / GRID_STEP))].sum(axis=1)
+        frame = frame[['nam', 'ma_tinh', 'mon', 'so_thi_sinh', 'tong', 'tong_binh_phuong', 'so_duoi_5']]
+        
+        province = frame[frame['ma_tinh'] != TAT_CA].sort_values(['ma_tinh', 'mon']).reset_index(drop=True)
+        national = frame[frame['ma_tinh'] == TAT_CA].set_index('mon')[
+            ['so_thi_sinh', 'tong', 'tong_binh_phuong', 'so_duoi_5']
+        ]
+        
+        for df in (province, national):
+            n = df['so_thi_sinh']
+            df['avg_score'] = df['tong'] / n
+            df['std_dev'] = np.sqrt(((df['tong_binh_phuong'] - df['tong'] ** 2 / n) / (n - 1)).clip(lower=0))
+            df['pct_below5'] = df['so_duoi_5'] / n * 100
+        
+        self._year_stats[year] = (national, province)
+        return national, province
+    
+    @staticmethod
+    def _composite_difficulty(avg_score, pct_below5, std_dev, sentiment):
+        """Chỉ số độ khó tổng hợp (0-10, càng cao càng khó); nhận số hoặc mảng"""
+        avg_difficulty = (10 - avg_score) * 1.0      # Điểm thấp = khó
+        pct_difficulty = pct_below5 / 10.0           # % rớt
+        std_difficulty = std_dev * 2.0               # Phân hóa
+        sentiment_difficulty = sentiment * 0.8       # Media
+        
+        return (
+            avg_difficulty * 0.3 + 
+            pct_difficulty * 0.3 + 
+            std_difficulty * 0.2 + 
+            sentiment_difficulty * 0.2
+        )
+    
+    def calculate_subject_difficulty(self, year=None):
         """
         Tính độ khó từng môn dựa trên:
         - Điểm trung bình 
         - Tỷ lệ < 5.0
         - Độ lệch chuẩn (phân hóa)
+        - Cảm xúc báo chí (media_sentiment, mặc định trung tính 5.0)
+        
+        Dữ liệu lấy từ điểm thi từng thí sinh trong kho điểm (mặc định năm mới nhất);
+        nếu không có dữ liệu năm đó thì dùng giá trị dự đoán 2025
         """
+        from score_store import ScoreStore
         
-        # Dữ liệu dự đoán 2025 dựa trên insight
-        predicted_2025 = {
-            'Toán': {
-                'avg_score': 5.3,     # Giảm mạnh từ 6.5
-                'std_dev': 2.1,       # Phân hóa cao
-                'pct_below5': 45.2,   # "Kẻ hủy diệt"
-                'difficulty_sentiment': 8.5  # Media: rất khó
-            },
-            'Anh': {
-                'avg_score': 5.1,     # "Ngang IELTS"  
-                'std_dev': 2.3,       # Phân hóa cực cao
-                'pct_below5': 48.7,   # "Kẻ hủy diệt" 
-                'difficulty_sentiment': 9.0  # Media: khó nhất
-            },
-            'Lý': {
-                'avg_score': 6.8,     # "Dễ thở" như insight
-                'std_dev': 1.4,       # Ít phân hóa
-                'pct_below5': 18.3,   # Thấp
-                'difficulty_sentiment': 4.2  # Media: dễ
-            },
-            'Hóa': {
-                'avg_score': 6.2,     # Trung bình
-                'std_dev': 1.7,       # Vừa phải
-                'pct_below5': 28.1,   # Trung bình
-                'difficulty_sentiment': 5.8  # Media: vừa
-            },
-            'Văn': {
-                'avg_score': 6.9,     # Ổn định
-                'std_dev': 1.2,       # Ít biến động
-                'pct_below5': 15.4,   # Thấp
-                'difficulty_sentiment': 3.8  # Media: dễ
-            },
-            'Sinh': {
-                'avg_score': 6.1,     # Trung bình
-                'std_dev': 1.8,       # Vừa phải  
-                'pct_below5': 31.2,   # Trung bình
-                'difficulty_sentiment': 6.1  # Media: vừa
-            }
-        }
+        available = ScoreStore(self.score_store_path).years()
+        if year is None and available:
+            year = available[-1]
         
-        # Tính composite difficulty score
-        for subject, data in predicted_2025.items():
-            # Normalized scores (0-10, càng cao càng khó)
-            avg_difficulty = (10 - data['avg_score']) * 1.0  # Điểm thấp = khó
-            pct_difficulty = data['pct_below5'] / 10.0       # % rớt
-            std_difficulty = data['std_dev'] * 2.0           # Phân hóa
-            sentiment_difficulty = data['difficulty_sentiment'] * 0.8  # Media
-            
-            # Weighted composite score
-            composite_score = (
-                avg_difficulty * 0.3 + 
-                pct_difficulty * 0.3 + 
-                std_difficulty * 0.2 + 
-                sentiment_difficulty * 0.2
-            )
-            
+        self.subject_data = {}
+        
+        self.year = year
+        
+        if year not in available:
+            logger.warning(f"Không có điểm thi năm {year} trong {self.score_store_path}, "
+                           f"dùng giá trị dự đoán 2025")
+            for subject, data in PREDICTED_2025.items():
+                data = dict(data)
+                data['difficulty_sentiment'] = self.media_sentiment.get(subject, data['difficulty_sentiment'])
+                self.subject_data[subject] = {
+                    **data,
+                    'composite_difficulty': self._composite_difficulty(
+                        data['avg_score'], data['pct_below5'], data['std_dev'], data['difficulty_sentiment']
+                    )
+                }
+            logger.info(f"Calculated difficulty for {len(self.subject_data)} subjects")
+            return self.subject_data
+        
+        national, province = self._subject_stats(year)
+        
+        # Độ khó theo tỉnh (vector hóa trên toàn bảng)
+        province['difficulty_sentiment'] = province['mon'].map(self.media_sentiment).fillna(5.0)
+        province['composite_difficulty'] = self._composite_difficulty(
+            province['avg_score'], province['pct_below5'], province['std_dev'], province['difficulty_sentiment']
+        )
+        self.subject_province_stats[year] = province
+        
+        for subject, row in national.iterrows():
+            sentiment = self.media_sentiment.get(subject, 5.0)
             self.subject_data[subject] = {
-                **data,
-                'composite_difficulty': composite_score
+                'avg_score': round(row['avg_score'], 2),
+                'std_dev': round(row['std_dev'], 2),
+                'pct_below5': round(row['pct_below5'], 1),
+                'difficulty_sentiment': sentiment,
+                'so_thi_sinh': int(row['so_thi_sinh']),
+                'composite_difficulty': self._composite_difficulty(
+                    row['avg_score'], row['pct_below5'], row['std_dev'], sentiment
+                )
             }
-            
+        
         logger.info(f"Calculated difficulty for {len(self.subject_data)} subjects")
         return self.subject_data
     
-    def calculate_combo_difficulty(self):
+    def calculate_combo_difficulty(self, year=None):
         """
         Tính độ khó tổ hợp dựa trên insight:
         - A00: Toán khó + Lý dễ + Hóa trung bình  
@@ -477,8 +850,18 @@ class DifficultyAnalyzer:
         - D01: Văn dễ + Toán khó + Anh cực khó = "Biến động mạnh"
         """
         
-        if not self.subject_data:
-            self.calculate_subject_difficulty()
+        if not self.subject_data or (year is not None and year != self.year):
+            self.calculate_subject_difficulty(year)
+        
+        # Độ khó từ phân phối tổng điểm chung của thí sinh (nếu có dữ liệu năm này)
+        joint_difficulty = {}
+        if self.year in self.combo_scan or self.year in self._year_stats:
+            scan = self.scan_all_combos(self.year)
+            equal = scan[scan['bien_the'] == '1-1-1']
+            joint_difficulty = {
+                frozenset(row[['mon_1', 'mon_2', 'mon_3']]): row['composite_difficulty']
+                for _, row in equal.iterrows()
+            }
             
         for combo_code, subjects in self.combos.items():
             total_difficulty = 0
@@ -497,8 +880,12 @@ class DifficultyAnalyzer:
             # Tính điểm tổng hợp
             avg_difficulty = total_difficulty / len(subjects)
             
+            joint = joint_difficulty.get(frozenset(subjects))
+            if joint is not None and avg_difficulty > 0:
+                # Có điểm thi thực tế: hệ số = độ khó phân phối tổng điểm chung / độ khó TB từng môn
+                insight_modifier = joint / avg_difficulty
             # Bonus/penalty dựa trên insight
-            if combo_code == 'A01':  # Toán + Anh = "Thảm họa"
+            elif combo_code == 'A01':  # Toán + Anh = "Thảm họa"
                 insight_modifier = 1.3  # Tăng 30%
             elif combo_code == 'D01':  # "Biến động mạnh"  
                 insight_modifier = 1.25  # Tăng 25%
@@ -521,6 +908,118 @@ class DifficultyAnalyzer:
             
         return self.combo_difficulty
     
+    def scan_all_combos(self, year=None, weight_variants=None):
+        """
+        Chấm độ khó mọi bộ 3 môn (và các biến thể hệ số) từ phân phối tổng điểm chung
+        của thí sinh; trả về bảng xếp hạng toàn quốc, bảng theo tỉnh lưu ở combo_scan_province
+        """
+        from score_store import ScoreStore
+        from combo_scanner import scan_combos, summarize
+        
+        store = ScoreStore(self.score_store_path)
+        year = year or self.year or store.years()[-1]
+        if year in self.combo_scan and weight_variants is None:
+            return self.combo_scan[year]
+        
+        if not self.subject_data or year != self.year:
+            self.calculate_subject_difficulty(year)
+        
+        moments = scan_combos(store.open_year(year), weight_variants=weight_variants)
+        self.combo_scan_province[year] = summarize(
+            moments, by=('ma_tinh', 'mon_1', 'mon_2', 'mon_3', 'bien_the'))
+        
+        ranked = summarize(moments)
+        
+        # Cảm xúc báo chí của tổ hợp = trung bình 3 môn
+        sentiment = ranked[['mon_1', 'mon_2', 'mon_3']].apply(
+            lambda col: col.map(self.media_sentiment).fillna(5.0)).mean(axis=1)
+        
+        # Cùng công thức với từng môn, trên điểm trung bình/môn của tổ hợp
+        ranked['composite_difficulty'] = self._composite_difficulty(
+            ranked['diem_tb'] / 3, ranked['pct_duoi_nguong'], ranked['do_lech_chuan'] / 3, sentiment)
+        
+        code_of = {frozenset(subjects): code for code, subjects in self.combos.items()}
+        ranked.insert(0, 'ma_to_hop', [
+            code_of.get(frozenset(key), '') for key in zip(ranked['mon_1'], ranked['mon_2'], ranked['mon_3'])
+        ])
+        
+        ranked = ranked.sort_values('composite_difficulty', ascending=False).reset_index(drop=True)
+        ranked['hang_do_kho'] = np.arange(1, len(ranked) + 1)
+        
+        if weight_variants is None:
+            self.combo_scan[year] = ranked
+        
+        logger.info(f"Đã xếp hạng {len(ranked)} tổ hợp/biến thể năm {year}")
+        return ranked
+    
+    def calculate_score_drift(self, top=20, **filters):
+        """
+        Dịch chuyển phân phối điểm giữa các năm liên tiếp (KS, Wasserstein, phân vị)
+        cho mọi (địa bàn, tổ hợp, môn) từ khối tổng hợp; trả về (bảng đầy đủ, bảng xếp hạng)
+        """
+        from score_store import ScoreStore
+        from score_drift import yearly_drift, biggest_shifts
+        
+        cube = self._load_cube(ScoreStore(self.score_store_path))
+        if cube is None:
+            logger.warning("Chưa có khối tổng hợp khớp với kho điểm, bỏ qua phân tích dịch chuyển")
+            return pd.DataFrame(), pd.DataFrame()
+        
+        self.score_drift = yearly_drift(cube, **filters)
+        return self.score_drift, biggest_shifts(self.score_drift, top=top)
+    
+    def calculate_admission_reach(self, year=None, use_priority=True):
+        """
+        Số thí sinh toàn quốc đạt điểm chuẩn từng ngành (điểm xét tuyển có hệ số và
+        điểm ưu tiên, tính trên mọi thí sinh của kho điểm); trả về DataFrame rỗng nếu thiếu dữ liệu
+        """
+        from score_store import ScoreStore
+        from admission_score import admission_reach
+        from combo_distribution import combos_from_to_hop
+
+        store = ScoreStore(self.score_store_path)
+        years = store.years()
+        if not years or not os.path.exists(self.db_path):
+            logger.warning("Chưa có kho điểm hoặc database, bỏ qua tính điểm xét tuyển")
+            return pd.DataFrame()
+        year = year or self.year or years[-1]
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            programs = pd.read_sql_query("SELECT * FROM diem_chuan WHERE nam = ?", conn, params=(int(year),))
+            combos = dict(self.combos, **combos_from_to_hop(pd.read_sql_query("SELECT * FROM to_hop_mon", conn)))
+        finally:
+            conn.close()
+
+        if programs.empty or year not in years:
+            logger.warning(f"Không có điểm chuẩn hoặc điểm thi năm {year}")
+            return pd.DataFrame()
+
+        reach = admission_reach(store.open_year(year), programs, combos, use_priority=use_priority)
+        logger.info(f"Đã tính điểm xét tuyển {len(store.open_year(year))} thí sinh x {len(programs)} ngành năm {year}")
+        return reach
+
+    def calculate_cutoff_forecast(self, max_workers=None):
+        """
+        Dự báo điểm chuẩn năm tới cho từng (trường, ngành, tổ hợp) kèm khoảng dự báo,
+        backtest rolling-origin trên process pool; trả về (bảng dự báo, bảng sai số backtest)
+        """
+        from cutoff_forecast import forecast_cutoffs
+        from star_schema import read_table
+
+        if not os.path.exists(self.db_path):
+            logger.warning("Chưa có database, bỏ qua dự báo điểm chuẩn")
+            return pd.DataFrame(), pd.DataFrame()
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            diem_chuan = read_table(conn, 'diem_chuan')
+            pho_diem = read_table(conn, 'pho_diem')
+        finally:
+            conn.close()
+
+        return forecast_cutoffs(diem_chuan, pho_diem, max_workers=max_workers)
+
     def _get_difficulty_prediction(self, score):
         """Phân loại độ khó"""
         if score >= 7.5:
@@ -532,67 +1031,109 @@ class DifficultyAnalyzer:
         else:
             return "Dễ - Điểm chuẩn có thể tăng"
     
-    def statistical_comparison(self):
+    def _combo_moments(self):
         """
-        Kiểm định thống kê so sánh A00, A01, D01
-        Sử dụng ANOVA và post-hoc tests
+        Moment (số thí sinh, điểm TB, phương sai) của từng tổ hợp để kiểm định
+        Có điểm thi thực tế: tổng điểm thang 30 của mọi bộ 3 môn (biến thể 1-1-1);
+        không có: phân phối giả định quanh chỉ số độ khó (n=100, độ lệch chuẩn 0.5)
         """
+        if self.year in self.combo_scan or self.year in self._year_stats:
+            scan = self.scan_all_combos(self.year)
+            equal = scan[scan['bien_the'] == '1-1-1']
+            labels = [
+                code or f"{m1}-{m2}-{m3}"
+                for code, m1, m2, m3 in zip(equal['ma_to_hop'], equal['mon_1'], equal['mon_2'], equal['mon_3'])
+            ]
+            moments = pd.DataFrame({
+                'combo': labels,
+                'count': equal['so_thi_sinh'].to_numpy(dtype=float),
+                'mean': equal['diem_tb'].to_numpy(),
+                'var': equal['phuong_sai'].to_numpy(),
+                'composite_difficulty': equal['composite_difficulty'].to_numpy()
+            })
+            return moments, 'diem_tong'
+        
+        combos = list(self.combo_difficulty)
+        difficulty = [self.combo_difficulty[c]['final_difficulty'] for c in combos]
+        moments = pd.DataFrame({
+            'combo': combos,
+            'count': 100.0,
+            'mean': difficulty,
+            'var': 0.25,
+            'composite_difficulty': difficulty
+        })
+        return moments, 'difficulty'
+    
+    def _province_moments(self, labels):
+        """Ma trận moment (tỉnh, tổ hợp) theo đúng thứ tự nhãn của kiểm định toàn quốc"""
+        province = self.combo_scan_province[self.year]
+        province = province[province['bien_the'] == '1-1-1']
+        
+        code_of = {frozenset(subjects): code for code, subjects in self.combos.items()}
+        keys = [code_of.get(frozenset(k), '-'.join(k))
+                for k in zip(province['mon_1'], province['mon_2'], province['mon_3'])]
+        province = province.assign(combo=keys)
+        
+        pivot = {
+            col: province.pivot(index='ma_tinh', columns='combo', values=col).reindex(columns=labels)
+            for col in ('so_thi_sinh', 'diem_tb', 'phuong_sai')
+        }
+        return pivot['so_thi_sinh'].index.to_numpy(), pivot
+    
+    def statistical_comparison(self, by_province=False, correction='holm', alpha=0.05):
+        """
+        Kiểm định thống kê so sánh mọi cặp tổ hợp
+        ANOVA + ma trận t-test Welch N x N tính từ moment, hiệu chỉnh Holm/BH trên toàn ma trận
+        by_province=True: thêm ma trận theo từng tỉnh (mỗi tỉnh là một họ kiểm định)
+        """
+        from pairwise_tests import anova_from_moments, compare_all_pairs, pairs_frame
         
         if not self.combo_difficulty:
             self.calculate_combo_difficulty()
-            
-        # Tạo data cho test
-        focus_combos = ['A00', 'A01', 'D01']
-        difficulty_scores = []
-        combo_labels = []
-        
-        for combo in focus_combos:
-            if combo in self.combo_difficulty:
-                # Simulate score distribution  
-                base_score = self.combo_difficulty[combo]['final_difficulty']
-                scores = np.random.normal(base_score, 0.5, 100)  # n=100 mỗi combo
-                
-                difficulty_scores.extend(scores)
-                combo_labels.extend([combo] * 100)
         
-        # DataFrame cho analysis
-        df_test = pd.DataFrame({
-            'combo': combo_labels,
-            'difficulty': difficulty_scores
-        })
+        moments, metric = self._combo_moments()
+        labels = moments['combo'].tolist()
+        n, mean, var = moments['count'].to_numpy(), moments['mean'].to_numpy(), moments['var'].to_numpy()
         
-        # ANOVA test
-        groups = [df_test[df_test['combo'] == combo]['difficulty'] for combo in focus_combos]
-        f_stat, p_value = stats.f_oneway(*groups)
-        
-        # Post-hoc pairwise t-tests
-        pairwise_results = {}
-        for i, combo1 in enumerate(focus_combos):
-            for j, combo2 in enumerate(focus_combos):
-                if i < j:
-                    group1 = df_test[df_test['combo'] == combo1]['difficulty']
-                    group2 = df_test[df_test['combo'] == combo2]['difficulty']
-                    t_stat, t_p = stats.ttest_ind(group1, group2)
-                    
-                    pairwise_results[f"{combo1}_vs_{combo2}"] = {
-                        't_statistic': t_stat,
-                        'p_value': t_p,
-                        'significant': t_p < 0.05,
-                        'effect_size': abs(group1.mean() - group2.mean()) / np.sqrt(
-                            (group1.var() + group2.var()) / 2
-                        )
-                    }
+        matrix = compare_all_pairs(n, mean, var, correction=correction, alpha=alpha)
+        pairs = pairs_frame(labels, matrix)
+        
+        pairwise_results = {
+            f"{row.to_hop_1}_vs_{row.to_hop_2}": {
+                't_statistic': row.t_statistic,
+                'p_value': row.p_value,
+                'p_adjusted': row.p_adjusted,
+                'significant': bool(row.significant),
+                'effect_size': abs(row.effect_size)
+            }
+            for row in pairs.itertuples(index=False)
+        }
+        
+        descriptive = moments.set_index('combo')[['count', 'mean', 'composite_difficulty']]
+        descriptive.insert(2, 'std', np.sqrt(moments['var'].to_numpy()))
         
         results = {
-            'anova': {
-                'f_statistic': f_stat,
-                'p_value': p_value,
-                'significant': p_value < 0.05
-            },
+            'metric': metric,
+            'correction': correction,
+            'anova': anova_from_moments(n, mean, var),
             'pairwise': pairwise_results,
-            'descriptive': df_test.groupby('combo')['difficulty'].describe()
+            'pairs': pairs,
+            'matrix': {
+                key: pd.DataFrame(matrix[key], index=labels, columns=labels)
+                for key in ('t_statistic', 'p_value', 'p_adjusted', 'effect_size')
+            },
+            'descriptive': descriptive
         }
         
+        if by_province and metric == 'diem_tong' and self.year in self.combo_scan_province:
+            provinces, pivot = self._province_moments(labels)
+            province_matrix = compare_all_pairs(
+                pivot['so_thi_sinh'].to_numpy(), pivot['diem_tb'].to_numpy(), pivot['phuong_sai'].to_numpy(),
+                correction=correction, alpha=alpha
+            )
+            results['pairs_by_province'] = pairs_frame(labels, province_matrix, groups=provinces)
+        
+        logger.info(f"Đã kiểm định {len(pairs)} cặp tổ hợp (hiệu chỉnh {correction})")
         return results
     
     def create_difficulty_visualizations(self):
@@ -693,7 +1234,7 @@ class DifficultyAnalyzer:
 ## 📋 Methodology
 - **Framework**: Composite Difficulty Score = f(avg_score, pct_below5, std_dev, sentiment)
 - **Insight weights**: Toán(0.4), Anh(0.4) = "Kẻ hủy diệt"; Lý(0.2) = "Dễ thở"
-- **Statistical tests**: ANOVA + post-hoc t-tests
+- **Statistical tests**: ANOVA + ma trận Welch t-test mọi cặp (hiệu chỉnh Holm/BH)
 
 ## 🎯 Key Findings
 
@@ -719,11 +1260,15 @@ class DifficultyAnalyzer:
 - **Significant difference**: {"✅ Yes" if stats_results['anova']['significant'] else "❌ No"}
 
 ### 📊 Pairwise Comparisons
+- **Tests**: {len(stats_results['pairs'])} cặp, Welch t-test, hiệu chỉnh {stats_results['correction']}
+- **Significant pairs**: {int(stats_results['pairs']['significant'].sum())}
+
 """
         
-        for pair, result in stats_results['pairwise'].items():
-            significance = "✅ Significant" if result['significant'] else "❌ Not significant"
-            report += f"- **{pair}**: p={result['p_value']:.3f}, Effect size={result['effect_size']:.2f} ({significance})\n"
+        for row in stats_results['pairs'].head(10).itertuples(index=False):
+            significance = "✅ Significant" if row.significant else "❌ Not significant"
+            report += (f"- **{row.to_hop_1}_vs_{row.to_hop_2}**: p_adj={row.p_adjusted:.3g}, "
+                       f"Effect size={abs(row.effect_size):.2f} ({significance})\n")
             
         report += f"""
 
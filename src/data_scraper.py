@@ -12,6 +12,7 @@ import random
 import json
 import sqlite3
 import os
+import threading
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
 import logging
@@ -20,12 +21,120 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Các bảng thu thập được, theo thứ tự phụ thuộc (phổ điểm tính từ điểm thi)
+SCRAPE_TABLES = ("to_hop_mon", "diem_chuan", "diem_thi", "pho_diem", "bai_viet")
+
+# Mã tỉnh/thành theo quy chế thi THPT: mã -> (tên, vùng miền)
+TINH_THANH = {
+    "01": ("Hà Nội", "Miền Bắc"), "02": ("TP. Hồ Chí Minh", "Miền Nam"),
+    "03": ("Hải Phòng", "Miền Bắc"), "04": ("Đà Nẵng", "Miền Trung"),
+    "05": ("Hà Giang", "Miền Bắc"), "06": ("Cao Bằng", "Miền Bắc"),
+    "07": ("Lai Châu", "Miền Bắc"), "08": ("Lào Cai", "Miền Bắc"),
+    "09": ("Tuyên Quang", "Miền Bắc"), "10": ("Lạng Sơn", "Miền Bắc"),
+    "11": ("Bắc Kạn", "Miền Bắc"), "12": ("Thái Nguyên", "Miền Bắc"),
+    "13": ("Yên Bái", "Miền Bắc"), "14": ("Sơn La", "Miền Bắc"),
+    "15": ("Phú Thọ", "Miền Bắc"), "16": ("Vĩnh Phúc", "Miền Bắc"),
+    "17": ("Quảng Ninh", "Miền Bắc"), "18": ("Bắc Giang", "Miền Bắc"),
+    "19": ("Bắc Ninh", "Miền Bắc"), "21": ("Hải Dương", "Miền Bắc"),
+    "22": ("Hưng Yên", "Miền Bắc"), "23": ("Hòa Bình", "Miền Bắc"),
+    "24": ("Hà Nam", "Miền Bắc"), "25": ("Nam Định", "Miền Bắc"),
+    "26": ("Thái Bình", "Miền Bắc"), "27": ("Ninh Bình", "Miền Bắc"),
+    "28": ("Thanh Hóa", "Miền Trung"), "29": ("Nghệ An", "Miền Trung"),
+    "30": ("Hà Tĩnh", "Miền Trung"), "31": ("Quảng Bình", "Miền Trung"),
+    "32": ("Quảng Trị", "Miền Trung"), "33": ("Thừa Thiên Huế", "Miền Trung"),
+    "34": ("Quảng Nam", "Miền Trung"), "35": ("Quảng Ngãi", "Miền Trung"),
+    "36": ("Kon Tum", "Miền Trung"), "37": ("Bình Định", "Miền Trung"),
+    "38": ("Gia Lai", "Miền Trung"), "39": ("Phú Yên", "Miền Trung"),
+    "40": ("Đắk Lắk", "Miền Trung"), "41": ("Khánh Hòa", "Miền Trung"),
+    "42": ("Lâm Đồng", "Miền Trung"), "43": ("Bình Phước", "Miền Nam"),
+    "44": ("Bình Dương", "Miền Nam"), "45": ("Ninh Thuận", "Miền Trung"),
+    "46": ("Tây Ninh", "Miền Nam"), "47": ("Bình Thuận", "Miền Trung"),
+    "48": ("Đồng Nai", "Miền Nam"), "49": ("Long An", "Miền Nam"),
+    "50": ("Đồng Tháp", "Miền Nam"), "51": ("An Giang", "Miền Nam"),
+    "52": ("Bà Rịa - Vũng Tàu", "Miền Nam"), "53": ("Tiền Giang", "Miền Nam"),
+    "54": ("Kiên Giang", "Miền Nam"), "55": ("Cần Thơ", "Miền Nam"),
+    "56": ("Bến Tre", "Miền Nam"), "57": ("Vĩnh Long", "Miền Nam"),
+    "58": ("Trà Vinh", "Miền Nam"), "59": ("Sóc Trăng", "Miền Nam"),
+    "60": ("Bạc Liêu", "Miền Nam"), "61": ("Cà Mau", "Miền Nam"),
+    "62": ("Điện Biên", "Miền Bắc"), "63": ("Đắk Nông", "Miền Trung"),
+    "64": ("Hậu Giang", "Miền Nam"),
+}
+
+# Trường -> mã tỉnh/thành nơi đặt trụ sở (tra TINH_THANH để ra tên tỉnh và vùng miền)
+TRUONG_TINH = {
+    "Đại học Bách khoa Hà Nội": "01",
+    "Đại học Quốc gia Hà Nội": "01",
+    "Đại học Kinh tế Quốc dân": "01",
+    "Đại học Y Hà Nội": "01",
+    "Đại học Sư phạm Hà Nội": "01",
+    "Đại học Bách khoa TP.HCM": "02",
+    "Đại học Quốc gia TP.HCM": "02",
+    "Đại học Kinh tế TP.HCM": "02",
+    "Đại học Y Dược TP.HCM": "02",
+    "Đại học Sư phạm TP.HCM": "02",
+}
+
+# Dữ liệu tổ hợp môn chuẩn theo quy định của Bộ GD-ĐT
+TO_HOP_MON = {
+    "A00": {
+        "mon_hoc": ["Toán", "Vật lý", "Hóa học"],
+        "loai": "Khối tự nhiên",
+        "mo_ta": "Phù hợp với các ngành kỹ thuật, công nghệ"
+    },
+    "A01": {
+        "mon_hoc": ["Toán", "Vật lý", "Tiếng Anh"],
+        "loai": "Khối tự nhiên + ngoại ngữ",
+        "mo_ta": "Phù hợp với công nghệ thông tin, kỹ thuật quốc tế"
+    },
+    "B00": {
+        "mon_hoc": ["Toán", "Hóa học", "Sinh học"],
+        "loai": "Khối tự nhiên",
+        "mo_ta": "Phù hợp với y-dược, nông-lâm-ngư"
+    },
+    "B01": {
+        "mon_hoc": ["Toán", "Sinh học", "Tiếng Anh"],
+        "loai": "Khối tự nhiên + ngoại ngữ",
+        "mo_ta": "Phù hợp với y học quốc tế, công nghệ sinh học"
+    },
+    "C00": {
+        "mon_hoc": ["Văn", "Sử", "Địa"],
+        "loai": "Khối xã hội",
+        "mo_ta": "Phù hợp với luật, báo chí, quan hệ quốc tế"
+    },
+    "C01": {
+        "mon_hoc": ["Văn", "Toán", "Vật lý"],
+        "loai": "Khối hỗn hợp",
+        "mo_ta": "Phù hợp với kiến trúc, mỹ thuật công nghiệp"
+    },
+    "D01": {
+        "mon_hoc": ["Văn", "Toán", "Tiếng Anh"],
+        "loai": "Khối hỗn hợp",
+        "mo_ta": "Phù hợp với kinh tế, quản trị kinh doanh"
+    },
+    "D02": {
+        "mon_hoc": ["Văn", "Toán", "Sinh học"],
+        "loai": "Khối hỗn hợp",
+        "mo_ta": "Phù hợp với tâm lý học, khoa học giáo dục"
+    }
+}
+
+# Ngành xét tuyển nhân hệ số 2 một môn của tổ hợp (tên môn viết tắt như trong kho điểm)
+NGANH_MON_HE_SO_2 = {
+    "Sư phạm Toán": "Toán",
+    "Ngôn ngữ Anh": "Anh",
+}
+
+# Tỷ lệ thí sinh theo khu vực / đối tượng ưu tiên (dữ liệu mẫu)
+TY_LE_KHU_VUC = {"KV3": 0.3, "KV2": 0.3, "KV2-NT": 0.25, "KV1": 0.15}
+TY_LE_DOI_TUONG = {"": 0.9, "UT2": 0.07, "UT1": 0.03}
+
 class THPTDataScraper:
     """Class chính để thu thập dữ liệu THPT"""
     
-    def __init__(self, config_file=None):
-        """Khởi tạo scraper với cấu hình"""
-        self.session = requests.Session()
+    def __init__(self, config_file=None, offline=None, config=None):
+        """Khởi tạo scraper với cấu hình (config: dict dùng thay cho file cấu hình)"""
+        self.config = config if config is not None else self._load_config(config_file)
+        self.session = self._create_session(offline)
         self.base_urls = {
             "bgddt": "https://moet.gov.vn",
             "dantri": "https://dantri.com.vn",
@@ -44,61 +153,66 @@ class THPTDataScraper:
         
         self.session.headers.update(self.headers)
         
+        # Ghi database/CSV trên luồng nền khi ingest(background=True); một luồng để giữ thứ tự ghi
+        self._persist_executor = None
+        self._persist_futures = []
+        
+        # Database đã chụp snapshot trong lượt ingest hiện tại (config -> database)
+        self._snapshotted = set()
+        
+        # Số dòng thêm/sửa/xóa của lần lưu gần nhất từng bảng (xem change_capture)
+        self.changes = {}
+        
+        # Tham số tải trang (theo config/settings.json -> scraping)
+        scraping = self.config.get("scraping", {})
+        self.timeout = scraping.get("timeout", 30)
+        self.max_retries = scraping.get("max_retries", 3)
+        self.retry_delay = tuple(scraping.get("retry_delay", (1, 3)))
+        
+        # Số yêu cầu / lần thử lại / trang lỗi của fetch_page (đọc trong đo tải)
+        self.fetch_stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+        
+        # Điều tốc theo host (AIMD + token bucket + ngắt mạch), None nếu tắt trong cấu hình
+        from rate_control import mount
+        self.rate_control = mount(self.session, scraping, self.base_urls.values())
+        
         # Tạo thư mục data nếu chưa có
         os.makedirs("data/raw", exist_ok=True)
         os.makedirs("data/processed", exist_ok=True)
         
+    def _load_config(self, config_file):
+        """Đọc file cấu hình JSON (trả về dict rỗng nếu không có)"""
+        if config_file and os.path.exists(config_file):
+            with open(config_file, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+    
+    def _create_session(self, offline=None):
+        """Tạo session HTTP, mặc định có cache trên đĩa (config -> http_cache)"""
+        cache_config = self.config.get("http_cache", {})
+        if not cache_config.get("enabled", True):
+            return requests.Session()
+        
+        from http_cache import HTTPCache, CachedSession
+        
+        cache = HTTPCache(
+            path=cache_config.get("path", "data/http_cache.db"),
+            ttl=cache_config.get("ttl_seconds", 86400),
+            max_size_mb=cache_config.get("max_size_mb", 500)
+        )
+        if offline is None:
+            offline = cache_config.get("offline", False)
+        
+        return CachedSession(cache, offline=offline)
+    
     def scrape_to_hop_mon(self):
         """Thu thập thông tin các tổ hợp môn chuẩn"""
         logger.info("Đang thu thập thông tin các tổ hợp môn...")
         
-        # Dữ liệu tổ hợp môn chuẩn theo quy định của Bộ GD-ĐT
-        to_hop_data = {
-            "A00": {
-                "mon_hoc": ["Toán", "Vật lý", "Hóa học"],
-                "loai": "Khối tự nhiên",
-                "mo_ta": "Phù hợp với các ngành kỹ thuật, công nghệ"
-            },
-            "A01": {
-                "mon_hoc": ["Toán", "Vật lý", "Tiếng Anh"],
-                "loai": "Khối tự nhiên + ngoại ngữ",
-                "mo_ta": "Phù hợp với công nghệ thông tin, kỹ thuật quốc tế"
-            },
-            "B00": {
-                "mon_hoc": ["Toán", "Hóa học", "Sinh học"],
-                "loai": "Khối tự nhiên",
-                "mo_ta": "Phù hợp với y-dược, nông-lâm-ngư"
-            },
-            "B01": {
-                "mon_hoc": ["Toán", "Sinh học", "Tiếng Anh"],
-                "loai": "Khối tự nhiên + ngoại ngữ",
-                "mo_ta": "Phù hợp với y học quốc tế, công nghệ sinh học"
-            },
-            "C00": {
-                "mon_hoc": ["Văn", "Sử", "Địa"],
-                "loai": "Khối xã hội",
-                "mo_ta": "Phù hợp với luật, báo chí, quan hệ quốc tế"
-            },
-            "C01": {
-                "mon_hoc": ["Văn", "Toán", "Vật lý"],
-                "loai": "Khối hỗn hợp",
-                "mo_ta": "Phù hợp với kiến trúc, mỹ thuật công nghiệp"
-            },
-            "D01": {
-                "mon_hoc": ["Văn", "Toán", "Tiếng Anh"],
-                "loai": "Khối hỗn hợp",
-                "mo_ta": "Phù hợp với kinh tế, quản trị kinh doanh"
-            },
-            "D02": {
-                "mon_hoc": ["Văn", "Toán", "Sinh học"],
-                "loai": "Khối hỗn hợp",
-                "mo_ta": "Phù hợp với tâm lý học, khoa học giáo dục"
-            }
-        }
-        
         # Chuyển thành DataFrame
         rows = []
-        for ma_to_hop, info in to_hop_data.items():
+        for ma_to_hop, info in TO_HOP_MON.items():
             rows.append({
                 "ma_to_hop": ma_to_hop,
                 "mon_1": info["mon_hoc"][0],
@@ -120,19 +234,14 @@ class THPTDataScraper:
         
         # Tạo dữ liệu mẫu để demo
         import random
+        from combo_distribution import MON_VIET_TAT
         
-        truong_list = [
-            "Đại học Bách khoa Hà Nội",
-            "Đại học Quốc gia Hà Nội", 
-            "Đại học Kinh tế Quốc dân",
-            "Đại học Y Hà Nội",
-            "Đại học Sư phạm Hà Nội",
-            "Đại học Bách khoa TP.HCM",
-            "Đại học Quốc gia TP.HCM",
-            "Đại học Kinh tế TP.HCM",
-            "Đại học Y Dược TP.HCM",
-            "Đại học Sư phạm TP.HCM"
-        ]
+        combos = {
+            code: [MON_VIET_TAT.get(mon, mon) for mon in info["mon_hoc"]]
+            for code, info in TO_HOP_MON.items()
+        }
+        
+        truong_list = list(TRUONG_TINH)
         
         to_hop_list = ["A00", "A01", "B00", "B01", "C00", "C01", "D01", "D02"]
         nganh_list = [
@@ -149,6 +258,13 @@ class THPTDataScraper:
                     diem_chuan = round(random.uniform(18.0, 29.5), 2)
                     chi_tieu = random.randint(50, 500)
                     
+                    ma_tinh = TRUONG_TINH[truong]
+                    
+                    # Môn nhân hệ số 2 chỉ áp dụng khi môn đó thuộc tổ hợp xét tuyển
+                    mon_he_so_2 = NGANH_MON_HE_SO_2.get(nganh, "")
+                    if mon_he_so_2 not in combos[to_hop]:
+                        mon_he_so_2 = ""
+                    
                     rows.append({
                         "nam": year,
                         "truong": truong,
@@ -156,7 +272,10 @@ class THPTDataScraper:
                         "ma_to_hop": to_hop,
                         "diem_chuan": diem_chuan,
                         "chi_tieu": chi_tieu,
-                        "vung_mien": "Miền Bắc" if "Hà Nội" in truong else "Miền Nam",
+                        "mon_he_so_2": mon_he_so_2,
+                        "ma_tinh": ma_tinh,
+                        "tinh": TINH_THANH[ma_tinh][0],
+                        "vung_mien": TINH_THANH[ma_tinh][1],
                         "ngay_cap_nhat": datetime.now().strftime("%Y-%m-%d")
                     })
         
@@ -197,19 +316,230 @@ class THPTDataScraper:
         
         return df
     
+    def scrape_diem_thi_sample(self, year_range=(2020, 2024), so_thi_sinh=20000):
+        """Tạo dữ liệu điểm thi từng thí sinh mẫu (demo data)"""
+        logger.info(f"Đang tạo dữ liệu điểm thi mẫu cho năm {year_range[0]}-{year_range[1]}...")
+        
+        import numpy as np
+        
+        # Điểm trung bình và độ lệch chuẩn gần với phổ điểm công bố
+        mon_thi = {
+            "Toán": (6.4, 1.5, 0.2), "Văn": (6.8, 1.3, 0.25), "Anh": (5.4, 1.9, 0.2),
+            "Lý": (6.6, 1.6, 0.25), "Hóa": (6.3, 1.7, 0.25), "Sinh": (6.0, 1.4, 0.25),
+            "Sử": (5.9, 1.6, 0.25), "Địa": (6.6, 1.3, 0.25)
+        }
+        ma_tinh_list = list(TINH_THANH)
+        
+        frames = []
+        for year in range(year_range[0], year_range[1] + 1):
+            rng = np.random.default_rng(year)
+            
+            tinh_idx = rng.integers(0, len(ma_tinh_list), so_thi_sinh)
+            tinh = np.array(ma_tinh_list)[tinh_idx]
+            tinh_effect = rng.normal(0, 0.3, len(ma_tinh_list))[tinh_idx]
+            nang_luc = rng.normal(0, 1, so_thi_sinh)  # Năng lực chung tạo tương quan giữa các môn
+            
+            # Thí sinh chọn bài KHTN (Lý, Hóa, Sinh) hoặc KHXH (Sử, Địa)
+            chon_khtn = rng.random(so_thi_sinh) < 0.45
+            thi_anh = rng.random(so_thi_sinh) < 0.9
+            
+            df = pd.DataFrame({"sbd": 0, "nam": year, "ma_tinh": tinh})
+            for mon, (mean, std, buoc) in mon_thi.items():
+                diem = mean + tinh_effect + 0.6 * std * nang_luc + 0.8 * std * rng.normal(0, 1, so_thi_sinh)
+                diem = np.clip(np.round(diem / buoc) * buoc, 0, 10)
+                
+                if mon in ("Lý", "Hóa", "Sinh"):
+                    diem[~chon_khtn] = np.nan
+                elif mon in ("Sử", "Địa"):
+                    diem[chon_khtn] = np.nan
+                elif mon == "Anh":
+                    diem[~thi_anh] = np.nan
+                
+                df[mon] = diem.round(2)
+            
+            # Khu vực / đối tượng ưu tiên để tính điểm xét tuyển
+            df["khu_vuc"] = rng.choice(list(TY_LE_KHU_VUC), so_thi_sinh, p=list(TY_LE_KHU_VUC.values()))
+            df["doi_tuong"] = rng.choice(list(TY_LE_DOI_TUONG), so_thi_sinh, p=list(TY_LE_DOI_TUONG.values()))
+            
+            # SBD = mã tỉnh (2 chữ số) + số thứ tự (6 chữ số)
+            df = df.sort_values("ma_tinh", kind="stable").reset_index(drop=True)
+            stt = df.groupby("ma_tinh").cumcount() + 1
+            df["sbd"] = df["ma_tinh"].astype(int) * 1_000_000 + stt
+            frames.append(df)
+        
+        df = pd.concat(frames, ignore_index=True)
+        logger.info(f"Đã tạo {len(df)} bản ghi điểm thi mẫu")
+        
+        return df
+    
+    def build_pho_diem(self, df_histograms, df_to_hop, correlations=None):
+        """
+        Tính phổ điểm tổ hợp từ phổ điểm từng môn (tích chập FFT), không cần điểm từng thí sinh
+        Trả về (bảng tóm tắt theo schema pho_diem, bảng phân phối chi tiết)
+        """
+        from combo_distribution import (combos_from_to_hop, convolve_combos,
+                                        summarize_distributions, distributions_frame)
+        
+        groups, codes, P, n_combo = convolve_combos(df_histograms, combos_from_to_hop(df_to_hop), correlations)
+        
+        df_summary = summarize_distributions(groups, codes, P, n_combo)
+        df_summary["ngay_cap_nhat"] = datetime.now().strftime("%Y-%m-%d")
+        
+        return df_summary, distributions_frame(groups, codes, P)
+    
+    def save_to_score_store(self, df, store_path="data/score_store"):
+        """Lưu điểm thi từng thí sinh vào kho .npy memory-mapped, mỗi năm một thư mục"""
+        from score_store import ScoreStore
+        
+        store = ScoreStore(store_path)
+        for year, df_year in df.groupby("nam"):
+            store.write_year(df_year, year=int(year))
+    
+    def build_score_cube(self, df_to_hop, store_path="data/score_store", cube_path="data/score_cube"):
+        """Dựng lại khối tổng hợp (năm x tỉnh/vùng x tổ hợp x môn) từ kho điểm"""
+        from score_store import ScoreStore
+        from score_cube import ScoreCube
+        from combo_distribution import combos_from_to_hop
+        
+        cube = ScoreCube.build(ScoreStore(store_path), combos_from_to_hop(df_to_hop))
+        cube.save(cube_path)
+        return cube
+    
+    def _count(self, key):
+        with self._stats_lock:
+            self.fetch_stats[key] += 1
+    
+    def fetch_page(self, url):
+        """
+        Tải một trang, thử lại khi lỗi mạng; trả về nội dung dạng bytes
+        Khi bật điều tốc, bộ điều tốc của host tự giãn nhịp giữa các lần thử và
+        host đang ngắt mạch bị từ chối ngay, không thử lại
+        """
+        from rate_control import HostUnavailable
+        
+        for attempt in range(1, self.max_retries + 1):
+            self._count('requests')
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                response.raise_for_status()
+                return response.content
+            except requests.RequestException as e:
+                if attempt == self.max_retries or isinstance(e, HostUnavailable):
+                    self._count('failures')
+                    logger.error(f"Không tải được {url}: {e}")
+                    raise
+                self._count('retries')
+                logger.warning(f"Lỗi khi tải {url} (lần {attempt}): {e}")
+                if self.rate_control is None:
+                    time.sleep(random.uniform(*self.retry_delay))
+    
+    def scrape_pages(self, urls, fetch_workers=8, parse_workers=None):
+        """
+        Tải và phân tích nhiều trang tin/trang Bộ GD-ĐT
+        Luồng I/O tải trang, pool tiến trình phân tích HTML song song ngay khi trang về
+        Trả về (DataFrame điểm chuẩn, DataFrame bài viết)
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from page_parser import ParsingPool
+        
+        logger.info(f"Đang tải và phân tích {len(urls)} trang...")
+        
+        cutoff_rows = []
+        articles = []
+        failed = []
+        
+        with ParsingPool(max_workers=parse_workers) as pool, \
+                ThreadPoolExecutor(max_workers=fetch_workers) as fetchers:
+            fetch_futures = {fetchers.submit(self.fetch_page, url): url for url in urls}
+            
+            parse_futures = []
+            for future in as_completed(fetch_futures):
+                url = fetch_futures[future]
+                try:
+                    parse_futures.append(pool.submit(url, future.result()))
+                except requests.RequestException:
+                    failed.append(url)
+            
+            for future in parse_futures:
+                result = future.result()
+                if result['error']:
+                    logger.warning(f"Lỗi khi phân tích {result['url']}: {result['error']}")
+                    failed.append(result['url'])
+                    continue
+                cutoff_rows.extend(result['cutoff_rows'])
+                if result['article']:
+                    articles.append(result['article'])
+        
+        df_cutoff = pd.DataFrame(cutoff_rows)
+        df_articles = pd.DataFrame(articles)
+        
+        logger.info(f"Đã trích xuất {len(df_cutoff)} dòng điểm chuẩn, {len(df_articles)} bài viết "
+                    f"({len(failed)} trang lỗi)")
+        
+        return df_cutoff, df_articles
+    
+    def source_urls(self):
+        """Các trang nguồn (Bộ GD-ĐT, báo giáo dục) khai báo trong cấu hình (config -> data_sources)"""
+        groups = self.config.get("data_sources", {}).values()
+        return [url for group in groups for url in group.values()]
+    
     def save_to_database(self, df, table_name, db_path="data/thpt_data.db"):
-        """Lưu dữ liệu vào SQLite database"""
+        """
+        Lưu dữ liệu vào SQLite database
+        Bảng khai báo trong star_schema.STAR_TABLES được lưu dạng bảng chiều + bảng sự kiện
+        """
+        from star_schema import STAR_TABLES, save_star
+        from change_capture import capture_changes, record_changes, has_changes
+        
         logger.info(f"Đang lưu {len(df)} bản ghi vào bảng {table_name}...")
         
+        existed = os.path.exists(db_path)
+        conn = sqlite3.connect(db_path)
         try:
-            conn = sqlite3.connect(db_path)
-            df.to_sql(table_name, conn, if_exists="replace", index=False)
-            conn.close()
+            # So hash từng dòng với lần lưu trước (chỉ đọc); không có dòng nào đổi thì không ghi lại bảng
+            df, counts, pending = capture_changes(conn, df, table_name)
+            table_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (table_name,)).fetchone() is not None
+            if table_exists and not has_changes(counts):
+                record_changes(conn, counts, pending)
+                conn.commit()
+                self.changes[table_name] = counts
+                logger.info(f"Bảng {table_name} không thay đổi, bỏ qua ghi")
+                return counts
+            
+            # Các bảng bị thay thế toàn bộ: chụp snapshot một lần trước mọi thao tác ghi
+            if existed and db_path not in self._snapshotted:
+                from db_backup import DatabaseBackup
+                
+                backup = DatabaseBackup.from_config(self.config, db_path=db_path)
+                if backup is not None:
+                    backup.snapshot(label="truoc_ghi")
+                self._snapshotted.add(db_path)
+            
+            if table_name in STAR_TABLES:
+                save_star(conn, df, table_name)
+            else:
+                df.to_sql(table_name, conn, if_exists="replace", index=False)
+            
+            # Hash và change_log chỉ ghi sau khi bảng đã ghi xong: ghi lỗi thì lần sau vẫn thấy thay đổi
+            record_changes(conn, counts, pending)
+            conn.commit()
+            self.changes[table_name] = counts
             logger.info(f"Đã lưu thành công vào {db_path}")
+            return counts
             
         except Exception as e:
+            conn.rollback()
             logger.error(f"Lỗi khi lưu database: {e}")
             raise
+        finally:
+            conn.close()
+    
+    def has_changes(self, table):
+        """Bảng có dòng thay đổi ở lần lưu gần nhất (bảng không theo dõi thì coi như có)"""
+        from change_capture import has_changes
+        
+        return table not in self.changes or has_changes(self.changes[table])
     
     def save_to_csv(self, df, filename, folder="data/raw"):
         """Lưu dữ liệu ra file CSV"""
@@ -217,32 +547,122 @@ class THPTDataScraper:
         df.to_csv(filepath, index=False, encoding='utf-8-sig')
         logger.info(f"Đã lưu {len(df)} bản ghi vào {filepath}")
     
-    def run_full_scrape(self, year_range=(2020, 2024)):
-        """Chạy thu thập dữ liệu đầy đủ"""
+    def _persist(self, background, func, *args):
+        """Gọi hàm lưu trữ ngay, hoặc xếp hàng cho luồng ghi nền"""
+        if not background:
+            return func(*args)
+        
+        if self._persist_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+        self._persist_futures.append(self._persist_executor.submit(func, *args))
+    
+    def wait_persisted(self):
+        """Chờ luồng nền ghi xong database/CSV; ném lại lỗi ghi đầu tiên nếu có"""
+        futures, self._persist_futures = self._persist_futures, []
+        for future in futures:
+            future.result()
+    
+    def run_full_scrape(self, year_range=(2020, 2024), background=False):
+        """
+        Chạy thu thập dữ liệu đầy đủ
+        background=True: trả về DataFrame ngay, database/CSV được ghi trên luồng nền (xem wait_persisted)
+        """
         logger.info("Bắt đầu thu thập dữ liệu THPT đầy đủ...")
         
+        data = self.ingest(SCRAPE_TABLES, year_range, background=background)
+        
+        logger.info("Hoàn thành thu thập dữ liệu!")
+        
+        return data
+    
+    def ingest(self, tables, year_range=(2020, 2024), db_path="data/thpt_data.db", background=False,
+               store_path="data/score_store", cube_path="data/score_cube"):
+        """
+        Thu thập và lưu lại chỉ các bảng được yêu cầu (theo thứ tự phụ thuộc của SCRAPE_TABLES)
+        Bảng cần làm đầu vào nhưng không thu thập lại được đọc từ database.
+        Kho điểm luôn được ghi ngay vì phổ điểm và khối tổng hợp đọc lại từ đó;
+        phổ điểm chỉ tính từ các năm trong year_range của kho store_path.
+        """
+        # Lượt ghi nền của lần ingest trước phải xong trước khi đặt lại trạng thái snapshot/thay đổi
+        self.wait_persisted()
+        
+        tables = set(tables)
+        data = {}
+        self._snapshotted = set()
+        self.changes = {}
+        
+        def to_hop():
+            if "to_hop_mon" not in data:
+                conn = sqlite3.connect(db_path)
+                data["to_hop_mon"] = pd.read_sql_query("SELECT * FROM to_hop_mon", conn)
+                conn.close()
+            return data["to_hop_mon"]
+        
+        def persist(func, *args):
+            self._persist(background, func, *args)
+        
         # 1. Thu thập thông tin tổ hợp môn
-        df_to_hop = self.scrape_to_hop_mon()
-        self.save_to_database(df_to_hop, "to_hop_mon")
-        self.save_to_csv(df_to_hop, "to_hop_mon.csv")
+        if "to_hop_mon" in tables:
+            df_to_hop = self.scrape_to_hop_mon()
+            persist(self.save_to_database, df_to_hop, "to_hop_mon", db_path)
+            persist(self.save_to_csv, df_to_hop, "to_hop_mon.csv")
+            data["to_hop_mon"] = df_to_hop
         
         # 2. Thu thập điểm chuẩn
-        df_diem_chuan = self.scrape_diem_chuan_sample(year_range)
-        self.save_to_database(df_diem_chuan, "diem_chuan")
-        self.save_to_csv(df_diem_chuan, "diem_chuan.csv")
+        if "diem_chuan" in tables:
+            df_diem_chuan = self.scrape_diem_chuan_sample(year_range)
+            persist(self.save_to_database, df_diem_chuan, "diem_chuan", db_path)
+            persist(self.save_to_csv, df_diem_chuan, "diem_chuan.csv")
+            data["diem_chuan"] = df_diem_chuan
         
-        # 3. Thu thập phổ điểm
-        df_pho_diem = self.scrape_pho_diem_sample(year_range)
-        self.save_to_database(df_pho_diem, "pho_diem")
-        self.save_to_csv(df_pho_diem, "pho_diem.csv")
+        # 3. Thu thập điểm thi từng thí sinh (lưu dạng nhị phân, không qua CSV)
+        if "diem_thi" in tables:
+            df_diem_thi = self.scrape_diem_thi_sample(year_range)
+            self.save_to_score_store(df_diem_thi, store_path)
+            data["diem_thi"] = df_diem_thi
         
-        logger.info("Hoàn thành thu thập dữ liệu!")
+        if tables & {"to_hop_mon", "diem_thi", "score_cube"}:
+            self.build_score_cube(to_hop(), store_path, cube_path)
         
-        return {
-            "to_hop_mon": df_to_hop,
-            "diem_chuan": df_diem_chuan,
-            "pho_diem": df_pho_diem
-        }
+        # 4. Phổ điểm tổ hợp: tích chập phổ điểm từng môn toàn quốc,
+        #    hiệu chỉnh tương quan giữa các môn từ điểm từng thí sinh
+        if tables & {"to_hop_mon", "diem_thi", "pho_diem"}:
+            from score_store import ScoreStore
+            from combo_distribution import subject_histograms_from_scores, calibrate_correlations
+            
+            # Chỉ các năm đang thu thập: năm cũ còn trong kho không được lẫn vào phổ điểm và tương quan
+            store = ScoreStore(store_path)
+            score_years = [store.open_year(year) for year in store.years()
+                           if year_range[0] <= year <= year_range[1]]
+            if not score_years:
+                raise FileNotFoundError(
+                    f"Không có điểm thi năm {year_range[0]}-{year_range[1]} trong {store_path} để tính phổ điểm")
+            df_histograms = pd.concat(
+                [subject_histograms_from_scores(y, by_province=False) for y in score_years],
+                ignore_index=True
+            )
+            df_pho_diem, df_pho_diem_chi_tiet = self.build_pho_diem(
+                df_histograms, to_hop(), correlations=calibrate_correlations(score_years)
+            )
+            df_pho_diem = df_pho_diem.drop(columns="ma_tinh")
+            persist(self.save_to_database, df_pho_diem, "pho_diem", db_path)
+            persist(self.save_to_database, df_pho_diem_chi_tiet.drop(columns="ma_tinh"), "pho_diem_chi_tiet", db_path)
+            persist(self.save_to_csv, df_pho_diem, "pho_diem.csv")
+            data["pho_diem"] = df_pho_diem
+        
+        # 5. Trang nguồn: bài viết cho phân tích cảm xúc báo chí (main.py --articles);
+        #    dòng điểm chuẩn trích từ trang lưu riêng, không trộn vào bảng diem_chuan.
+        #    Không lấy được trang nào thì giữ file của lần thu thập trước
+        if "bai_viet" in tables:
+            df_cutoff_pages, df_articles = self.scrape_pages(self.source_urls())
+            if not df_articles.empty:
+                persist(self.save_to_csv, df_articles, "bai_viet.csv")
+            if not df_cutoff_pages.empty:
+                persist(self.save_to_csv, df_cutoff_pages, "diem_chuan_trang.csv")
+            data["bai_viet"] = df_articles
+        
+        return data
 
 if __name__ == "__main__":
     # Demo chạy thu thập dữ liệu
@@ -253,4 +673,5 @@ if __name__ == "__main__":
     print(f"Tổ hợp môn: {len(data['to_hop_mon'])} bản ghi")
     print(f"Điểm chuẩn: {len(data['diem_chuan'])} bản ghi") 
     print(f"Phổ điểm: {len(data['pho_diem'])} bản ghi")
+    print(f"Điểm thi: {len(data['diem_thi'])} thí sinh")
     print("\nDữ liệu đã được lưu trong thư mục data/")
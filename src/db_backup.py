@@ -0,0 +1,153 @@
+"""
+Module Sao lưu Database Trực tuyến
+Chụp snapshot thpt_data.db bằng SQLite backup API (sqlite3.Connection.backup) theo từng
+lô trang, nhả khóa giữa các lô để tiến trình đang ghi không bị chặn lâu; giữ số snapshot
+theo giới hạn và khôi phục nhanh bằng chính backup API
+"""
+
+import os
+import re
+import sqlite3
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATTERN = re.compile(r'^(?P<stem>.+)_(?P<time>\d{8}_\d{6}_\d{6})(?:_(?P<label>[\w-]+))?\.db$')
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(source, target, pages, sleep, max_restarts=3):
+    """
+    Sao chép toàn bộ database source -> target theo từng lô `pages` trang
+    Kết nối khác ghi vào source giữa hai lô khiến SQLite chép lại từ đầu; nếu bị chép lại
+    quá max_restarts lần (nguồn ghi liên tục) thì chép nốt trong một bước duy nhất
+    """
+    state = {'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+        logger.debug(f"  Sao lưu: còn {remaining}/{total} trang")
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except _TooManyRestarts:
+        logger.warning(f"Database thay đổi liên tục khi sao lưu, chép một bước sau {max_restarts} lần chép lại")
+        source.backup(target, pages=-1)
+
+
+class DatabaseBackup:
+    """
+    Quản lý snapshot của một file SQLite
+    pages: số trang mỗi bước (nhỏ = người ghi chờ ít hơn), sleep: nghỉ giữa các bước (giây)
+    keep: số snapshot giữ lại, cũ hơn sẽ bị xóa
+    """
+
+    def __init__(self, db_path="data/thpt_data.db", backup_dir="data/backups", keep=5, pages=1024, sleep=0.005):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self.stem = os.path.splitext(os.path.basename(db_path))[0]
+
+    @classmethod
+    def from_config(cls, config, db_path=None):
+        """Tạo từ mục "database" của settings.json; trả về None nếu backup_enabled tắt"""
+        database = config.get("database", {})
+        if not database.get("backup_enabled", False):
+            return None
+        return cls(
+            db_path=db_path or database.get("path", "data/thpt_data.db"),
+            backup_dir=database.get("backup_path", "data/backups"),
+            keep=database.get("backup_keep", 5),
+            pages=database.get("backup_pages", 1024)
+        )
+
+    def snapshots(self):
+        """Danh sách snapshot của database này, cũ nhất trước"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        found = []
+        for name in os.listdir(self.backup_dir):
+            match = SNAPSHOT_PATTERN.match(name)
+            if match and match.group('stem') == self.stem:
+                found.append((match.group('time'), os.path.join(self.backup_dir, name)))
+        return [path for _, path in sorted(found)]
+
+    def snapshot(self, label=None, protect=()):
+        """
+        Chụp snapshot nhất quán trong khi database vẫn được đọc/ghi;
+        ghi vào file tạm rồi đổi tên, sau đó xóa các snapshot vượt quá giới hạn
+        """
+        if not os.path.exists(self.db_path):
+            logger.warning(f"Không có {self.db_path}, bỏ qua sao lưu")
+            return None
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+        name = f"{self.stem}_{datetime.now():%Y%m%d_%H%M%S_%f}"
+        if label:
+            name += f"_{label}"
+        path = os.path.join(self.backup_dir, name + '.db')
+        tmp_path = path + '.tmp'
+
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            _copy(source, target, self.pages, self.sleep)
+        except Exception:
+            target.close()
+            os.remove(tmp_path)
+            raise
+        finally:
+            source.close()
+        target.close()
+        os.replace(tmp_path, path)
+
+        logger.info(f"Đã sao lưu {self.db_path} -> {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+        self.prune(protect={path, *protect})
+        return path
+
+    def prune(self, protect=()):
+        """Xóa các snapshot cũ, chỉ giữ `keep` bản mới nhất (không xóa các bản trong protect)"""
+        snapshots = self.snapshots()
+        removed = []
+        for path in snapshots[:max(len(snapshots) - self.keep, 0)]:
+            if path not in protect:
+                os.remove(path)
+                removed.append(path)
+        if removed:
+            logger.info(f"Đã xóa {len(removed)} snapshot cũ")
+        return removed
+
+    def restore(self, snapshot=None, safety_snapshot=True):
+        """
+        Khôi phục database từ snapshot (mặc định bản mới nhất) bằng backup API ngược chiều,
+        an toàn cả khi có kết nối khác đang mở; chụp lại trạng thái hiện tại trước khi ghi đè
+        """
+        snapshots = self.snapshots()
+        snapshot = snapshot or (snapshots[-1] if snapshots else None)
+        if snapshot is None or not os.path.exists(snapshot):
+            raise FileNotFoundError(f"Không có snapshot để khôi phục trong {self.backup_dir}")
+
+        if safety_snapshot and os.path.exists(self.db_path):
+            # Bản vừa chụp không được đẩy snapshot cần khôi phục ra khỏi giới hạn
+            self.snapshot(label='truoc_khoi_phuc', protect=(snapshot,))
+
+        source = sqlite3.connect(snapshot)
+        target = sqlite3.connect(self.db_path)
+        try:
+            _copy(source, target, -1, 0)
+        finally:
+            source.close()
+            target.close()
+
+        logger.info(f"Đã khôi phục {self.db_path} từ {snapshot}")
+        return snapshot
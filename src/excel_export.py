@@ -0,0 +1,136 @@
+"""
+Module Xuất Excel
+Ghi nhiều bảng kết quả vào một workbook .xlsx duy nhất bằng chế độ constant_memory
+của xlsxwriter: từng dòng được đẩy thẳng xuống file tạm nên bộ nhớ không phụ thuộc
+số dòng; bảng vượt giới hạn dòng của Excel được tách sang các sheet tiếp theo
+"""
+
+import os
+import re
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+EXCEL_MAX_ROWS = 1_048_576
+SHEET_NAME_MAX = 31
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+HEADER_FORMAT = {
+    'bold': True,
+    'font_color': '#FFFFFF',
+    'bg_color': '#1F4E78',
+    'border': 1,
+    'align': 'center',
+    'valign': 'vcenter',
+    'text_wrap': True
+}
+
+
+def _sheet_names(name, n_parts, used):
+    """Tên sheet hợp lệ (<= 31 ký tự, không trùng), thêm hậu tố _2, _3... cho phần tách"""
+    base = INVALID_SHEET_CHARS.sub('_', str(name)) or 'Sheet'
+    names = []
+    for part in range(1, n_parts + 1):
+        suffix = '' if part == 1 else f'_{part}'
+        candidate = base[:SHEET_NAME_MAX - len(suffix)] + suffix
+        k = 1
+        while candidate.lower() in used:
+            k += 1
+            tail = f'{suffix}~{k}'
+            candidate = base[:SHEET_NAME_MAX - len(tail)] + tail
+        used.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+def _cell_values(chunk):
+    """
+    Chuyển một khối DataFrame thành các dòng giá trị Python cho write_row:
+    NaN/NaT -> None (ô trống), thời gian -> chuỗi, Categorical -> giá trị gốc
+    """
+    columns = []
+    for col in chunk.columns:
+        series = chunk[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime('%Y-%m-%d %H:%M:%S')
+        values = series.to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+        columns.append(values)
+    return zip(*columns)
+
+
+class ExcelExporter:
+    """Workbook nhiều sheet ghi theo luồng; dùng như context manager"""
+
+    def __init__(self, path="output/thpt_analysis.xlsx", max_rows=EXCEL_MAX_ROWS, chunk_size=50_000):
+        import xlsxwriter
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.rows_per_sheet = max_rows - 1      # dòng đầu là tiêu đề
+        self.chunk_size = chunk_size
+        self.workbook = xlsxwriter.Workbook(path, {
+            'constant_memory': True, 'strings_to_urls': False, 'nan_inf_to_errors': True
+        })
+        self.header_format = self.workbook.add_format(HEADER_FORMAT)
+        self.sheets = []
+        self._used = set()
+
+    def add_table(self, name, df, index=False):
+        """Ghi một bảng; trả về danh sách tên sheet đã dùng"""
+        if index:
+            df = df.reset_index()
+        if isinstance(df.columns, pd.MultiIndex):
+            df = df.copy()
+            df.columns = ['_'.join(str(level) for level in col if str(level)) for col in df.columns]
+
+        n_parts = max(1, -(-len(df) // self.rows_per_sheet))
+        names = _sheet_names(name, n_parts, self._used)
+        headers = [str(col) for col in df.columns]
+        widths = [min(max(len(h), 10) + 2, 50) for h in headers]
+
+        for part, sheet_name in enumerate(names):
+            worksheet = self.workbook.add_worksheet(sheet_name)
+            worksheet.freeze_panes(1, 0)
+            # constant_memory ghi tuần tự theo dòng: định dạng cột phải đặt trước khi ghi dữ liệu
+            for c, width in enumerate(widths):
+                worksheet.set_column(c, c, width)
+            worksheet.write_row(0, 0, headers, self.header_format)
+
+            start = part * self.rows_per_sheet
+            stop = min(start + self.rows_per_sheet, len(df))
+            row = 1
+            for chunk_start in range(start, stop, self.chunk_size):
+                chunk = df.iloc[chunk_start:min(chunk_start + self.chunk_size, stop)]
+                for values in _cell_values(chunk):
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+
+            if len(df):
+                worksheet.autofilter(0, 0, row - 1, max(len(headers) - 1, 0))
+
+        self.sheets.extend(names)
+        return names
+
+    def close(self):
+        self.workbook.close()
+        logger.info(f"Đã xuất {len(self.sheets)} sheet vào {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_tables(tables, path="output/thpt_analysis.xlsx", **kwargs):
+    """Xuất dict {tên sheet: DataFrame} vào một workbook; bỏ qua bảng rỗng hoặc không phải DataFrame"""
+    with ExcelExporter(path, **kwargs) as exporter:
+        for name, df in tables.items():
+            if isinstance(df, pd.DataFrame) and not df.columns.empty:
+                exporter.add_table(name, df)
+    return path
@@ -0,0 +1,285 @@
+"""
+Module Máy chủ Nguồn Giả lập
+Máy chủ HTTP cục bộ (ThreadingHTTPServer) đóng vai trang Bộ GD-ĐT và các báo để đo tải
+scraper khi không được thử trên trang thật: tra cứu điểm theo SBD, bảng điểm chuẩn và
+bài viết, với độ trễ theo phân phối cấu hình được, tỷ lệ lỗi 5xx, giới hạn tần suất (429)
+và phản hồi nhỏ giọt (slow-loris). Nội dung sinh từ seed nên mỗi lần chạy giống nhau
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+import zlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Hồ sơ tải: độ trễ (ms), tỷ lệ lỗi, giới hạn tần suất (yêu cầu/giây, sức chứa), tỷ lệ nhỏ giọt
+PROFILES = {
+    'nhanh': {
+        'latency': {'phan_phoi': 'co_dinh', 'ms': 2},
+        'ty_le_loi': 0.0,
+        'gioi_han': None,
+        'ty_le_nho_giot': 0.0,
+    },
+    'thuc_te': {
+        'latency': {'phan_phoi': 'lognormal', 'trung_vi_ms': 80, 'sigma': 0.6},
+        'ty_le_loi': 0.02,
+        'gioi_han': {'moi_giay': 50, 'suc_chua': 20},
+        'ty_le_nho_giot': 0.01,
+    },
+    'qua_tai': {
+        'latency': {'phan_phoi': 'lognormal', 'trung_vi_ms': 200, 'sigma': 0.9},
+        'ty_le_loi': 0.1,
+        'gioi_han': {'moi_giay': 10, 'suc_chua': 5},
+        'ty_le_nho_giot': 0.05,
+    },
+}
+
+# Phản hồi nhỏ giọt: số mảnh và thời gian kéo dài (giây)
+SLOW_CHUNKS = 20
+SLOW_SECONDS = 2.0
+
+MON_THI = ("Toán", "Văn", "Anh", "Lý", "Hóa", "Sinh", "Sử", "Địa")
+NGANH = ("Công nghệ thông tin", "Y khoa", "Kinh tế", "Luật", "Sư phạm Toán", "Ngôn ngữ Anh", "Dược học")
+TO_HOP = ("A00", "A01", "B00", "C00", "D01")
+
+
+def load_profile(profile):
+    """Hồ sơ theo tên trong PROFILES, đường dẫn file JSON, hoặc dict (ghi đè lên 'nhanh')"""
+    if isinstance(profile, str):
+        if profile in PROFILES:
+            profile = PROFILES[profile]
+        else:
+            with open(profile, encoding='utf-8') as f:
+                profile = json.load(f)
+    return dict(PROFILES['nhanh'], **(profile or {}))
+
+
+class _TokenBucket:
+    """Giới hạn tần suất chung cho máy chủ: hết token thì trả 429 kèm Retry-After"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Lấy một token; trả về 0 nếu được phục vụ, ngược lại số giây cần chờ"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+def _stable_rng(*parts):
+    """Bộ sinh số ngẫu nhiên cố định theo nội dung yêu cầu (cùng URL -> cùng trang)"""
+    return np.random.default_rng(zlib.crc32('|'.join(map(str, parts)).encode('utf-8')))
+
+
+def render_lookup(sbd, nam, seed=0):
+    """Trang tra cứu điểm một thí sinh"""
+    rng = _stable_rng(seed, 'sbd', sbd, nam)
+    cells = ''.join(
+        f"<tr><td>{mon}</td><td>{np.clip(rng.normal(6.3, 1.6), 0, 10):.2f}</td></tr>" for mon in MON_THI[:6])
+    return (f"<html><head><title>Tra cứu điểm thi {nam}</title></head><body>"
+            f"<h1>Kết quả thi của thí sinh {sbd}</h1>"
+            f"<table><tr><th>Môn</th><th>Điểm</th></tr>{cells}</table></body></html>")
+
+
+def render_cutoff(nam, truong_id, seed=0, rows=40):
+    """Trang bảng điểm chuẩn một trường (tiêu đề cột như bảng của Bộ, có cả cột Mã trường)"""
+    rng = _stable_rng(seed, 'diem_chuan', nam, truong_id)
+    body = []
+    for i in range(rows):
+        to_hop = ', '.join(rng.choice(TO_HOP, size=int(rng.integers(1, 4)), replace=False))
+        body.append(f"<tr><td>{i + 1}</td><td>T{truong_id}</td><td>Trường {truong_id}</td><td>7{i:06d}</td>"
+                    f"<td>{NGANH[i % len(NGANH)]}</td><td>{to_hop}</td><td>{rng.uniform(15, 29):.2f}</td>"
+                    f"<td>{int(rng.integers(20, 300))}</td></tr>")
+    return (f"<html><body><table><caption>Điểm chuẩn năm {nam}</caption>"
+            "<tr><th>STT</th><th>Mã trường</th><th>Tên trường</th><th>Mã ngành</th><th>Tên ngành</th>"
+            "<th>Tổ hợp</th><th>Điểm chuẩn</th><th>Chỉ tiêu</th></tr>"
+            f"{''.join(body)}</table></body></html>")
+
+
+def render_article(article_id, seed=0, paragraphs=12):
+    """Trang bài viết về kỳ thi"""
+    rng = _stable_rng(seed, 'bai_viet', article_id)
+    mon = rng.choice(MON_THI)
+    text = ''.join(
+        f"<p>Đề thi môn {mon} năm nay được nhiều thí sinh nhận xét là "
+        f"{rng.choice(['dễ thở', 'vừa sức', 'khó', 'rất khó'])}, phân hóa tốt. Đoạn {p + 1}.</p>"
+        for p in range(paragraphs))
+    return (f"<html><head><title>Bài {article_id}</title>"
+            f"<meta property=\"article:published_time\" content=\"2024-06-{int(rng.integers(27, 31))}\"></head>"
+            f"<body><h1>Nhận định đề thi môn {mon} (bài {article_id})</h1><article>{text}</article></body></html>")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeSource/1.0'
+    # Header và nội dung gửi riêng; tắt Nagle để không cộng thêm độ trễ ACK vào kết quả đo
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        source = self.server.source
+        parsed = urlparse(self.path)
+        kind, html = source.render(parsed.path, parse_qs(parsed.query))
+        source.count('yeu_cau', kind)
+
+        if kind == 'thong_ke':
+            return self._send(200, json.dumps(source.stats(), ensure_ascii=False), 'application/json')
+        if html is None:
+            return self._send(404, 'Không tìm thấy', 'text/plain')
+
+        wait = source.bucket.take() if source.bucket else 0.0
+        if wait:
+            source.count('429', kind)
+            return self._send(429, 'Quá nhiều yêu cầu', 'text/plain', {'Retry-After': f"{max(1, round(wait))}"})
+
+        time.sleep(source.latency())
+
+        if source.random() < source.profile['ty_le_loi']:
+            source.count('5xx', kind)
+            return self._send(503, 'Lỗi máy chủ', 'text/plain')
+
+        slow = source.random() < source.profile['ty_le_nho_giot']
+        if slow:
+            source.count('nho_giot', kind)
+        source.count('200', kind)
+        self._send(200, html, 'text/html; charset=utf-8', slow=slow)
+
+    def _send(self, status, text, content_type, headers=None, slow=False):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if not slow:
+            self.wfile.write(body)
+            return
+        # Nhỏ giọt: gửi nội dung thành nhiều mảnh cách nhau để giữ kết nối lâu
+        step = max(1, len(body) // SLOW_CHUNKS)
+        for start in range(0, len(body), step):
+            self.wfile.write(body[start:start + step])
+            self.wfile.flush()
+            time.sleep(SLOW_SECONDS / SLOW_CHUNKS)
+
+
+class FakeSourceServer:
+    """
+    Máy chủ nguồn giả lập chạy trên luồng nền
+    Đường dẫn: /tra-cuu?sbd=..&nam=.., /diem-chuan/<nam>/<truong>.html,
+    /bai-viet/<id>.html và /thong-ke (bộ đếm yêu cầu theo loại và mã trạng thái)
+    """
+
+    def __init__(self, profile='nhanh', host='127.0.0.1', port=0, seed=0):
+        self.profile = load_profile(profile)
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+
+        limit = self.profile.get('gioi_han')
+        self.bucket = _TokenBucket(limit['moi_giay'], limit['suc_chua']) if limit else None
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.source = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def lookup_url(self, sbd, nam=2024):
+        return f"{self.url}/tra-cuu?sbd={sbd}&nam={nam}"
+
+    def cutoff_url(self, nam, truong_id):
+        return f"{self.url}/diem-chuan/{nam}/{truong_id}.html"
+
+    def article_url(self, article_id):
+        return f"{self.url}/bai-viet/{article_id}.html"
+
+    def random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def latency(self):
+        """Độ trễ (giây) của một phản hồi theo hồ sơ"""
+        spec = self.profile['latency']
+        with self._rng_lock:
+            if spec['phan_phoi'] == 'lognormal':
+                ms = self._rng.lognormvariate(np.log(spec['trung_vi_ms']), spec['sigma'])
+            elif spec['phan_phoi'] == 'deu':
+                ms = self._rng.uniform(spec['min_ms'], spec['max_ms'])
+            else:
+                ms = spec['ms']
+        return ms / 1000
+
+    def render(self, path, query):
+        """(loại trang, HTML) cho một đường dẫn; HTML None nếu không tồn tại"""
+        parts = [p for p in path.split('/') if p]
+        try:
+            if parts == ['tra-cuu'] and 'sbd' in query:
+                return 'tra_cuu', render_lookup(query['sbd'][0], query.get('nam', ['2024'])[0], self.seed)
+            if len(parts) == 3 and parts[0] == 'diem-chuan' and parts[2].endswith('.html'):
+                return 'diem_chuan', render_cutoff(int(parts[1]), parts[2][:-5], self.seed)
+            if len(parts) == 2 and parts[0] == 'bai-viet' and parts[1].endswith('.html'):
+                return 'bai_viet', render_article(parts[1][:-5], self.seed)
+            if parts == ['thong-ke']:
+                return 'thong_ke', None
+        except ValueError:
+            pass
+        return 'khac', None
+
+    def count(self, event, kind):
+        with self._counts_lock:
+            self._counts[(event, kind)] += 1
+
+    def stats(self):
+        """Bộ đếm: {sự kiện: {loại trang: số lần}} (yeu_cau, 200, 429, 5xx, nho_giot)"""
+        with self._counts_lock:
+            result = {}
+            for (event, kind), n in self._counts.items():
+                result.setdefault(event, {})[kind] = n
+            return result
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-source", daemon=True)
+        self._thread.start()
+        logger.info(f"Máy chủ nguồn giả lập chạy tại {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,201 @@
+"""
+Module Bộ nhớ đệm HTTP trên đĩa
+Lưu nội dung trang (nén zlib) theo URL, tái xác thực bằng ETag/Last-Modified,
+có TTL, giới hạn dung lượng và chế độ offline chỉ đọc từ cache
+"""
+
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import os
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# Header không lưu vì nội dung đã được giải nén
+SKIP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class HTTPCache:
+    """Kho cache HTTP dùng SQLite làm chỉ mục và lưu trữ nội dung nén"""
+
+    def __init__(self, path="data/http_cache.db", ttl=86400, max_size_mb=500):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_accessed ON http_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, url):
+        """Lấy bản ghi cache của URL (None nếu chưa có)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, etag, last_modified, stored_at FROM http_cache WHERE url = ?",
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE http_cache SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+        status, headers, body, etag, last_modified, stored_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': json.loads(headers),
+            'body': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at
+        }
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def put(self, url, response):
+        """Lưu response 200 vào cache"""
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        if 'no-store' in cache_control:
+            return
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS}
+        body = zlib.compress(response.content, 6)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.status_code, json.dumps(headers), body, len(body),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now)
+            )
+            self._conn.commit()
+            self._evict()
+
+    def revalidated(self, url, response):
+        """Server trả 304: làm mới thời điểm lưu và cập nhật validator nếu có"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE http_cache SET stored_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), response.headers.get('ETag'), response.headers.get('Last-Modified'), url)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        """Xóa các bản ghi ít được truy cập nhất cho đến khi dưới giới hạn dung lượng"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        removed = 0
+        for url, size in self._conn.execute(
+                "SELECT url, size FROM http_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_size:
+                break
+            self._conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            total -= size
+            removed += 1
+
+        self._conn.commit()
+        logger.info(f"Đã xóa {removed} trang khỏi cache HTTP (giới hạn dung lượng)")
+
+    def size(self):
+        """Tổng dung lượng (bytes, đã nén) và số trang trong cache"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM http_cache").fetchone()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM http_cache")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _build_response(entry, request=None):
+    """Dựng requests.Response từ bản ghi cache"""
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = entry['body']
+    response.url = entry['url']
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.request = request
+    response.from_cache = True
+    return response
+
+
+class CachedSession(requests.Session):
+    """requests.Session có cache HTTP có điều kiện cho các yêu cầu GET"""
+
+    def __init__(self, cache, offline=False):
+        super().__init__()
+        self.cache = cache
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def request(self, method, url, *args, refresh=False, **kwargs):
+        """refresh=True: luôn hỏi lại server dù bản cache còn hạn (vẫn cập nhật cache)"""
+        if method.upper() != 'GET':
+            return super().request(method, url, *args, **kwargs)
+
+        # Khóa cache là URL đầy đủ sau khi ghép params (tra cứu cùng trang với SBD khác là trang khác)
+        params = args[0] if args else kwargs.get('params')
+        key = requests.Request(method, url, params=params).prepare().url
+        entry = self.cache.get(key)
+
+        # Chế độ offline: chỉ phục vụ từ cache, không gọi mạng
+        if self.offline:
+            if entry is None:
+                raise requests.ConnectionError(f"Chế độ offline: {key} chưa có trong cache")
+            self.stats['hits'] += 1
+            return _build_response(entry)
+
+        if entry is not None and not refresh and self.cache.is_fresh(entry):
+            self.stats['hits'] += 1
+            return _build_response(entry)
+
+        # Hết hạn: gửi yêu cầu có điều kiện để server trả 304 nếu không đổi
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = super().request(method, url, *args, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.stats['revalidated'] += 1
+            self.cache.revalidated(key, response)
+            return _build_response(entry, response.request)
+
+        self.stats['misses'] += 1
+        if response.status_code == 200:
+            self.cache.put(key, response)
+        response.from_cache = False
+        return response
@@ -0,0 +1,159 @@
+"""
+Module Đo tải Scraper
+Chạy THPTDataScraper với máy chủ nguồn giả lập (fake_source) và đo thông lượng,
+phân vị độ trễ, số lần thử lại và bộ nhớ cho từng giai đoạn: tra cứu SBD (chỉ tải trang)
+và tải + phân tích trang điểm chuẩn/bài viết (scrape_pages). Cùng hồ sơ và seed cho
+cùng tải nên so sánh được các thay đổi của phần tải trang mà không cần mạng
+"""
+
+import copy
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+
+
+def _peak_rss_mb(who=None):
+    """Bộ nhớ thường trú lớn nhất (MB) của tiến trình hoặc các tiến trình con; None nếu không đo được"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if who == 'children' else resource.RUSAGE_SELF)
+    return usage.ru_maxrss / 1024
+
+
+class _Timer:
+    """Bọc fetch_page của scraper để ghi độ trễ từng trang (tính cả các lần thử lại)"""
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        start = time.perf_counter()
+        try:
+            return self.fetch(url)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.latencies.append(elapsed)
+
+    def take(self):
+        with self.lock:
+            latencies, self.latencies = self.latencies, []
+        return np.array(latencies)
+
+
+def _server_counts(before, after, kinds):
+    """Chênh lệch bộ đếm của máy chủ giữa hai thời điểm, cộng theo các loại trang"""
+    def total(stats, event):
+        return sum(stats.get(event, {}).get(kind, 0) for kind in kinds)
+    return {event: total(after, event) - total(before, event) for event in ('yeu_cau', '429', '5xx', 'nho_giot')}
+
+
+def _phase_row(name, n_urls, ok, elapsed, latencies, fetch_before, fetch_after, server):
+    row = {
+        'giai_doan': name,
+        'so_url': n_urls,
+        'thanh_cong': ok,
+        'loi': n_urls - ok,
+        'thoi_gian_s': round(elapsed, 3),
+        'trang_moi_giay': round(ok / elapsed, 2) if elapsed > 0 else np.nan,
+    }
+    for p in PERCENTILES:
+        row[f'p{p}_ms'] = round(float(np.percentile(latencies, p)) * 1000, 1) if len(latencies) else np.nan
+    row['max_ms'] = round(float(latencies.max()) * 1000, 1) if len(latencies) else np.nan
+    row['so_yeu_cau'] = fetch_after['requests'] - fetch_before['requests']
+    row['so_thu_lai'] = fetch_after['retries'] - fetch_before['retries']
+    row['may_chu_429'] = server['429']
+    row['may_chu_5xx'] = server['5xx']
+    row['may_chu_nho_giot'] = server['nho_giot']
+    return row
+
+
+def run_load_test(profile='thuc_te', lookups=200, cutoff_pages=20, articles=20, fetch_workers=8,
+                  parse_workers=None, config=None, seed=0):
+    """
+    Đo tải scraper với máy chủ giả lập theo hồ sơ (xem fake_source.PROFILES)
+    config: cấu hình scraper (mục "scraping"); cache HTTP luôn tắt để mọi yêu cầu đi qua máy chủ
+    Trả về dict: hồ sơ, danh sách dòng kết quả từng giai đoạn, bộ nhớ, bộ đếm máy chủ
+    """
+    from data_scraper import THPTDataScraper
+    from fake_source import FakeSourceServer
+
+    config = copy.deepcopy(config or {})
+    config['http_cache'] = dict(config.get('http_cache', {}), enabled=False)
+
+    rss_start = _peak_rss_mb()
+    rows = []
+    with FakeSourceServer(profile, seed=seed) as server:
+        scraper = THPTDataScraper(config=config)
+        timer = _Timer(scraper.fetch_page)
+        scraper.fetch_page = timer
+
+        # Giai đoạn 1: tra cứu điểm theo SBD, chỉ tải trang
+        urls = [server.lookup_url(1_000_000 + i) for i in range(lookups)]
+        fetch_before, server_before = dict(scraper.fetch_stats), server.stats()
+        start = time.perf_counter()
+
+        def lookup(url):
+            try:
+                timer(url)
+                return True
+            except requests.RequestException:
+                return False
+
+        with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+            ok = sum(executor.map(lookup, urls))
+        elapsed = time.perf_counter() - start
+        rows.append(_phase_row('tra_cuu_sbd', len(urls), ok, elapsed, timer.take(), fetch_before,
+                               dict(scraper.fetch_stats), _server_counts(server_before, server.stats(), ['tra_cuu'])))
+
+        # Giai đoạn 2: tải + phân tích trang điểm chuẩn và bài viết
+        urls = ([server.cutoff_url(2024, i) for i in range(cutoff_pages)]
+                + [server.article_url(i) for i in range(articles)])
+        fetch_before, server_before = dict(scraper.fetch_stats), server.stats()
+        start = time.perf_counter()
+        df_cutoff, df_articles = scraper.scrape_pages(urls, fetch_workers=fetch_workers, parse_workers=parse_workers)
+        elapsed = time.perf_counter() - start
+        ok = len(set(df_cutoff.get('nguon', []))) + len(df_articles)
+        row = _phase_row('trang_diem_chuan_bai_viet', len(urls), ok, elapsed, timer.take(), fetch_before,
+                         dict(scraper.fetch_stats),
+                         _server_counts(server_before, server.stats(), ['diem_chuan', 'bai_viet']))
+        row['dong_diem_chuan'] = len(df_cutoff)
+        rows.append(row)
+
+        server_stats = server.stats()
+
+    report = {
+        'ho_so': server.profile,
+        'fetch_workers': fetch_workers,
+        'seed': seed,
+        'ket_qua': rows,
+        'bo_nho_mb': {
+            'rss_dinh_truoc': rss_start,
+            'rss_dinh_sau': _peak_rss_mb(),
+            'rss_dinh_tien_trinh_con': _peak_rss_mb('children'),
+        },
+        'may_chu': server_stats,
+        'dieu_toc': scraper.rate_control.stats() if scraper.rate_control else [],
+    }
+    for row in rows:
+        logger.info(f"  - {row['giai_doan']}: {row['trang_moi_giay']} trang/s, p50 {row['p50_ms']} ms, "
+                    f"p99 {row['p99_ms']} ms, {row['so_thu_lai']} lần thử lại, {row['loi']} lỗi")
+    for host in report['dieu_toc']:
+        logger.info(f"  - Điều tốc {host['host']}: {host['toc_do']} yêu cầu/giây, {host['dong_thoi']} đồng thời, "
+                    f"{host['lan_giam']} lần giảm, {host['ngat_mach']} lần ngắt mạch")
+    return report
@@ -6,8 +6,16 @@ MAIN - Hệ thống Thu thập và Phân tích Dữ liệu THPT
 Sử dụng:
     python src/main.py --mode scrape --years 2020-2024
     python src/main.py --mode analyze
+    python src/main.py --mode analyze --pushdown
+    python src/main.py --mode analyze --shard-by nam --workers 4
     python src/main.py --mode report
     python src/main.py --mode full
+    python src/main.py --mode daemon --interval 30
+    python src/main.py --mode backup
+    python src/main.py --mode restore --snapshot data/backups/<file>.db
+    python src/main.py --mode diff --save-baseline
+    python src/main.py --mode diff --baseline output/baseline
+    python src/main.py --mode loadtest --load-profile thuc_te --fetch-workers 16
 """
 
 import argparse
@@ -55,15 +63,23 @@ def parse_arguments():
 Ví dụ sử dụng:
   python src/main.py --mode scrape --years 2020-2024
   python src/main.py --mode analyze  
+  python src/main.py --mode analyze --pushdown
+  python src/main.py --mode analyze --shard-by nam --workers 4
   python src/main.py --mode report
   python src/main.py --mode full --years 2018-2024
   python src/main.py --mode visualize --charts all
+  python src/main.py --mode daemon --interval 30
+  python src/main.py --mode backup
+  python src/main.py --mode restore
+  python src/main.py --mode diff --save-baseline
+  python src/main.py --mode diff
+  python src/main.py --mode loadtest --load-profile qua_tai
         """
     )
     
     parser.add_argument(
         '--mode', 
-        choices=['scrape', 'analyze', 'report', 'visualize', 'insight', 'full'],
+        choices=['scrape', 'analyze', 'report', 'visualize', 'insight', 'full', 'daemon', 'backup', 'restore', 'diff', 'loadtest'],
         required=True,
         help='Chế độ hoạt động của hệ thống'
     )
@@ -97,6 +113,114 @@ Ví dụ sử dụng:
         help='File cấu hình'
     )
     
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Chỉ dùng trang đã có trong cache HTTP, không gọi mạng'
+    )
+    
+    parser.add_argument(
+        '--articles',
+        type=str,
+        default='data/raw/bai_viet.csv',
+        help='File CSV bài báo (tieu_de, noi_dung) cho phân tích cảm xúc'
+    )
+    
+    parser.add_argument(
+        '--pushdown',
+        action='store_true',
+        help='Tính các phép tổng hợp ngay trong database (cho database lớn)'
+    )
+    
+    parser.add_argument(
+        '--shard-by',
+        choices=['nam', 'ma_tinh'],
+        default=None,
+        help='Chia dữ liệu theo năm/tỉnh và tính các bảng tổng hợp song song (ngầm bật --pushdown)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Số tiến trình cho --shard-by và backtest dự báo điểm chuẩn (mặc định theo số CPU)'
+    )
+    
+    parser.add_argument(
+        '--table-format',
+        choices=['csv', 'csv.gz', 'csv.zst', 'parquet'],
+        default='csv',
+        help='Định dạng file bảng kết quả trong output/tables/'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=int,
+        default=None,
+        help='Chu kỳ kiểm tra nguồn ở chế độ daemon, tính bằng phút (mặc định theo config)'
+    )
+    
+    parser.add_argument(
+        '--once',
+        action='store_true',
+        help='Chế độ daemon: chạy một chu kỳ rồi thoát'
+    )
+    
+    parser.add_argument(
+        '--snapshot',
+        type=str,
+        default=None,
+        help='Chế độ restore: file snapshot cần khôi phục (mặc định bản mới nhất)'
+    )
+    
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default='output/baseline',
+        help='Chế độ diff: thư mục bảng kết quả dùng làm mốc so sánh'
+    )
+    
+    parser.add_argument(
+        '--compare',
+        type=str,
+        default='output/tables',
+        help='Chế độ diff: thư mục bảng kết quả cần so với mốc (mặc định lần chạy hiện tại)'
+    )
+    
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Chế độ diff: lưu bảng kết quả hiện tại làm baseline thay vì so sánh'
+    )
+    
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=1e-9,
+        help='Chế độ diff: sai số tương đối/tuyệt đối cho phép khi so cột số'
+    )
+    
+    parser.add_argument(
+        '--load-profile',
+        type=str,
+        default='thuc_te',
+        help='Chế độ loadtest: hồ sơ máy chủ giả lập (nhanh, thuc_te, qua_tai) hoặc file JSON'
+    )
+    
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=200,
+        help='Chế độ loadtest: số lượt tra cứu SBD'
+    )
+    
+    parser.add_argument(
+        '--fetch-workers',
+        type=int,
+        default=8,
+        help='Chế độ loadtest: số luồng tải trang đồng thời'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -117,82 +241,100 @@ def parse_year_range(year_str):
     except ValueError:
         raise ValueError(f"Format năm không hợp lệ: {year_str}. Sử dụng format: 2020-2024 hoặc 2024")
 
-def run_scrape_mode(args, logger):
-    """Chạy chế độ thu thập dữ liệu"""
+def run_scrape_mode(args, logger, scraper=None, background=False):
+    """
+    Chạy chế độ thu thập dữ liệu
+    background=True: database/CSV ghi trên luồng nền, gọi scraper.wait_persisted() trước khi thoát
+    """
     logger.info("=== CHẠY CHỂ ĐỘ THU THẬP DỮ LIỆU ===")
     
     year_range = parse_year_range(args.years)
     logger.info(f"Thu thập dữ liệu từ năm {year_range[0]} đến {year_range[1]}")
     
     # Khởi tạo scraper
-    scraper = THPTDataScraper()
+    if scraper is None:
+        scraper = THPTDataScraper(config_file=args.config, offline=args.offline or None)
     
     # Thu thập dữ liệu
-    data = scraper.run_full_scrape(year_range=year_range)
+    data = scraper.run_full_scrape(year_range=year_range, background=background)
     
     # In kết quả
     print(f"\n✅ Hoàn thành thu thập dữ liệu!")
     print(f"📊 Tổ hợp môn: {len(data['to_hop_mon'])} bản ghi")
     print(f"📈 Điểm chuẩn: {len(data['diem_chuan'])} bản ghi")
     print(f"📉 Phổ điểm: {len(data['pho_diem'])} bản ghi")
+    print(f"📝 Điểm thi: {len(data['diem_thi'])} thí sinh (data/score_store/)")
+    print(f"📰 Bài viết: {len(data['bai_viet'])} bài (data/raw/bai_viet.csv)")
     print(f"💾 Dữ liệu đã lưu trong thư mục data/")
     
     return data
 
-def run_analyze_mode(args, logger):
-    """Chạy chế độ phân tích dữ liệu"""
+def run_analyze_mode(args, logger, frames=None):
+    """
+    Chạy chế độ phân tích dữ liệu
+    frames: DataFrame vừa thu thập trong cùng tiến trình (chế độ full), không đọc lại database
+    """
     logger.info("=== CHẠY CHỂ ĐỘ PHÂN TÍCH DỮ LIỆU ===")
     
     # Kiểm tra file database
     db_path = "data/thpt_data.db"
-    if not os.path.exists(db_path):
+    if frames is None and not os.path.exists(db_path):
         logger.error(f"Không tìm thấy file database: {db_path}")
         print("❌ Lỗi: Chưa có dữ liệu để phân tích!")
         print("💡 Chạy lệnh: python src/main.py --mode scrape trước")
         return None
     
     # Khởi tạo analyzer
-    analyzer = THPTDataAnalyzer(db_path=db_path)
+    analyzer = THPTDataAnalyzer(db_path=db_path, table_format=args.table_format,
+                                shard_by=args.shard_by, workers=args.workers)
     
     # Chạy phân tích
-    results, report = analyzer.run_full_analysis()
+    results, report = analyzer.run_full_analysis(pushdown=args.pushdown, frames=frames)
+    
+    # Gộp mọi bảng kết quả vào một workbook
+    excel_path = analyzer.export_excel()
     
     # In kết quả
     print(f"\n✅ Hoàn thành phân tích dữ liệu!")
     print(f"📋 Số phân tích: {len(results)}")
     print(f"📁 Kết quả lưu trong: output/")
     print(f"📑 Báo cáo tổng quan: output/reports/summary_report.md")
+    print(f"📗 Workbook Excel: {excel_path}")
     
     return results, report
 
-def run_report_mode(args, logger):
-    """Chạy chế độ tạo báo cáo chi tiết"""
+def run_report_mode(args, logger, results=None):
+    """
+    Chạy chế độ tạo báo cáo chi tiết
+    results: kết quả phân tích trong bộ nhớ (chế độ full), không đọc lại các bảng đã ghi
+    """
     logger.info("=== CHẠY CHỂ ĐỘ TẠO BÁO CÁO ===")
     
-    # Kiểm tra các file phân tích
-    required_files = [
-        "output/tables/to_hop_popularity.csv",
-        "output/tables/diem_chuan_trends.csv",
-        "output/tables/difficulty_ranking.csv"
-    ]
-    
-    missing_files = [f for f in required_files if not os.path.exists(f)]
-    if missing_files:
-        logger.error(f"Thiếu file phân tích: {missing_files}")
-        print("❌ Lỗi: Chưa có kết quả phân tích!")
-        print("💡 Chạy lệnh: python src/main.py --mode analyze trước")
-        return None
+    from output_sink import find_table, read_table
+    
+    if results is not None:
+        popularity = results['popularity']
+        trends = results['trends'][0]
+        difficulty = results['difficulty']
+    else:
+        # Kiểm tra các bảng phân tích (bất kỳ định dạng nào: csv, csv.gz, csv.zst, parquet)
+        required_tables = ["to_hop_popularity", "diem_chuan_trends", "difficulty_ranking"]
+        
+        missing_files = [name for name in required_tables if find_table("output/tables", name) is None]
+        if missing_files:
+            logger.error(f"Thiếu file phân tích: {missing_files}")
+            print("❌ Lỗi: Chưa có kết quả phân tích!")
+            print("💡 Chạy lệnh: python src/main.py --mode analyze trước")
+            return None
+        
+        # Đọc các file kết quả
+        popularity = read_table("output/tables", "to_hop_popularity")
+        trends = read_table("output/tables", "diem_chuan_trends")
+        difficulty = read_table("output/tables", "difficulty_ranking")
     
     # Tạo báo cáo chi tiết
     logger.info("Tạo báo cáo chi tiết...")
     
-    # Đọc các file kết quả
-    import pandas as pd
-    
-    popularity = pd.read_csv("output/tables/to_hop_popularity.csv")
-    trends = pd.read_csv("output/tables/diem_chuan_trends.csv")
-    difficulty = pd.read_csv("output/tables/difficulty_ranking.csv")
-    
     # Tạo báo cáo HTML
     html_report = f"""
     <!DOCTYPE html>
@@ -245,17 +387,24 @@ def run_full_mode(args, logger):
     
     print("🚀 Bắt đầu quy trình phân tích THPT đầy đủ...")
     
-    # 1. Thu thập dữ liệu
-    print("\n📥 Bước 1: Thu thập dữ liệu")
-    data = run_scrape_mode(args, logger)
-    
-    # 2. Phân tích dữ liệu  
-    print("\n🔍 Bước 2: Phân tích dữ liệu")
-    results, report = run_analyze_mode(args, logger)
+    # Các bước trao DataFrame trực tiếp cho nhau; database/CSV ghi trên luồng nền
+    scraper = THPTDataScraper(config_file=args.config, offline=args.offline or None)
     
-    # 3. Tạo báo cáo
-    print("\n📊 Bước 3: Tạo báo cáo")
-    html_report = run_report_mode(args, logger)
+    # Bước nào lỗi cũng phải chờ luồng nền ghi xong database/CSV trước khi thoát
+    try:
+        # 1. Thu thập dữ liệu
+        print("\n📥 Bước 1: Thu thập dữ liệu")
+        data = run_scrape_mode(args, logger, scraper=scraper, background=True)
+        
+        # 2. Phân tích dữ liệu  
+        print("\n🔍 Bước 2: Phân tích dữ liệu")
+        results, report = run_analyze_mode(args, logger, frames=data)
+        
+        # 3. Tạo báo cáo
+        print("\n📊 Bước 3: Tạo báo cáo")
+        html_report = run_report_mode(args, logger, results=results)
+    finally:
+        scraper.wait_persisted()
     
     print(f"\n🎉 Hoàn thành toàn bộ quy trình!")
     print(f"📁 Tất cả kết quả trong thư mục: output/")
@@ -282,6 +431,12 @@ def run_insight_analysis(args, logger):
         # Khởi tạo analyzer
         difficulty_analyzer = DifficultyAnalyzer()
         
+        # Cảm xúc báo chí từ các bài viết đã thu thập (nếu có)
+        if os.path.exists(args.articles):
+            import pandas as pd
+            print("📰 Đang chấm điểm cảm xúc báo chí...")
+            difficulty_analyzer.load_media_sentiment(pd.read_csv(args.articles))
+        
         print("🔍 Đang tính toán độ khó từng môn...")
         subject_difficulty = difficulty_analyzer.calculate_subject_difficulty()
         
@@ -289,7 +444,7 @@ def run_insight_analysis(args, logger):
         combo_difficulty = difficulty_analyzer.calculate_combo_difficulty()
         
         print("📊 Đang chạy kiểm định thống kê...")
-        stats_results = difficulty_analyzer.statistical_comparison()
+        stats_results = difficulty_analyzer.statistical_comparison(by_province=True)
         
         print("📈 Đang tạo biểu đồ trực quan...")
         fig1, fig2, fig3 = difficulty_analyzer.create_difficulty_visualizations()
@@ -308,10 +463,19 @@ def run_insight_analysis(args, logger):
             
         # Lưu dữ liệu CSV thay vì JSON để tránh serialization issues
         import pandas as pd
+        from output_sink import OutputSink
+        
+        # Các bảng được ghi trên luồng nền trong khi tính tiếp
+        sink = OutputSink("output/tables", fmt=args.table_format)
         
         # Subject difficulty DataFrame
         subject_df = pd.DataFrame(subject_difficulty).T
-        subject_df.to_csv("output/tables/subject_difficulty.csv")
+        sink.write(subject_df, "subject_difficulty", index=True)
+        
+        # Độ khó từng môn theo tỉnh (khi có điểm thi thực tế)
+        if difficulty_analyzer.year in difficulty_analyzer.subject_province_stats:
+            province_df = difficulty_analyzer.subject_province_stats[difficulty_analyzer.year]
+            sink.write(province_df, "subject_difficulty_by_province")
         
         # Combo difficulty DataFrame  
         combo_data = []
@@ -327,7 +491,53 @@ def run_insight_analysis(args, logger):
             combo_data.append(row)
         
         combo_df = pd.DataFrame(combo_data)
-        combo_df.to_csv("output/tables/combo_difficulty.csv", index=False)
+        sink.write(combo_df, "combo_difficulty")
+        
+        # Xếp hạng mọi bộ 3 môn (khi có điểm thi thực tế)
+        if difficulty_analyzer.year in difficulty_analyzer.combo_scan:
+            scan_df = difficulty_analyzer.combo_scan[difficulty_analyzer.year]
+            sink.write(scan_df, "combo_scan")
+        
+        # Dịch chuyển phân phối điểm giữa các năm (khi có khối tổng hợp)
+        drift_df, top_shifts = difficulty_analyzer.calculate_score_drift()
+        if not drift_df.empty:
+            sink.write(drift_df, "score_drift")
+            sink.write(top_shifts, "score_drift_top")
+        
+        # Số thí sinh đạt điểm chuẩn từng ngành (điểm xét tuyển có hệ số + ưu tiên)
+        reach_df = difficulty_analyzer.calculate_admission_reach()
+        if not reach_df.empty:
+            sink.write(reach_df, "admission_reach")
+        
+        # Dự báo điểm chuẩn năm tới từng ngành kèm backtest
+        forecast_df, backtest_df = difficulty_analyzer.calculate_cutoff_forecast(max_workers=args.workers)
+        if not forecast_df.empty:
+            sink.write(forecast_df, "cutoff_forecast")
+            sink.write(backtest_df, "cutoff_backtest")
+        
+        # Kiểm định mọi cặp tổ hợp (và theo tỉnh nếu có điểm thi thực tế)
+        sink.write(stats_results['pairs'], "combo_pairwise_tests")
+        if 'pairs_by_province' in stats_results:
+            sink.write(stats_results['pairs_by_province'], "combo_pairwise_tests_by_province")
+        
+        # Gộp các bảng insight vào một workbook
+        from excel_export import export_tables
+        
+        insight_tables = {
+            'subject_difficulty': subject_df.reset_index(names='mon'),
+            'combo_difficulty': combo_df,
+            'combo_pairwise_tests': stats_results['pairs'],
+            'combo_pairwise_by_province': stats_results.get('pairs_by_province'),
+            'subject_difficulty_province': difficulty_analyzer.subject_province_stats.get(difficulty_analyzer.year),
+            'combo_scan': difficulty_analyzer.combo_scan.get(difficulty_analyzer.year),
+            'score_drift_top': top_shifts,
+            'score_drift': drift_df,
+            'admission_reach': reach_df,
+            'cutoff_forecast': forecast_df,
+            'cutoff_backtest': backtest_df
+        }
+        export_tables(insight_tables, "output/insight_analysis.xlsx")
+        sink.close()
         
         # In kết quả chính
         print("\n" + "="*60)
@@ -345,6 +555,18 @@ def run_insight_analysis(args, logger):
         print(f"\n🔬 ANOVA p-value: {stats_results['anova']['p_value']:.4f}")
         print(f"📈 Significant differences: {'✅ Yes' if stats_results['anova']['significant'] else '❌ No'}")
         
+        if not top_shifts.empty:
+            print("\n🌊 DỊCH CHUYỂN PHÂN PHỐI LỚN NHẤT:")
+            for row in top_shifts.head(5).itertuples(index=False):
+                print(f"• {row.nam_truoc}→{row.nam_sau} {row.dia_ban} {row.ma_to_hop}/{row.mon}: "
+                      f"KS={row.ks:.3f}, W1={row.wasserstein:.2f}, trung vị {row.dich_q50:+.2f}")
+        
+        if not backtest_df.empty:
+            overall = backtest_df[backtest_df['pham_vi'] == 'tat_ca'].set_index('mo_hinh')
+            print(f"\n🔮 DỰ BÁO ĐIỂM CHUẨN {forecast_df['nam_du_bao'].iloc[0]}: {len(forecast_df)} ngành")
+            for model, row in overall.iterrows():
+                print(f"• Backtest {model}: MAE={row['mae']:.2f}, RMSE={row['rmse']:.2f} ({row['so_du_bao']} dự báo)")
+        
         print("\n💡 INSIGHT VALIDATION:")
         a01_score = combo_difficulty['A01']['final_difficulty']
         d01_score = combo_difficulty['D01']['final_difficulty'] 
@@ -360,6 +582,7 @@ def run_insight_analysis(args, logger):
         print("• output/charts/subject_heatmap.html")
         print("• output/charts/insight_breakdown.html")
         print("• output/tables/difficulty_scores.json")
+        print("• output/insight_analysis.xlsx")
         
         return {
             'subject_difficulty': subject_difficulty,
@@ -372,6 +595,214 @@ def run_insight_analysis(args, logger):
         print(f"❌ Lỗi: {e}")
         return None
 
+def run_daemon_mode(args, logger):
+    """
+    Chạy định kỳ: kiểm tra nguồn bằng HEAD/ETag, chỉ thu thập bảng có dữ liệu mới
+    và chỉ chạy lại các phân tích, báo cáo phụ thuộc vào bảng đó
+    """
+    import time
+    import schedule
+    from source_watcher import SourceWatcher, expand_changes
+    
+    logger.info("=== CHẠY CHẾ ĐỘ DAEMON ===")
+    
+    year_range = parse_year_range(args.years)
+    scraper = THPTDataScraper(config_file=args.config, offline=args.offline or None)
+    daemon_config = scraper.config.get("daemon", {})
+    interval = args.interval or daemon_config.get("interval_minutes", 60)
+    
+    watcher = SourceWatcher(
+        scraper.session,
+        daemon_config.get("sources", {}),
+        state_path=daemon_config.get("state_path", "data/source_state.json"),
+        timeout=scraper.timeout
+    )
+    analyzer = THPTDataAnalyzer(db_path="data/thpt_data.db", table_format=args.table_format,
+                                shard_by=args.shard_by, workers=args.workers)
+    
+    history = []
+    # Bảng đã ghi nhưng phân tích chưa tính lại xong (lần sau ingest thấy bảng không đổi nên phải nhớ)
+    pending = []
+    
+    def run_cycle():
+        changed = watcher.poll()
+        
+        # Lần đầu chưa có database thì thu thập đầy đủ
+        if not os.path.exists(analyzer.db_path):
+            from data_scraper import SCRAPE_TABLES
+            changed = list(SCRAPE_TABLES)
+        
+        if not changed and not pending:
+            logger.info("Không có dữ liệu mới")
+            history.append({'thoi_gian': datetime.now(), 'bang': [], 'phan_tich': []})
+            return
+        
+        tables = expand_changes(changed) if changed else []
+        if tables:
+            logger.info(f"Thu thập lại: {tables}")
+            scraper.ingest(tables, year_range)
+        
+        # Nguồn đổi nhưng nội dung bảng không đổi (so hash từng dòng) thì không tính lại
+        tables = [table for table in tables if scraper.has_changes(table)]
+        tables += [table for table in pending if table not in tables]
+        pending[:] = tables
+        
+        rerun = analyzer.refresh(tables, pushdown=args.pushdown)
+        if rerun:
+            analyzer.export_excel()
+            run_report_mode(args, logger)
+        
+        # Phân tích insight đọc kho điểm/khối tổng hợp
+        if set(tables) & {"diem_thi", "score_cube"}:
+            run_insight_analysis(args, logger)
+        
+        # Chỉ ghi nhận trạng thái nguồn khi cả thu thập lẫn phân tích đã xong
+        watcher.commit()
+        pending.clear()
+        
+        print(f"🔄 {datetime.now():%Y-%m-%d %H:%M}: cập nhật {tables}, tính lại {rerun}")
+        history.append({'thoi_gian': datetime.now(), 'bang': tables, 'phan_tich': rerun})
+    
+    def cycle():
+        # Lỗi của một vòng không làm dừng daemon; nguồn chưa commit nên vòng sau làm lại
+        try:
+            run_cycle()
+        except Exception as e:
+            logger.exception(f"Vòng cập nhật lỗi, thử lại ở vòng sau: {e}")
+            history.append({'thoi_gian': datetime.now(), 'bang': [], 'phan_tich': [], 'loi': str(e)})
+    
+    cycle()
+    if args.once:
+        return history
+    
+    schedule.every(interval).minutes.do(cycle)
+    print(f"⏰ Daemon đang chạy, kiểm tra nguồn mỗi {interval} phút (Ctrl+C để dừng)")
+    
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n👋 Đã dừng daemon")
+    
+    return history
+
+def run_backup_mode(args, logger):
+    """Chụp snapshot database (backup) hoặc khôi phục từ snapshot (restore)"""
+    import json
+    from db_backup import DatabaseBackup
+    
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+    
+    # Chạy tay vẫn sao lưu được kể cả khi backup tự động bị tắt
+    database = dict(config.get("database", {}), backup_enabled=True)
+    backup = DatabaseBackup.from_config({"database": database})
+    
+    if args.mode == 'backup':
+        logger.info("=== SAO LƯU DATABASE ===")
+        path = backup.snapshot(label="thu_cong")
+        if path is None:
+            print(f"❌ Không có database {backup.db_path}")
+            return None
+        print(f"💾 Đã sao lưu: {path}")
+    else:
+        logger.info("=== KHÔI PHỤC DATABASE ===")
+        path = backup.restore(args.snapshot)
+        print(f"♻️ Đã khôi phục {backup.db_path} từ {path}")
+    
+    print(f"📚 Snapshot hiện có ({len(backup.snapshots())}/{backup.keep}):")
+    for snapshot in backup.snapshots():
+        print(f"   - {snapshot}")
+    return path
+
+def run_diff_mode(args, logger):
+    """
+    So sánh bảng kết quả của lần chạy hiện tại (--compare) với baseline (--baseline),
+    hoặc lưu baseline mới (--save-baseline); trả về None nếu có khác biệt để dùng làm kiểm tra hồi quy
+    """
+    from output_sink import write_table
+    from table_diff import diff_runs, save_baseline
+    
+    if args.save_baseline:
+        logger.info("=== LƯU BASELINE KẾT QUẢ ===")
+        try:
+            names = save_baseline(args.compare, args.baseline)
+        except ValueError as e:
+            logger.error(str(e))
+            print(f"❌ {e}")
+            return None
+        print(f"📌 Đã lưu {len(names)} bảng làm baseline: {args.baseline}")
+        return names
+    
+    logger.info("=== SO SÁNH KẾT QUẢ VỚI BASELINE ===")
+    if not os.path.isdir(args.baseline):
+        logger.error(f"Không tìm thấy baseline: {args.baseline}")
+        print("💡 Chạy lệnh: python src/main.py --mode diff --save-baseline trước")
+        return None
+    
+    summary, details = diff_runs(args.baseline, args.compare, rtol=args.tolerance, atol=args.tolerance)
+    
+    diff_dir = os.path.join(args.output, "diff")
+    os.makedirs(diff_dir, exist_ok=True)
+    write_table(summary, os.path.join(diff_dir, "diff_summary.csv"))
+    write_table(details, os.path.join(diff_dir, "diff_details.csv"))
+    
+    changed = summary[~summary['giong_nhau']] if len(summary) else summary
+    print(f"\n🔍 So sánh {args.compare} với {args.baseline}: {len(summary)} bảng, {len(changed)} bảng thay đổi")
+    for row in changed.itertuples():
+        print(f"   - {row.bang} ({row.trang_thai}): +{row.them} -{row.xoa} ~{row.sua}")
+    print(f"📁 Chi tiết: {diff_dir}/")
+    
+    if len(changed):
+        logger.error(f"Kết quả khác baseline ở {len(changed)} bảng")
+        return None
+    print("✅ Kết quả trùng khớp baseline")
+    return summary
+
+def run_loadtest_mode(args, logger):
+    """Đo tải scraper với máy chủ nguồn giả lập cục bộ, không gọi mạng"""
+    import json
+    import pandas as pd
+    from load_test import run_load_test
+    from output_sink import write_table
+    
+    logger.info("=== ĐO TẢI SCRAPER VỚI NGUỒN GIẢ LẬP ===")
+    
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+    
+    report = run_load_test(profile=args.load_profile, lookups=args.requests,
+                           fetch_workers=args.fetch_workers, config=config)
+    
+    os.makedirs(os.path.join(args.output, "reports"), exist_ok=True)
+    os.makedirs(os.path.join(args.output, "tables"), exist_ok=True)
+    report_path = os.path.join(args.output, "reports", "load_test.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    results = pd.DataFrame(report['ket_qua'])
+    write_table(results, os.path.join(args.output, "tables", "load_test.csv"))
+    
+    print(f"\n⏱️ Đo tải hồ sơ '{args.load_profile}' với {args.fetch_workers} luồng tải:")
+    for row in report['ket_qua']:
+        print(f"• {row['giai_doan']}: {row['trang_moi_giay']} trang/s, "
+              f"p50/p90/p99 = {row['p50_ms']}/{row['p90_ms']}/{row['p99_ms']} ms, "
+              f"{row['so_thu_lai']} lần thử lại (429: {row['may_chu_429']}, 5xx: {row['may_chu_5xx']}), "
+              f"{row['loi']} lỗi")
+    for host in report['dieu_toc']:
+        print(f"🚦 Điều tốc {host['host']}: dừng ở {host['toc_do']} yêu cầu/giây, {host['dong_thoi']} đồng thời "
+              f"({host['lan_giam']} lần giảm, {host['ngat_mach']} lần ngắt mạch)")
+    memory = report['bo_nho_mb']
+    if memory['rss_dinh_sau'] is not None:
+        print(f"💾 RSS đỉnh: {memory['rss_dinh_sau']:.0f} MB "
+              f"(tiến trình phân tích: {memory['rss_dinh_tien_trinh_con']:.0f} MB)")
+    print(f"📁 Báo cáo: {report_path}")
+    return report
+
 def main():
     """Hàm chính"""
     # Cấu hình logging
@@ -403,6 +834,18 @@ def main():
         elif args.mode == 'full':
             result = run_full_mode(args, logger)
             
+        elif args.mode == 'daemon':
+            result = run_daemon_mode(args, logger)
+            
+        elif args.mode in ('backup', 'restore'):
+            result = run_backup_mode(args, logger)
+            
+        elif args.mode == 'diff':
+            result = run_diff_mode(args, logger)
+            
+        elif args.mode == 'loadtest':
+            result = run_loadtest_mode(args, logger)
+            
         else:
             logger.error(f"Chế độ không hợp lệ: {args.mode}")
             return 1
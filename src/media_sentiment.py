@@ -0,0 +1,218 @@
+"""
+Module Phân tích Cảm xúc Báo chí về Độ khó Môn thi
+Tìm môn học được nhắc đến trong bài báo bằng một automaton từ khóa biên dịch sẵn,
+chấm điểm cảm xúc "khó/dễ" theo lô trên nhiều tiến trình và cache kết quả theo hash nội dung
+"""
+
+import re
+import json
+import math
+import sqlite3
+import hashlib
+import logging
+import os
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    from textblob import TextBlob
+    TEXTBLOB_AVAILABLE = True
+except ImportError:
+    TEXTBLOB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Từ khóa nhận diện môn học (viết thường, NFC)
+SUBJECT_KEYWORDS = {
+    'Toán': ['môn toán', 'đề toán', 'bài thi toán', 'toán học'],
+    'Văn': ['ngữ văn', 'môn văn', 'đề văn', 'bài thi văn'],
+    'Anh': ['tiếng anh', 'môn anh', 'đề anh', 'ngoại ngữ', 'english'],
+    'Lý': ['vật lý', 'vật lí', 'môn lý', 'môn lí', 'đề lý', 'physics'],
+    'Hóa': ['hóa học', 'hoá học', 'môn hóa', 'môn hoá', 'đề hóa', 'chemistry'],
+    'Sinh': ['sinh học', 'môn sinh', 'đề sinh', 'biology'],
+    'Sử': ['lịch sử', 'môn sử', 'đề sử', 'history'],
+    'Địa': ['địa lý', 'địa lí', 'môn địa', 'đề địa', 'geography'],
+}
+
+# Từ điển độ khó: dương = khó, âm = dễ
+DIFFICULTY_LEXICON = {
+    'cực khó': 2.0, 'rất khó': 1.5, 'quá khó': 1.5, 'khó': 1.0,
+    'hủy diệt': 2.0, 'đánh đố': 1.5, 'gây sốc': 1.0, 'phân hóa cao': 1.0,
+    'phân hóa mạnh': 1.0, 'nhiều câu lạ': 1.0, 'không kịp giờ': 1.0,
+    'điểm thấp': 1.0, 'bật khóc': 1.5, 'ngang ielts': 1.0,
+    'dễ thở': -1.5, 'rất dễ': -1.5, 'dễ': -1.0, 'vừa sức': -1.0,
+    'cơ bản': -0.5, 'nhẹ nhàng': -1.0, 'điểm cao': -1.0, 'điểm 10': -0.5,
+    'không khó': -0.5, 'không dễ': 0.5, 'không hề dễ': 1.0,
+    'difficult': 1.0, 'hard': 1.0, 'easy': -1.0,
+}
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFC', text or '').lower()
+
+
+def _compile_automaton(keywords):
+    """
+    Biên dịch tất cả từ khóa thành một biểu thức chính quy duy nhất
+    Từ dài đứng trước để 'rất khó' được khớp thay vì 'khó'
+    """
+    ordered = sorted(keywords, key=len, reverse=True)
+    return re.compile(r'(?<!\w)(' + '|'.join(re.escape(k) for k in ordered) + r')(?!\w)')
+
+
+SUBJECT_LOOKUP = {kw: subject for subject, kws in SUBJECT_KEYWORDS.items() for kw in kws}
+SUBJECT_AUTOMATON = _compile_automaton(SUBJECT_LOOKUP)
+LEXICON_AUTOMATON = _compile_automaton(DIFFICULTY_LEXICON)
+
+# Đổi từ điển/từ khóa thì cache cũ tự động không còn hợp lệ
+LEXICON_VERSION = hashlib.sha1(
+    json.dumps([SUBJECT_KEYWORDS, DIFFICULTY_LEXICON], ensure_ascii=False, sort_keys=True).encode('utf-8')
+).hexdigest()[:12]
+
+
+def _field(article, key):
+    """Lấy trường văn bản, bỏ qua giá trị thiếu (NaN từ CSV)"""
+    value = article.get(key)
+    return value if isinstance(value, str) else ''
+
+
+def content_hash(article):
+    """Hash nội dung bài viết (tiêu đề + nội dung) kèm phiên bản từ điển"""
+    text = f"{_field(article, 'tieu_de')}\n{_field(article, 'noi_dung')}"
+    return hashlib.sha256((LEXICON_VERSION + text).encode('utf-8')).hexdigest()
+
+
+def score_article(article):
+    """
+    Chấm điểm một bài viết: với mỗi câu có nhắc môn học, cộng điểm từ điển độ khó
+    (và cực tính TextBlob nếu có) cho các môn trong câu đó
+    Trả về {môn: [tổng điểm, số lần nhắc]}
+    """
+    text = _normalize(f"{_field(article, 'tieu_de')}. {_field(article, 'noi_dung')}")
+
+    result = {}
+    for sentence in SENTENCE_SPLIT.split(text):
+        subjects = {SUBJECT_LOOKUP[m] for m in SUBJECT_AUTOMATON.findall(sentence)}
+        if not subjects:
+            continue
+
+        score = sum(DIFFICULTY_LEXICON[m] for m in LEXICON_AUTOMATON.findall(sentence))
+        if TEXTBLOB_AVAILABLE:
+            # TextBlob chỉ hiểu tiếng Anh; câu tiếng Việt cho cực tính ~0
+            score -= TextBlob(sentence).sentiment.polarity
+
+        for subject in subjects:
+            entry = result.setdefault(subject, [0.0, 0])
+            entry[0] += score
+            entry[1] += 1
+
+    return result
+
+
+def _score_batch(batch):
+    return [(key, score_article(article)) for key, article in batch]
+
+
+class SentimentCache:
+    """Cache kết quả chấm điểm từng bài theo hash nội dung (SQLite)"""
+
+    def __init__(self, path="data/sentiment_cache.db"):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment_cache (hash TEXT PRIMARY KEY, result TEXT)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for key, result in self._conn.execute(
+                    f"SELECT hash, result FROM sentiment_cache WHERE hash IN ({placeholders})", chunk):
+                found[key] = json.loads(result)
+        return found
+
+    def put_many(self, items):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO sentiment_cache VALUES (?, ?)",
+            [(key, json.dumps(result, ensure_ascii=False)) for key, result in items]
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class MediaSentimentPipeline:
+    """Pipeline chấm điểm cảm xúc độ khó theo môn từ tập bài báo"""
+
+    def __init__(self, cache_path="data/sentiment_cache.db", batch_size=200, max_workers=None):
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def score_articles(self, articles):
+        """Chấm điểm các bài, chỉ tính lại bài chưa có trong cache"""
+        if isinstance(articles, pd.DataFrame):
+            articles = articles.to_dict('records')
+
+        keyed = {content_hash(article): article for article in articles}
+
+        cache = SentimentCache(self.cache_path)
+        try:
+            results = cache.get_many(keyed)
+            pending = [(key, article) for key, article in keyed.items() if key not in results]
+
+            logger.info(f"Cảm xúc báo chí: {len(results)} bài có trong cache, {len(pending)} bài cần chấm")
+
+            if pending:
+                batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+                if len(batches) == 1:
+                    scored = _score_batch(batches[0])
+                else:
+                    with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                        scored = [item for batch in executor.map(_score_batch, batches) for item in batch]
+
+                cache.put_many(scored)
+                results.update(scored)
+        finally:
+            cache.close()
+
+        return results
+
+    def aggregate(self, results):
+        """
+        Gộp điểm các bài thành chỉ số cảm xúc độ khó theo môn (thang 0-10, 5 = trung tính)
+        """
+        totals = {}
+        for per_article in results.values():
+            for subject, (score, mentions) in per_article.items():
+                entry = totals.setdefault(subject, {'tong_diem': 0.0, 'so_lan_nhac': 0, 'so_bai': 0})
+                entry['tong_diem'] += score
+                entry['so_lan_nhac'] += mentions
+                entry['so_bai'] += 1
+
+        rows = []
+        for subject, entry in totals.items():
+            mean_score = entry['tong_diem'] / entry['so_lan_nhac']
+            rows.append({
+                'mon': subject,
+                'so_bai': entry['so_bai'],
+                'so_lan_nhac': entry['so_lan_nhac'],
+                'diem_cam_xuc_tb': round(mean_score, 3),
+                'difficulty_sentiment': round(5 + 5 * math.tanh(mean_score / 2), 2)
+            })
+
+        return pd.DataFrame(rows, columns=['mon', 'so_bai', 'so_lan_nhac',
+                                           'diem_cam_xuc_tb', 'difficulty_sentiment'])
+
+    def run(self, articles):
+        """Chấm điểm và gộp; trả về DataFrame theo môn"""
+        return self.aggregate(self.score_articles(articles))
@@ -0,0 +1,130 @@
+"""
+Module Kho Mô hình (Model Registry)
+Lưu các mô hình đã huấn luyện (StandardScaler, KMeans...) xuống đĩa theo khóa
+(tên tập đặc trưng, danh sách cột, tham số) kèm dấu vân tay dữ liệu huấn luyện.
+Lần chạy sau dùng lại mô hình để transform/predict dữ liệu mới (ngành, năm mới);
+chỉ huấn luyện lại khi dữ liệu dịch chuyển vượt ngưỡng
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'models.json'
+
+# Độ dịch trung bình tối đa của một đặc trưng, tính theo số độ lệch chuẩn của dữ liệu huấn luyện
+DRIFT_THRESHOLD = 0.5
+
+
+def fingerprint(X):
+    """Dấu vân tay của dữ liệu (giá trị + chỉ số + tên cột), đổi khi bất kỳ ô nào đổi"""
+    X = pd.DataFrame(X)
+    digest = hashlib.sha1(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    digest.update(json.dumps([str(c) for c in X.columns]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def feature_drift(X, mean, std):
+    """Độ dịch lớn nhất của trung bình từng cột so với lúc huấn luyện, đơn vị độ lệch chuẩn"""
+    X = np.asarray(X, dtype=np.float64)
+    if not len(X):
+        return 0.0
+    mean = np.asarray(mean, dtype=np.float64)
+    std = np.asarray(std, dtype=np.float64)
+    std = np.where(std > 0, std, 1.0)
+    with np.errstate(invalid='ignore'):
+        shift = np.abs(np.nanmean(X, axis=0) - mean) / std
+    return float(np.nanmax(shift)) if np.isfinite(shift).any() else 0.0
+
+
+class ModelRegistry:
+    """
+    Kho mô hình trên đĩa: mỗi mô hình một file joblib, chỉ mục trong models.json
+    drift_threshold: ngưỡng feature_drift để huấn luyện lại
+    """
+
+    def __init__(self, path="data/models", drift_threshold=DRIFT_THRESHOLD):
+        self.path = path
+        self.drift_threshold = drift_threshold
+        self.index_path = os.path.join(path, INDEX_FILE)
+        self.index = self._read_index()
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Không đọc được chỉ mục mô hình {self.index_path}: {e}, bắt đầu lại")
+            return {}
+
+    def _write_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def model_key(name, features, params=None):
+        """Khóa của mô hình: tên + cột đặc trưng + tham số"""
+        spec = json.dumps([name, [str(c) for c in features], params or {}], sort_keys=True, default=str)
+        return f"{name}_{hashlib.sha1(spec.encode('utf-8')).hexdigest()[:12]}"
+
+    def fit_or_load(self, name, X, factory, params=None, force=False):
+        """
+        Trả về (mô hình đã huấn luyện, đã_huấn_luyện_lại)
+        Dùng lại mô hình đã lưu khi dữ liệu giống hệt hoặc chỉ dịch chuyển dưới ngưỡng;
+        ngược lại (hoặc force=True) gọi factory(**params).fit(X) và lưu lại
+        """
+        import joblib
+
+        X = pd.DataFrame(X)
+        key = self.model_key(name, X.columns, params)
+        entry = self.index.get(key)
+        file_path = os.path.join(self.path, entry['file']) if entry else None
+        current = fingerprint(X)
+
+        if entry and not force and os.path.exists(file_path):
+            drift = 0.0 if entry['fingerprint'] == current else feature_drift(X, entry['mean'], entry['std'])
+            if drift <= self.drift_threshold:
+                try:
+                    model = joblib.load(file_path)
+                    logger.info(f"Dùng lại mô hình {key} (độ dịch {drift:.3f})")
+                    return model, False
+                except Exception as e:
+                    logger.warning(f"Không tải được mô hình {key}: {e}, huấn luyện lại")
+            else:
+                logger.info(f"Dữ liệu của {key} dịch chuyển {drift:.3f} > {self.drift_threshold}, huấn luyện lại")
+
+        model = factory(**(params or {})).fit(X.to_numpy())
+
+        os.makedirs(self.path, exist_ok=True)
+        file_name = key + '.joblib'
+        joblib.dump(model, os.path.join(self.path, file_name))
+
+        values = X.to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            mean, std = np.nanmean(values, axis=0), np.nanstd(values, axis=0)
+        self.index[key] = {
+            'name': name,
+            'features': [str(c) for c in X.columns],
+            'params': params or {},
+            'fingerprint': current,
+            'file': file_name,
+            'n_rows': len(X),
+            'mean': [None if np.isnan(v) else float(v) for v in mean],
+            'std': [None if np.isnan(v) else float(v) for v in std],
+            'fitted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self._write_index()
+        logger.info(f"Đã huấn luyện và lưu mô hình {key} ({len(X)} dòng)")
+        return model, True
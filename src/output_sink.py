@@ -0,0 +1,151 @@
+"""
+Module Ghi Bảng Kết quả Bất đồng bộ
+Đưa các bảng kết quả vào hàng đợi cho một luồng nền ghi ra đĩa (CSV, CSV nén gzip/zstd
+hoặc Parquet) để phân tích tiếp theo chạy song song với I/O; file được ghi vào
+file tạm rồi đổi tên nên người đọc không bao giờ thấy file dở dang
+"""
+
+import os
+import queue
+import logging
+import threading
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Định dạng -> (đuôi file, kiểu nén của pandas)
+TABLE_FORMATS = {
+    'csv': ('.csv', None),
+    'csv.gz': ('.csv.gz', 'gzip'),
+    'csv.zst': ('.csv.zst', 'zstd'),
+    'parquet': ('.parquet', None),
+}
+
+_STOP = object()
+
+
+def _format_available(fmt):
+    """zstd và parquet là tùy chọn, chỉ dùng khi đã cài thư viện"""
+    try:
+        if fmt == 'csv.zst':
+            import zstandard  # noqa: F401
+        elif fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                import fastparquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def table_path(root, name, fmt='csv'):
+    return os.path.join(root, name + TABLE_FORMATS[fmt][0])
+
+
+def find_table(root, name):
+    """Đường dẫn bảng đã ghi theo bất kỳ định dạng nào, bản mới nhất nếu có nhiều (None nếu chưa có)"""
+    paths = [table_path(root, name, fmt) for fmt in TABLE_FORMATS]
+    paths = [path for path in paths if os.path.exists(path)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def read_table(root, name):
+    """Đọc lại bảng đã ghi, tự nhận định dạng theo đuôi file"""
+    path = find_table(root, name)
+    if path is None:
+        raise FileNotFoundError(f"Không có bảng {name} trong {root}")
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def write_table(df, path, fmt='csv', index=False):
+    """Ghi một bảng vào file tạm cùng thư mục rồi os.replace sang tên thật"""
+    tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+    try:
+        if fmt == 'parquet':
+            df.to_parquet(tmp_path, index=index)
+        else:
+            df.to_csv(tmp_path, index=index, encoding='utf-8-sig', compression=TABLE_FORMATS[fmt][1])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+class OutputSink:
+    """
+    Hàng đợi ghi bảng chạy trên luồng nền
+    write() trả về ngay; flush() chờ mọi bảng đã gửi được ghi xong và báo lỗi nếu có.
+    Bảng đã gửi không được sửa tại chỗ cho tới khi flush() xong.
+    """
+
+    def __init__(self, root="output/tables", fmt='csv', max_pending=16):
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"Định dạng bảng không hợp lệ: {fmt} (chọn {list(TABLE_FORMATS)})")
+        if not _format_available(fmt):
+            logger.warning(f"Thiếu thư viện cho định dạng {fmt}, dùng csv.gz thay thế")
+            fmt = 'csv.gz'
+
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.fmt = fmt
+        self.written = {}
+        self._errors = []
+        # Giới hạn số bảng chờ để bộ nhớ không tăng khi tính nhanh hơn ghi
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="output-sink", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                name, df, index = item
+                path = table_path(self.root, name, self.fmt)
+                write_table(df, path, self.fmt, index=index)
+                self.written[name] = path
+            except Exception as e:
+                logger.error(f"Lỗi khi ghi bảng {item[0]}: {e}")
+                self._errors.append((item[0], e))
+            finally:
+                self._queue.task_done()
+
+    def write(self, df, name, index=False):
+        """Gửi bảng vào hàng đợi ghi (chặn khi hàng đợi đầy)"""
+        self._start()
+        self._queue.put((name, df, index))
+
+    def flush(self):
+        """Rào chắn: chờ ghi xong mọi bảng đã gửi; ném lỗi đầu tiên nếu có bảng ghi thất bại"""
+        self._queue.join()
+        if self._errors:
+            errors, self._errors = self._errors, []
+            name, error = errors[0]
+            raise IOError(f"Ghi thất bại {len(errors)} bảng, đầu tiên là {name}: {error}") from error
+        return dict(self.written)
+
+    def close(self):
+        """Flush rồi dừng luồng nền"""
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_STOP)
+                self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
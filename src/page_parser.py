@@ -0,0 +1,190 @@
+"""
+Module Phân tích Trang HTML
+Trích xuất bảng điểm chuẩn và bài viết từ trang của Bộ GD-ĐT và các báo,
+chỉ dựng cây cho các thẻ cần thiết (SoupStrainer + lxml) và chạy song song trên nhiều tiến trình
+"""
+
+import re
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+# Chỉ dựng cây cho các thẻ này thay vì toàn bộ trang
+TABLE_STRAINER = SoupStrainer('table')
+ARTICLE_STRAINER = SoupStrainer(['article', 'h1', 'title', 'meta'])
+
+# Tên cột chuẩn -> các cách viết thường gặp trong tiêu đề bảng
+CUTOFF_HEADERS = {
+    'truong': ['tên trường', 'trường', 'cơ sở đào tạo'],
+    'ma_nganh': ['mã ngành', 'mã xét tuyển'],
+    'nganh': ['tên ngành', 'ngành', 'chuyên ngành'],
+    'ma_to_hop': ['tổ hợp', 'khối thi', 'khối'],
+    'diem_chuan': ['điểm chuẩn', 'điểm trúng tuyển', 'điểm'],
+    'chi_tieu': ['chỉ tiêu'],
+}
+
+# Cột không dùng nhưng tiêu đề chứa một cách viết ở trên ("Mã trường" chứa "trường")
+SKIPPED_HEADERS = ('mã trường', 'stt', 'ghi chú')
+
+TO_HOP_PATTERN = re.compile(r'\b([A-Z]\d{2})\b')
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def _source_of(url):
+    """Xác định nguồn (bgddt, dantri, ...) từ tên miền"""
+    host = urlparse(url).netloc.lower()
+    for key, domain in (('bgddt', 'moet.gov.vn'), ('dantri', 'dantri.com.vn'),
+                        ('vnexpress', 'vnexpress.net'), ('tuoitre', 'tuoitre.vn')):
+        if host.endswith(domain):
+            return key
+    return host
+
+
+def _clean(text):
+    return ' '.join(text.split())
+
+
+def _to_number(text):
+    """Đọc số kiểu Việt Nam ('24,5' hoặc '24.50'), trả về None nếu không có"""
+    match = NUMBER_PATTERN.search(text or '')
+    if not match:
+        return None
+    return float(match.group().replace(',', '.'))
+
+
+def _map_headers(cells):
+    """
+    Ánh xạ vị trí cột -> tên cột chuẩn; None nếu không phải bảng điểm chuẩn
+    Tiêu đề khớp đúng một cách viết được ưu tiên, sau đó tới cách viết dài (cụ thể) hơn,
+    để "Tên trường" thắng "Trường" bất kể thứ tự cột
+    """
+    candidates = []
+    for idx, cell in enumerate(cells):
+        text = cell.lower().strip(' :')
+        if any(text.startswith(skipped) for skipped in SKIPPED_HEADERS):
+            continue
+        for column, aliases in CUTOFF_HEADERS.items():
+            matched = [alias for alias in aliases if alias in text]
+            if matched:
+                candidates.append((text in aliases, max(map(len, matched)), -idx, idx, column))
+
+    mapping = {}
+    for _, _, _, idx, column in sorted(candidates, reverse=True):
+        if idx not in mapping and column not in mapping.values():
+            mapping[idx] = column
+    mapping = dict(sorted(mapping.items()))
+
+    if 'diem_chuan' not in mapping.values():
+        return None
+    if 'nganh' not in mapping.values() and 'ma_nganh' not in mapping.values():
+        return None
+    return mapping
+
+
+def parse_cutoff_tables(html, url=''):
+    """Trích xuất các dòng điểm chuẩn từ mọi bảng trong trang"""
+    soup = BeautifulSoup(html, 'lxml', parse_only=TABLE_STRAINER)
+
+    rows = []
+    for table in soup.find_all('table'):
+        mapping = None
+        year = None
+        caption = table.find('caption')
+        if caption:
+            found = YEAR_PATTERN.search(caption.get_text())
+            year = int(found.group(1)) if found else None
+
+        for tr in table.find_all('tr'):
+            cells = [_clean(td.get_text(' ')) for td in tr.find_all(['td', 'th'])]
+            if not cells:
+                continue
+
+            # Dòng tiêu đề đầu tiên khớp được định nghĩa cột
+            if mapping is None:
+                mapping = _map_headers(cells)
+                continue
+
+            record = {column: cells[idx] for idx, column in mapping.items() if idx < len(cells)}
+            diem = _to_number(record.get('diem_chuan'))
+            if diem is None:
+                continue
+
+            # Một ngành có thể xét nhiều tổ hợp: "A00, A01, D01"
+            to_hop_codes = TO_HOP_PATTERN.findall(record.get('ma_to_hop', '')) or [None]
+            for to_hop in to_hop_codes:
+                rows.append({
+                    'nam': year,
+                    'truong': record.get('truong'),
+                    'ma_nganh': record.get('ma_nganh'),
+                    'nganh': record.get('nganh'),
+                    'ma_to_hop': to_hop,
+                    'diem_chuan': diem,
+                    'chi_tieu': _to_number(record.get('chi_tieu')),
+                    'nguon': url
+                })
+
+    return rows
+
+
+def parse_article(html, url=''):
+    """Trích xuất tiêu đề, nội dung và ngày đăng của một bài báo"""
+    soup = BeautifulSoup(html, 'lxml', parse_only=ARTICLE_STRAINER)
+
+    article = soup.find('article')
+    if article is None:
+        return None
+
+    heading = soup.find('h1') or soup.find('title')
+    paragraphs = article.find_all('p') or [article]
+    published = soup.find('meta', attrs={'property': 'article:published_time'})
+
+    return {
+        'url': url,
+        'nguon': _source_of(url),
+        'tieu_de': _clean(heading.get_text()) if heading else '',
+        'noi_dung': '\n'.join(_clean(p.get_text(' ')) for p in paragraphs if p.get_text(strip=True)),
+        'ngay_dang': published.get('content') if published else None
+    }
+
+
+def parse_page(page):
+    """Phân tích một trang (url, html) -> dict gồm các dòng điểm chuẩn và bài viết"""
+    url, html = page
+    try:
+        return {
+            'url': url,
+            'cutoff_rows': parse_cutoff_tables(html, url),
+            'article': parse_article(html, url),
+            'error': None
+        }
+    except Exception as e:
+        return {'url': url, 'cutoff_rows': [], 'article': None, 'error': str(e)}
+
+
+class ParsingPool:
+    """Pool tiến trình phân tích HTML, tách biệt với luồng tải trang (I/O)"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def submit(self, url, html):
+        """Gửi một trang vào hàng đợi phân tích, trả về Future"""
+        return self._executor.submit(parse_page, (url, html))
+
+    def map(self, pages, chunksize=16):
+        """Phân tích một loạt trang đã tải"""
+        return list(self._executor.map(parse_page, pages, chunksize=chunksize))
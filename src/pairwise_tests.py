@@ -0,0 +1,141 @@
+"""
+Module Kiểm định Từng cặp Tổ hợp
+Tính ma trận N x N thống kê t (Welch), p-value và effect size cho mọi cặp tổ hợp
+trực tiếp từ moment (số thí sinh, điểm TB, phương sai), có hiệu chỉnh kiểm định bội Holm/BH
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+logger = logging.getLogger(__name__)
+
+CORRECTIONS = ('holm', 'bh', 'none')
+
+
+def welch_matrix(n, mean, var):
+    """
+    Kiểm định t Welch cho mọi cặp (i, j) theo trục cuối
+
+    n, mean, var có dạng (..., N); kết quả có dạng (..., N, N).
+    Nhóm có ít hơn 2 thí sinh cho NaN. Effect size là Cohen's d có dấu
+    (mean_i - mean_j) / sqrt((var_i + var_j) / 2).
+    """
+    n = np.asarray(n, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)
+    var = np.where(n >= 2, np.asarray(var, dtype=np.float64), np.nan)
+
+    se2 = var / n                                           # (..., N)
+    se2_i, se2_j = se2[..., :, None], se2[..., None, :]
+    diff = mean[..., :, None] - mean[..., None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se = np.sqrt(se2_i + se2_j)
+        t = diff / se
+        dof = (se2_i + se2_j) ** 2 / (
+            se2_i ** 2 / (n[..., :, None] - 1) + se2_j ** 2 / (n[..., None, :] - 1)
+        )
+        p = 2 * stats.t.sf(np.abs(t), dof)
+        d = diff / np.sqrt((var[..., :, None] + var[..., None, :]) / 2)
+
+    # Hai nhóm cùng phương sai 0 và cùng điểm TB: không khác biệt
+    same = (se == 0) & (diff == 0)
+    t[same], p[same], d[same] = 0.0, 1.0, 0.0
+
+    return {'t_statistic': t, 'dof': dof, 'p_value': p, 'effect_size': d}
+
+
+def adjust_pvalues(p, method='holm'):
+    """
+    Hiệu chỉnh p-value trên tam giác trên của ma trận (..., N, N)
+    Mỗi ma trận (mỗi tỉnh) là một họ kiểm định; cặp NaN không được tính vào số kiểm định
+    """
+    if method not in CORRECTIONS:
+        raise ValueError(f"Phương pháp hiệu chỉnh không hợp lệ: {method} (chọn {CORRECTIONS})")
+
+    p = np.asarray(p, dtype=np.float64)
+    size = p.shape[-1]
+    iu = np.triu_indices(size, k=1)
+    flat = p[..., iu[0], iu[1]].reshape(-1, len(iu[0]))     # (B, M)
+
+    adjusted = flat.copy()
+    if method != 'none':
+        m = np.sum(~np.isnan(flat), axis=1, keepdims=True)  # số kiểm định hợp lệ mỗi họ
+        order = np.argsort(np.where(np.isnan(flat), np.inf, flat), axis=1)
+        ranked = np.take_along_axis(flat, order, axis=1)
+        rank = np.arange(1, flat.shape[1] + 1)
+
+        if method == 'holm':
+            scaled = np.maximum.accumulate(np.nan_to_num((m - rank + 1) * ranked, nan=-np.inf), axis=1)
+        else:
+            scaled = ranked * m / rank
+            scaled = np.minimum.accumulate(np.nan_to_num(scaled, nan=np.inf)[:, ::-1], axis=1)[:, ::-1]
+
+        scaled = np.where(np.isnan(ranked), np.nan, np.minimum(scaled, 1.0))
+        np.put_along_axis(adjusted, order, scaled, axis=1)
+
+    result = np.full(p.shape, np.nan)
+    upper = adjusted.reshape(p.shape[:-2] + (len(iu[0]),))
+    result[..., iu[0], iu[1]] = upper
+    result[..., iu[1], iu[0]] = upper
+    diag = np.arange(size)
+    result[..., diag, diag] = 1.0
+    return result
+
+
+def anova_from_moments(n, mean, var):
+    """ANOVA một chiều từ moment từng nhóm (bỏ nhóm có ít hơn 2 thí sinh)"""
+    n, mean, var = (np.asarray(a, dtype=np.float64) for a in (n, mean, var))
+    keep = n >= 2
+    n, mean, var = n[keep], mean[keep], var[keep]
+
+    k, total = len(n), n.sum()
+    if k < 2 or total <= k:
+        return {'f_statistic': np.nan, 'p_value': np.nan, 'significant': False}
+
+    grand_mean = (n * mean).sum() / total
+    ss_between = (n * (mean - grand_mean) ** 2).sum()
+    ss_within = ((n - 1) * var).sum()
+    f_stat = (ss_between / (k - 1)) / (ss_within / (total - k)) if ss_within > 0 else np.inf
+    p_value = stats.f.sf(f_stat, k - 1, total - k)
+
+    return {'f_statistic': f_stat, 'p_value': p_value, 'significant': p_value < 0.05}
+
+
+def compare_all_pairs(n, mean, var, correction='holm', alpha=0.05):
+    """Ma trận kiểm định Welch kèm p-value đã hiệu chỉnh và cờ có ý nghĩa"""
+    result = welch_matrix(n, mean, var)
+    result['p_adjusted'] = adjust_pvalues(result['p_value'], correction)
+    result['significant'] = result['p_adjusted'] < alpha
+    return result
+
+
+def pairs_frame(labels, result, groups=None, group_name='ma_tinh'):
+    """
+    Chuyển ma trận kết quả thành bảng dài (một dòng mỗi cặp i < j),
+    sắp theo p-value hiệu chỉnh rồi |effect size| giảm dần
+    """
+    labels = np.asarray(labels, dtype=object)
+    iu = np.triu_indices(len(labels), k=1)
+    columns = ['t_statistic', 'dof', 'p_value', 'p_adjusted', 'effect_size', 'significant']
+
+    if groups is None:
+        frame = pd.DataFrame({'to_hop_1': labels[iu[0]], 'to_hop_2': labels[iu[1]]})
+        for col in columns:
+            frame[col] = result[col][iu]
+    else:
+        n_groups, n_pairs = len(groups), len(iu[0])
+        frame = pd.DataFrame({
+            group_name: np.repeat(np.asarray(groups, dtype=object), n_pairs),
+            'to_hop_1': np.tile(labels[iu[0]], n_groups),
+            'to_hop_2': np.tile(labels[iu[1]], n_groups),
+        })
+        for col in columns:
+            frame[col] = result[col][:, iu[0], iu[1]].ravel()
+
+    frame = frame.dropna(subset=['p_value'])
+    frame['abs_effect'] = frame['effect_size'].abs()
+    frame = frame.sort_values(['p_adjusted', 'abs_effect'], ascending=[True, False])
+    return frame.drop(columns='abs_effect').reset_index(drop=True)
@@ -0,0 +1,375 @@
+"""
+Module Lập kế hoạch Truy vấn (Query Planner)
+Đẩy các phép tổng hợp GROUP BY xuống SQLite để chỉ trả về các bảng tóm tắt nhỏ.
+Tổng và tổng bình phương được cộng chính xác (số hữu tỉ) nên không phụ thuộc thứ tự cộng:
+tính trong bộ nhớ, push-down và chia phân đoạn cho cùng từng bit kết quả
+"""
+
+import math
+import sqlite3
+import logging
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Các phép tổng hợp mà từng phân tích cần: (bảng, cột nhóm, cột đo lường)
+# Mỗi cột đo lường được tóm tắt bằng count/sum/sumsq nên có thể suy ra mean/std
+ANALYSIS_AGGREGATES = {
+    'popularity': [
+        ('diem_chuan', ('ma_to_hop',), ('diem_chuan', 'chi_tieu')),
+    ],
+    'trends': [
+        ('diem_chuan', ('nam', 'ma_to_hop'), ('diem_chuan',)),
+    ],
+    'regional': [
+        ('diem_chuan', ('vung_mien', 'ma_to_hop'), ('diem_chuan',)),
+    ],
+    'difficulty': [
+        ('pho_diem', ('ma_to_hop',), ('diem_trung_binh', 'do_lech_chuan', 'ty_le_dat')),
+        ('diem_chuan', ('ma_to_hop',), ('diem_chuan',)),
+    ],
+    'clusters': [
+        ('pho_diem', ('ma_to_hop',), ('diem_trung_binh', 'do_lech_chuan', 'so_thi_sinh', 'ty_le_dat')),
+        ('diem_chuan', ('ma_to_hop',), ('diem_chuan',)),
+    ],
+}
+
+# Các bảng nhỏ vẫn được tải đầy đủ
+SMALL_TABLES = ('to_hop_mon',)
+
+# Cột dùng để chia phân đoạn khi tính song song (execute_sharded)
+SHARD_COLUMNS = ('nam', 'ma_tinh')
+
+
+def analyses_for_tables(tables):
+    """Các phân tích đọc ít nhất một trong các bảng đã cho (để tính lại có chọn lọc)"""
+    tables = set(tables)
+    return [
+        name for name, specs in ANALYSIS_AGGREGATES.items()
+        if any(table in tables for table, _, _ in specs)
+    ]
+
+
+def aggregate_key(table, group_by):
+    """Khóa định danh một bảng tổng hợp, ví dụ 'diem_chuan:nam,ma_to_hop'"""
+    return f"{table}:{','.join(group_by)}"
+
+
+def _quote(name):
+    """Đặt tên cột/bảng trong dấu nháy kép cho SQLite"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ExactSum:
+    """
+    Tổng chính xác của các giá trị số (bỏ qua NULL/NaN), dùng làm hàm tổng hợp SQLite
+    (exact_sum, exact_sumsq) và khi tính trong bộ nhớ. Mỗi số thực là phân số có mẫu là
+    lũy thừa của 2 nên cộng trên số nguyên Python là chính xác, không phụ thuộc thứ tự.
+    Kết quả: int nếu mọi giá trị là số nguyên, ngược lại Fraction (float nếu gặp inf)
+    """
+
+    def __init__(self, square=False):
+        self.square = square
+        self.total = 0
+        self.shift = 0
+        self.integral = True
+        self.special = 0.0
+
+    def step(self, value):
+        if value is None or value != value:
+            return
+        if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+            num, k = int(value), 0
+        else:
+            value = float(value)
+            if not math.isfinite(value):
+                self.special += value * value if self.square else value
+                return
+            num, den = value.as_integer_ratio()
+            k = den.bit_length() - 1
+            self.integral = False
+        if self.square:
+            num, k = num * num, 2 * k
+        if k > self.shift:
+            self.total <<= k - self.shift
+            self.shift = k
+        self.total += num << (self.shift - k)
+
+    def value(self):
+        if self.special:
+            return self.special
+        if self.integral:
+            return self.total
+        return Fraction(self.total, 1 << self.shift)
+
+    def finalize(self):
+        """Giá trị trả về cho SQLite: chuỗi số nguyên hoặc phân số 'tử/mẫu' (xem parse_exact)"""
+        value = self.value()
+        if isinstance(value, Fraction):
+            return f"{value.numerator}/{value.denominator}"
+        return str(value)
+
+
+class _ExactSumSquares(ExactSum):
+    def __init__(self):
+        super().__init__(square=True)
+
+
+def exact_sum(values, square=False):
+    """Tổng (hoặc tổng bình phương) chính xác của một dãy giá trị"""
+    acc = ExactSum(square)
+    for value in values:
+        acc.step(value)
+    return acc.value()
+
+
+def parse_exact(text):
+    """Đọc lại kết quả exact_sum/exact_sumsq từ SQLite"""
+    if text is None:
+        return 0
+    if '/' in text:
+        return Fraction(text)
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def connect(db_path):
+    """Kết nối SQLite có đăng ký các hàm tổng hợp chính xác"""
+    conn = sqlite3.connect(db_path)
+    conn.create_aggregate('exact_sum', 1, ExactSum)
+    conn.create_aggregate('exact_sumsq', 1, _ExactSumSquares)
+    return conn
+
+
+def _read_moments(sql, conn, group_by, params=None):
+    """Chạy truy vấn moment, chuyển tổng chính xác về int/Fraction và đặt khóa nhóm làm chỉ mục"""
+    df = pd.read_sql_query(sql, conn, params=params)
+    for col in df.columns:
+        if col.endswith('_sum') or col.endswith('_sumsq'):
+            df[col] = df[col].map(parse_exact).astype(object)
+    return df.set_index(list(group_by))
+
+
+def moments_to_stats(moments, measures):
+    """
+    Chuyển các moment (count, sum, sumsq chính xác) thành count/sum/mean/std
+    mean, std (ddof=1 giống pandas) tính trên số hữu tỉ rồi làm tròn một lần ra float
+    """
+    result = pd.DataFrame(index=moments.index)
+    for col in measures:
+        counts = moments[f'{col}_count'].astype(int)
+        totals, means, stds = [], [], []
+        for n, s, ss in zip(counts, moments[f'{col}_sum'], moments[f'{col}_sumsq']):
+            if not isinstance(s, float):
+                s, ss = Fraction(s), Fraction(ss)
+            totals.append(int(s) if isinstance(s, Fraction) and s.denominator == 1 else float(s))
+            means.append(float(s / n) if n > 0 else np.nan)
+            if n > 1:
+                # Trên số hữu tỉ var không âm; float chỉ có thể âm khi dữ liệu có inf
+                var = float((ss - s * s / n) / (n - 1))
+                stds.append(math.sqrt(var) if var >= 0 else np.nan)
+            else:
+                stds.append(np.nan)
+
+        result[f'{col}_count'] = counts
+        result[f'{col}_sum'] = pd.Series(totals, index=moments.index, dtype=None if totals else float)
+        result[f'{col}_mean'] = np.array(means, dtype=np.float64)
+        result[f'{col}_std'] = np.array(stds, dtype=np.float64)
+
+    return result
+
+
+def _table_columns(conn, table):
+    """Tên các cột của bảng hoặc VIEW"""
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")}
+
+
+def merge_moments(parts):
+    """Gộp moment của các phân đoạn: cộng count/sum/sumsq theo khóa nhóm (tổng chính xác cộng chính xác)"""
+    merged = pd.concat(parts)
+    grouped = merged.groupby(level=list(range(merged.index.nlevels)), sort=True)
+    return pd.DataFrame({
+        col: grouped[col].sum().astype(int) if col.endswith('_count') else grouped[col].agg(lambda s: sum(s, 0))
+        for col in merged.columns
+    })
+
+
+def _shard_worker(db_path, queries, shard_column, shard_values):
+    """
+    Tiến trình con: chạy các truy vấn tổng hợp trên một phân đoạn (shard_values=None:
+    các bảng không có cột phân đoạn, tính cả bảng) và trả về moment từng phần
+    """
+    planner = QueryPlanner(db_path, create_indexes=False)
+    conn = connect(db_path)
+    try:
+        result = {}
+        for key, query in queries.items():
+            sharded = shard_column in _table_columns(conn, query['table'])
+            if sharded != (shard_values is not None):
+                continue
+
+            shard = (shard_column, shard_values) if sharded else None
+            sql = planner._build_sql(query['table'], query['group_by'], query['measures'], shard)
+            result[key] = _read_moments(sql, conn, query['group_by'], list(shard_values) if sharded else None)
+        return result
+    finally:
+        conn.close()
+
+
+class QueryPlanner:
+    """Lập kế hoạch và thực thi các truy vấn tổng hợp ngay trong database"""
+
+    def __init__(self, db_path="data/thpt_data.db", create_indexes=True):
+        self.db_path = db_path
+        self.create_indexes = create_indexes
+
+    def plan(self, analyses=None):
+        """
+        Gộp yêu cầu của các phân tích thành danh sách truy vấn
+        Các phân tích cùng bảng và cùng cột nhóm dùng chung một truy vấn
+        """
+        analyses = analyses or list(ANALYSIS_AGGREGATES)
+
+        merged = {}
+        for name in analyses:
+            for table, group_by, measures in ANALYSIS_AGGREGATES[name]:
+                key = aggregate_key(table, group_by)
+                entry = merged.setdefault(key, {
+                    'table': table,
+                    'group_by': tuple(group_by),
+                    'measures': []
+                })
+                for col in measures:
+                    if col not in entry['measures']:
+                        entry['measures'].append(col)
+
+        for entry in merged.values():
+            entry['sql'] = self._build_sql(entry['table'], entry['group_by'], entry['measures'])
+
+        return merged
+
+    def _build_sql(self, table, group_by, measures, shard=None):
+        """
+        Sinh câu lệnh GROUP BY trả về count/sum/sumsq (chính xác) cho từng cột đo lường
+        shard: (cột, giá trị) để chỉ tổng hợp một phân đoạn (tham số ? theo thứ tự giá trị)
+        """
+        keys = ', '.join(_quote(k) for k in group_by)
+
+        select_parts = [keys]
+        for col in measures:
+            q = _quote(col)
+            select_parts.append(f"COUNT({q}) AS {_quote(col + '_count')}")
+            select_parts.append(f"exact_sum({q}) AS {_quote(col + '_sum')}")
+            select_parts.append(f"exact_sumsq({q}) AS {_quote(col + '_sumsq')}")
+
+        # pandas bỏ qua nhóm có khóa NULL, SQL cũng phải làm vậy
+        where = ' AND '.join(f"{_quote(k)} IS NOT NULL" for k in group_by)
+        if shard is not None:
+            column, values = shard
+            where += f" AND {_quote(column)} IN ({', '.join('?' * len(values))})"
+
+        return (f"SELECT {', '.join(select_parts)} FROM {_quote(table)} "
+                f"WHERE {where} GROUP BY {keys} ORDER BY {keys}")
+
+    def _ensure_index(self, conn, table, group_by, measures):
+        """Tạo covering index để GROUP BY chỉ cần quét index"""
+        kind = conn.execute(
+            "SELECT type FROM sqlite_master WHERE name = ?", (table,)
+        ).fetchone()
+        if not kind or kind[0] != 'table':
+            return
+
+        index_name = f"idx_{table}_{'_'.join(group_by)}"
+        columns = ', '.join(_quote(c) for c in list(group_by) + list(measures))
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {_quote(index_name)} ON {_quote(table)} ({columns})"
+        )
+
+    def execute(self, analyses=None):
+        """Chạy các truy vấn tổng hợp, trả về dict khóa -> DataFrame moment"""
+        queries = self.plan(analyses)
+        aggregates = {}
+
+        conn = connect(self.db_path)
+        try:
+            for key, query in queries.items():
+                if self.create_indexes:
+                    self._ensure_index(conn, query['table'], query['group_by'], query['measures'])
+                    conn.commit()
+
+                aggregates[key] = _read_moments(query['sql'], conn, query['group_by'])
+                logger.info(f"  - {key}: {len(aggregates[key])} nhóm")
+        finally:
+            conn.close()
+
+        return aggregates
+
+    def execute_sharded(self, analyses=None, shard_by='nam', max_workers=None):
+        """
+        Tính cùng các bảng moment như execute() nhưng chia dữ liệu theo năm hoặc tỉnh
+        cho một process pool: mỗi tiến trình tính moment từng phần cho phân đoạn của nó,
+        sau đó cộng lại (count/sum/sumsq chính xác cộng dồn được nên kết quả giống hệt tính một lần)
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        if shard_by not in SHARD_COLUMNS:
+            raise ValueError(f"Cột phân đoạn không hợp lệ: {shard_by} (chọn {list(SHARD_COLUMNS)})")
+
+        queries = self.plan(analyses)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            values = set()
+            for query in queries.values():
+                if self.create_indexes:
+                    self._ensure_index(conn, query['table'], query['group_by'], query['measures'])
+                    conn.commit()
+            for table in {query['table'] for query in queries.values()}:
+                if shard_by in _table_columns(conn, table):
+                    values.update(v for (v,) in conn.execute(
+                        f"SELECT DISTINCT {_quote(shard_by)} FROM {_quote(table)} "
+                        f"WHERE {_quote(shard_by)} IS NOT NULL"))
+        finally:
+            conn.close()
+
+        # Mỗi giá trị là một phân đoạn; thêm một phần việc cho các bảng không có cột phân đoạn
+        shards = [[value] for value in sorted(values)] + [None]
+        if max_workers == 1:
+            partials = [_shard_worker(self.db_path, queries, shard_by, shard) for shard in shards]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_shard_worker, self.db_path, queries, shard_by, shard)
+                           for shard in shards]
+                partials = [future.result() for future in futures]
+
+        aggregates = {}
+        for key, query in queries.items():
+            parts = [partial[key] for partial in partials if key in partial]
+            if parts:
+                merged = merge_moments(parts)
+            else:
+                # Bảng rỗng: không phân đoạn nào, chạy thẳng truy vấn để có đúng các cột
+                conn = connect(self.db_path)
+                try:
+                    merged = _read_moments(query['sql'], conn, query['group_by'])
+                finally:
+                    conn.close()
+            aggregates[key] = merged
+            logger.info(f"  - {key}: {len(merged)} nhóm từ {len(shards)} phân đoạn theo {shard_by}")
+
+        return aggregates
+
+    def row_counts(self, tables):
+        """Đếm số bản ghi của các bảng mà không tải dữ liệu"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {
+                table: conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0]
+                for table in tables
+            }
+        finally:
+            conn.close()
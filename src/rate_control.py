@@ -0,0 +1,324 @@
+"""
+Module Điều tốc theo Host
+Mỗi host có một bộ điều tốc riêng: token bucket giãn cách yêu cầu, giới hạn số yêu cầu
+đồng thời, AIMD (tăng cộng khi phản hồi tốt, giảm nhân khi gặp 429/5xx hoặc độ trễ
+tăng vọt kéo dài) và cầu dao ngắt mạch tạm dừng host lỗi liên tiếp rồi thử lại bằng một yêu cầu
+thăm dò. Gắn vào requests.Session qua RateLimitedAdapter nên trang lấy từ cache HTTP
+không tốn lượt; tốc độ ban đầu lấy từ scraping.delay_range
+"""
+
+import time
+import logging
+import threading
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Mặc định của mục scraping.rate_control (mỗi host có thể ghi đè trong rate_control.hosts)
+DEFAULTS = {
+    'enabled': True,
+    'max_rate': 50.0,            # yêu cầu/giây tối đa cho một host
+    'max_concurrency': 16,       # số yêu cầu đồng thời tối đa cho một host
+    'latency_factor': 3.0,       # độ trễ một phản hồi vượt bao nhiêu lần mức nền thì coi là chậm
+    'latency_slack': 0.1,        # và vượt mức nền ít nhất bao nhiêu giây
+    'failure_threshold': 5,      # số lỗi liên tiếp (5xx, lỗi mạng) để ngắt mạch
+    'cooldown_seconds': 30.0,    # thời gian ngắt mạch lần đầu, nhân đôi khi thăm dò thất bại
+    'max_cooldown_seconds': 600.0,
+}
+
+# Khởi động chậm: mỗi phản hồi tốt cộng thêm chừng này yêu cầu/giây (tốc độ ~gấp đôi mỗi giây)
+SLOW_START_STEP = 0.7
+# Sau lần nghẽn đầu: mỗi phản hồi tốt cộng ADDITIVE_STEP / tốc độ (~+1 yêu cầu/giây mỗi giây)
+ADDITIVE_STEP = 1.0
+DECREASE_FACTOR = 0.5
+# Hai lần giảm nhân cách nhau ít nhất max(độ trễ trơn, khoảng này) giây
+MIN_DECREASE_INTERVAL = 0.25
+# Hệ số làm trơn độ trễ (EWMA)
+LATENCY_ALPHA = 0.2
+# Mức nền độ trễ được phép trôi lên mỗi mẫu để theo kịp khi đường mạng đổi
+BASE_LATENCY_DRIFT = 1.01
+# Chỉ coi là nghẽn khi chừng này phản hồi liên tiếp đều chậm (một trang nhỏ giọt lẻ không tính)
+SLOW_STREAK = 3
+# Lỗi 5xx / lỗi mạng chỉ giảm tốc khi liên tiếp từ chừng này lần (lỗi lẻ tẻ không do tải)
+ERROR_STREAK = 2
+
+DONG, MO, NUA_MO = 'dong', 'mo', 'nua_mo'
+
+
+class HostUnavailable(requests.ConnectionError):
+    """Host đang bị ngắt mạch (hoặc đang chờ kết quả thăm dò), yêu cầu bị từ chối ngay"""
+
+
+def retry_after_seconds(value):
+    """Giá trị header Retry-After (số giây hoặc ngày giờ HTTP) -> số giây; None nếu không đọc được"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    """
+    Bộ điều tốc của một host
+    rate: yêu cầu/giây ban đầu; min_rate: mức sàn khi giảm nhân
+    Trạng thái cầu dao: dong (bình thường), mo (đang ngắt), nua_mo (cho một yêu cầu thăm dò)
+    """
+
+    def __init__(self, host, rate, min_rate, settings):
+        self.host = host
+        self.settings = settings
+        self.max_rate = settings['max_rate']
+        self.min_rate = min(min_rate, self.max_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.concurrency = 1.0
+        self.slow_start = True
+
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+
+        self.srtt = None
+        self.base_latency = None
+        self.slow_streak = 0
+
+        self.state = DONG
+        self.failures = 0
+        self.cooldown = settings['cooldown_seconds']
+        self.opened_at = 0.0
+        self.probing = False
+
+        self.counts = Counter()
+        self.cond = threading.Condition()
+
+    def _refill(self, now):
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _check_circuit(self, now):
+        """Từ chối ngay khi cầu dao mở; hết thời gian ngắt thì chuyển sang nửa mở để thăm dò"""
+        if self.state == MO:
+            remaining = self.opened_at + self.cooldown - now
+            if remaining > 0:
+                self.counts['tu_choi'] += 1
+                raise HostUnavailable(f"{self.host} đang ngắt mạch, thử lại sau {remaining:.0f}s")
+            self.state = NUA_MO
+            logger.info(f"Thăm dò lại {self.host} sau {self.cooldown:.0f}s ngắt mạch")
+        if self.state == NUA_MO and self.probing:
+            self.counts['tu_choi'] += 1
+            raise HostUnavailable(f"{self.host} đang được thăm dò sau ngắt mạch")
+
+    def acquire(self):
+        """Chờ tới lượt gửi yêu cầu (token + chỗ đồng thời); HostUnavailable nếu host bị ngắt mạch"""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self._check_circuit(now)
+                wait = self.paused_until - now
+                if wait <= 0 and self.in_flight < max(1, int(self.concurrency)):
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        if self.state == NUA_MO:
+                            self.probing = True
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                # Không có hạn chờ: đợi một yêu cầu khác trả chỗ đồng thời
+                self.cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, status, latency, retry_after=None):
+        """Ghi nhận kết quả một yêu cầu: status None là lỗi mạng; latency tính bằng giây"""
+        with self.cond:
+            self.in_flight -= 1
+            self.probing = False
+            now = time.monotonic()
+
+            if status is None or status >= 500:
+                self.counts['loi' if status is None else '5xx'] += 1
+                self._failure(now)
+                if self.failures >= ERROR_STREAK:
+                    self._decrease(now)
+            elif status == 429:
+                self.counts['429'] += 1
+                self._decrease(now)
+                pause = retry_after_seconds(retry_after)
+                if pause:
+                    pause = min(pause, self.settings['max_cooldown_seconds'])
+                    self.paused_until = max(self.paused_until, now + pause)
+                    self.tokens = min(self.tokens, 0.0)
+            else:
+                self.counts['thanh_cong'] += 1
+                self._success()
+                if self._congested(latency):
+                    self.counts['tre'] += 1
+                    self._decrease(now)
+                else:
+                    self._increase()
+
+            self.cond.notify_all()
+
+    def _congested(self, latency):
+        """Cập nhật độ trễ trơn và mức nền; True khi SLOW_STREAK phản hồi liên tiếp chậm hẳn so với mức nền"""
+        self.srtt = latency if self.srtt is None else (1 - LATENCY_ALPHA) * self.srtt + LATENCY_ALPHA * latency
+        if self.base_latency is None:
+            self.base_latency = self.srtt
+        self.base_latency = min(self.base_latency * BASE_LATENCY_DRIFT, self.srtt)
+        slow = (latency > self.settings['latency_factor'] * self.base_latency
+                and latency - self.base_latency > self.settings['latency_slack'])
+        self.slow_streak = self.slow_streak + 1 if slow else 0
+        return self.slow_streak >= SLOW_STREAK
+
+    def _increase(self):
+        if self.slow_start:
+            self.rate += SLOW_START_STEP
+            self.concurrency += 0.5
+        else:
+            self.rate += ADDITIVE_STEP / self.rate
+            self.concurrency += 1 / self.concurrency
+        self.rate = min(self.rate, self.max_rate)
+        self.concurrency = min(self.concurrency, self.settings['max_concurrency'])
+
+    def _decrease(self, now):
+        """Giảm nhân tốc độ và số đồng thời; các tín hiệu dồn trong cùng một nhịp chỉ tính một lần"""
+        self.slow_start = False
+        if now - self.last_decrease < max(self.srtt or 0.0, MIN_DECREASE_INTERVAL):
+            return
+        self.last_decrease = now
+        self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+        self.concurrency = max(1.0, self.concurrency * DECREASE_FACTOR)
+        self.tokens = min(self.tokens, 1.0)
+        self.counts['giam'] += 1
+
+    def _success(self):
+        self.failures = 0
+        if self.state == NUA_MO:
+            self.state = DONG
+            self.cooldown = self.settings['cooldown_seconds']
+            logger.info(f"{self.host} đã phục hồi, đóng cầu dao ở {self.rate:.2f} yêu cầu/giây")
+
+    def _failure(self, now):
+        self.failures += 1
+        if self.state == NUA_MO:
+            self.cooldown = min(self.cooldown * 2, self.settings['max_cooldown_seconds'])
+            self._open(now)
+        elif self.state == DONG and self.failures >= self.settings['failure_threshold']:
+            self._open(now)
+
+    def _open(self, now):
+        self.state = MO
+        self.opened_at = now
+        self.counts['ngat_mach'] += 1
+        logger.warning(f"Ngắt mạch {self.host} sau {self.failures} lỗi liên tiếp, tạm dừng {self.cooldown:.0f}s")
+
+    def snapshot(self):
+        """Trạng thái hiện tại và bộ đếm của host"""
+        with self.cond:
+            return {
+                'host': self.host,
+                'trang_thai': self.state,
+                'toc_do': round(self.rate, 3),
+                'dong_thoi': int(self.concurrency),
+                'do_tre_ms': round(self.srtt * 1000, 1) if self.srtt is not None else None,
+                'thanh_cong': self.counts['thanh_cong'],
+                'tre': self.counts['tre'],
+                '429': self.counts['429'],
+                '5xx': self.counts['5xx'],
+                'loi_mang': self.counts['loi'],
+                'lan_giam': self.counts['giam'],
+                'ngat_mach': self.counts['ngat_mach'],
+                'tu_choi': self.counts['tu_choi'],
+            }
+
+
+class RateController:
+    """
+    Tập bộ điều tốc theo host (host lấy từ netloc của URL, tạo khi gặp lần đầu)
+    scraping: mục "scraping" của cấu hình; tốc độ ban đầu 1/trung bình delay_range,
+    mức sàn 1/max(delay_range); rate_control.hosts ghi đè tham số cho từng host
+    """
+
+    def __init__(self, scraping=None, hosts=()):
+        scraping = scraping or {}
+        options = scraping.get('rate_control', {})
+        self.settings = dict(DEFAULTS, **{k: v for k, v in options.items() if k in DEFAULTS})
+        self.host_settings = {host.lower(): dict(self.settings, **values)
+                              for host, values in options.get('hosts', {}).items()}
+
+        low, high = scraping.get('delay_range', (1, 3))
+        self.initial_rate = 1 / max((low + high) / 2, 1e-3)
+        self.min_rate = 1 / max(high, 1e-3)
+
+        self.limiters = {}
+        self._lock = threading.Lock()
+        for url in hosts:
+            self.limiter(url)
+
+    @staticmethod
+    def host_of(url):
+        parsed = urlparse(url)
+        return (parsed.netloc or parsed.path).lower()
+
+    def limiter(self, url):
+        """Bộ điều tốc của host chứa url"""
+        host = self.host_of(url)
+        with self._lock:
+            limiter = self.limiters.get(host)
+            if limiter is None:
+                settings = self.host_settings.get(host, self.settings)
+                limiter = HostLimiter(host, settings.get('initial_rate', self.initial_rate),
+                                      settings.get('min_rate', self.min_rate), settings)
+                self.limiters[host] = limiter
+            return limiter
+
+    def stats(self):
+        """Mỗi host một dict trạng thái (xem HostLimiter.snapshot)"""
+        with self._lock:
+            limiters = list(self.limiters.values())
+        return [limiter.snapshot() for limiter in limiters]
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter gửi yêu cầu qua bộ điều tốc của host; độ trễ tính tới khi đọc hết nội dung"""
+
+    def __init__(self, controller, **kwargs):
+        super().__init__(**kwargs)
+        self.controller = controller
+
+    def send(self, request, **kwargs):
+        limiter = self.controller.limiter(request.url)
+        limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+            if not kwargs.get('stream'):
+                response.content
+        except BaseException:
+            limiter.release(None, time.perf_counter() - start)
+            raise
+        limiter.release(response.status_code, time.perf_counter() - start, response.headers.get('Retry-After'))
+        return response
+
+
+def mount(session, scraping=None, hosts=()):
+    """Gắn điều tốc vào session cho http/https; None nếu rate_control.enabled tắt"""
+    controller = RateController(scraping, hosts)
+    if not controller.settings['enabled']:
+        return None
+    adapter = RateLimitedAdapter(controller, pool_maxsize=max(10, int(controller.settings['max_concurrency'])))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return controller
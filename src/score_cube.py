@@ -0,0 +1,244 @@
+"""
+Module Khối Tổng hợp Điểm thi (Rollup Cube)
+Tính count/sum/sumsq/histogram cho mọi tổ hợp chiều (năm, tỉnh/vùng, tổ hợp, môn)
+kèm các dòng tổng phụ trong một lượt quét kho điểm; lưu ra đĩa để mọi lát cắt
+báo cáo cần chỉ là một phép tra cứu thay vì groupby lại
+"""
+
+import os
+import json
+import shutil
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from combo_distribution import GRID_STEP, N_TOTAL_BINS
+
+logger = logging.getLogger(__name__)
+
+TAT_CA = 'ALL'      # Tổng phụ trên một chiều (mọi năm / toàn quốc / mọi thí sinh)
+TONG = 'TONG'       # "Môn" tổng điểm 3 môn của tổ hợp (thang 30)
+CUBE_DATA = 'cube.npz'
+CUBE_META = 'cube.json'
+
+
+def _cells(subjects, combos):
+    """
+    Danh sách ô (ma_to_hop, mon) của khối:
+    - (ALL, môn): mọi thí sinh có điểm môn đó
+    - (tổ hợp, môn) và (tổ hợp, TONG): thí sinh có đủ điểm 3 môn của tổ hợp
+    Chiều tổ hợp không cộng dồn được (một thí sinh thuộc nhiều tổ hợp) nên ALL là ô gốc riêng
+    """
+    cells = [(TAT_CA, mon) for mon in subjects]
+    for code, mons in combos.items():
+        if all(mon in subjects for mon in mons):
+            cells += [(code, mon) for mon in mons] + [(code, TONG)]
+    return cells
+
+
+class ScoreCube:
+    """Khối tổng hợp (năm x địa bàn x ô tổ hợp-môn) với histogram bước 0.05 điểm"""
+
+    def __init__(self, nam, dia_ban, cells, count, total, total_sq, hist, meta=None):
+        self.nam = list(nam)
+        self.dia_ban = list(dia_ban)
+        self.cells = [tuple(cell) for cell in cells]
+        self.count = count              # (năm, địa bàn, ô)
+        self.total = total
+        self.total_sq = total_sq
+        self.hist = hist                # (năm, địa bàn, ô, bin)
+        self.meta = meta or {}
+
+        self._nam_idx = {value: i for i, value in enumerate(self.nam)}
+        self._dia_ban_idx = {value: i for i, value in enumerate(self.dia_ban)}
+        self._cell_idx = {value: i for i, value in enumerate(self.cells)}
+
+    @classmethod
+    def build(cls, store, combos, chunk_size=500_000):
+        """
+        Dựng khối từ kho điểm: mỗi năm quét một lượt để có khối gốc (tỉnh x ô x bin),
+        sau đó cộng dồn sang vùng miền, toàn quốc và tất cả các năm
+        """
+        from data_scraper import TINH_THANH
+
+        # Phiên bản lấy trước khi đọc: năm bị ghi lại trong lúc dựng sẽ làm khối lỗi thời
+        versions = store.versions()
+        years = store.open_all()
+        if not years:
+            raise ValueError(f"Kho điểm {store.root} chưa có dữ liệu")
+
+        subjects = sorted(set().union(*(y.subjects for y in years.values())))
+        cells = _cells(subjects, combos)
+        n_cells = len(cells)
+        n_tinh = max(int(np.max(y.ma_tinh)) + 1 if len(y) else 1 for y in years.values())
+
+        # Các cột tính giá trị cho từng ô: chỉ số môn, và mặt nạ 3 môn của tổ hợp
+        sub_idx = {mon: i for i, mon in enumerate(subjects)}
+        cell_source = []
+        for code, mon in cells:
+            required = [mon] if code == TAT_CA else combos[code]
+            cell_source.append(([sub_idx[m] for m in required], mon == TONG, sub_idx.get(mon)))
+
+        size = n_tinh * n_cells
+        base = {}
+        for year, score_year in years.items():
+            count = np.zeros(size)
+            total = np.zeros(size)
+            total_sq = np.zeros(size)
+            hist = np.zeros(size * N_TOTAL_BINS, dtype=np.int64)
+
+            year_sub = [sub_idx[mon] for mon in score_year.subjects]
+            for start in range(0, len(score_year), chunk_size):
+                stop = start + chunk_size
+                scores = np.full((min(stop, len(score_year)) - start, len(subjects)), np.nan)
+                scores[:, year_sub] = np.column_stack(
+                    [score_year.scores[mon][start:stop] for mon in score_year.subjects])
+                scores = np.round(scores, 2)
+                tinh = np.asarray(score_year.ma_tinh[start:stop], dtype=np.int64)
+
+                # Giá trị (thí sinh x ô), NaN khi thí sinh không thuộc ô
+                values = np.empty((len(scores), n_cells))
+                for c, (required, is_total, mon_idx) in enumerate(cell_source):
+                    present = scores[:, required]
+                    value = present.sum(axis=1) if is_total else scores[:, mon_idx]
+                    values[:, c] = np.where(np.isnan(present).any(axis=1), np.nan, value)
+
+                valid = ~np.isnan(values)
+                keys = (tinh[:, None] * n_cells + np.arange(n_cells))[valid]
+                v = values[valid]
+                bins = np.clip(np.round(v / GRID_STEP).astype(np.int64), 0, N_TOTAL_BINS - 1)
+
+                count += np.bincount(keys, minlength=size)
+                total += np.bincount(keys, weights=v, minlength=size)
+                total_sq += np.bincount(keys, weights=v * v, minlength=size)
+                hist += np.bincount(keys * N_TOTAL_BINS + bins, minlength=size * N_TOTAL_BINS)
+
+            base[year] = (count.reshape(n_tinh, n_cells), total.reshape(n_tinh, n_cells),
+                          total_sq.reshape(n_tinh, n_cells), hist.reshape(n_tinh, n_cells, N_TOTAL_BINS))
+
+        # Địa bàn: các tỉnh có dữ liệu, rồi vùng miền, rồi toàn quốc
+        has_data = np.flatnonzero(sum(b[0].sum(axis=1) for b in base.values()) > 0)
+        provinces = [f"{code:02d}" for code in has_data]
+        regions = sorted({TINH_THANH[code][1] for code in provinces if code in TINH_THANH})
+        dia_ban = provinces + regions + [TAT_CA]
+
+        rollup = np.zeros((len(dia_ban), n_tinh))
+        rollup[np.arange(len(provinces)), has_data] = 1
+        for r, region in enumerate(regions, len(provinces)):
+            members = [code for code in has_data
+                       if TINH_THANH.get(f"{code:02d}", (None, None))[1] == region]
+            rollup[r, members] = 1
+        rollup[-1, has_data] = 1
+
+        nam = sorted(base) + [TAT_CA]
+        arrays = [np.stack([np.tensordot(rollup, base[year][k], axes=(1, 0)) for year in sorted(base)])
+                  for k in range(4)]
+        arrays = [np.concatenate([a, a.sum(axis=0, keepdims=True)]) for a in arrays]
+        count, total, total_sq, hist = arrays
+
+        meta = {
+            'so_thi_sinh': {str(year): len(score_year) for year, score_year in years.items()},
+            'phien_ban_kho': versions,
+            'to_hop': {code: combos[code] for code in dict.fromkeys(code for code, _ in cells) if code != TAT_CA},
+            'grid_step': GRID_STEP,
+            'ngay_tao': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        logger.info(f"Đã dựng khối tổng hợp: {len(nam)} năm x {len(dia_ban)} địa bàn x {n_cells} ô")
+        return cls(nam, dia_ban, cells, count.round().astype(np.int64), total, total_sq,
+                   hist.round().astype(np.int32), meta)
+
+    def save(self, path="data/score_cube"):
+        """Ghi khối ra thư mục tạm rồi đổi tên (cùng cách với kho điểm)"""
+        tmp_dir = path + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        np.savez_compressed(os.path.join(tmp_dir, CUBE_DATA), count=self.count, total=self.total,
+                            total_sq=self.total_sq, hist=self.hist)
+        meta = dict(self.meta, nam=self.nam, dia_ban=self.dia_ban, cells=self.cells)
+        with open(os.path.join(tmp_dir, CUBE_META), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+        logger.info(f"Đã lưu khối tổng hợp vào {path}")
+        return path
+
+    @classmethod
+    def load(cls, path="data/score_cube"):
+        with open(os.path.join(path, CUBE_META), encoding='utf-8') as f:
+            meta = json.load(f)
+        with np.load(os.path.join(path, CUBE_DATA)) as data:
+            arrays = [data[key] for key in ('count', 'total', 'total_sq', 'hist')]
+        return cls(meta.pop('nam'), meta.pop('dia_ban'), meta.pop('cells'), *arrays, meta=meta)
+
+    def is_current(self, store):
+        """Khối còn khớp với kho điểm: cùng các năm, không năm nào được ghi lại sau khi dựng khối"""
+        return store.versions() == self.meta.get('phien_ban_kho')
+
+    def _index(self, mapping, value, name):
+        try:
+            return mapping[value]
+        except KeyError:
+            raise KeyError(f"Khối tổng hợp không có {name} = {value!r}") from None
+
+    def lookup(self, nam=TAT_CA, dia_ban=TAT_CA, ma_to_hop=TAT_CA, mon=TONG):
+        """Tra cứu một ô: số thí sinh, tổng, tổng bình phương, điểm TB, độ lệch chuẩn, histogram"""
+        y = self._index(self._nam_idx, nam, 'năm')
+        g = self._index(self._dia_ban_idx, dia_ban, 'địa bàn')
+        c = self._index(self._cell_idx, (ma_to_hop, mon), 'ô')
+
+        n, s, ss = self.count[y, g, c], self.total[y, g, c], self.total_sq[y, g, c]
+        return {
+            'so_thi_sinh': int(n),
+            'tong': s,
+            'tong_binh_phuong': ss,
+            'diem_tb': s / n if n else np.nan,
+            'do_lech_chuan': np.sqrt(max(ss - s * s / n, 0) / (n - 1)) if n > 1 else np.nan,
+            'histogram': self.hist[y, g, c]
+        }
+
+    def slice(self, nam=None, dia_ban=None, ma_to_hop=None, mon=None):
+        """
+        Lát cắt dạng bảng: mỗi tham số là một giá trị, danh sách giá trị hoặc None (mọi giá trị)
+        Trả về DataFrame (nam, dia_ban, ma_to_hop, mon) với các moment và thống kê suy ra
+        """
+        def select(values, wanted):
+            if wanted is None:
+                return np.arange(len(values))
+            wanted = set(wanted) if isinstance(wanted, (list, tuple, set)) else {wanted}
+            return np.array([i for i, value in enumerate(values) if value in wanted], dtype=np.int64)
+
+        y = select(self.nam, nam)
+        g = select(self.dia_ban, dia_ban)
+        c = np.intersect1d(select([code for code, _ in self.cells], ma_to_hop),
+                           select([m for _, m in self.cells], mon))
+
+        yy, gg, cc = (a.ravel() for a in np.meshgrid(y, g, c, indexing='ij'))
+        n = self.count[yy, gg, cc].astype(float)
+        s, ss = self.total[yy, gg, cc], self.total_sq[yy, gg, cc]
+
+        frame = pd.DataFrame({
+            'nam': np.asarray(self.nam, dtype=object)[yy],
+            'dia_ban': np.asarray(self.dia_ban, dtype=object)[gg],
+            'ma_to_hop': [self.cells[i][0] for i in cc],
+            'mon': [self.cells[i][1] for i in cc],
+            'so_thi_sinh': n.astype(np.int64),
+            'tong': s,
+            'tong_binh_phuong': ss
+        })
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['diem_tb'] = s / n
+            frame['do_lech_chuan'] = np.sqrt(np.clip(ss - s * s / n, 0, None) / (n - 1))
+        return frame[frame['so_thi_sinh'] > 0].reset_index(drop=True)
+
+    def histograms(self, nam=None, dia_ban=None, ma_to_hop=None, mon=None):
+        """Lát cắt kèm ma trận histogram (dòng khớp thứ tự bảng trả về)"""
+        frame = self.slice(nam, dia_ban, ma_to_hop, mon)
+        y = frame['nam'].map(self._nam_idx).to_numpy()
+        g = frame['dia_ban'].map(self._dia_ban_idx).to_numpy()
+        c = np.array([self._cell_idx[cell] for cell in zip(frame['ma_to_hop'], frame['mon'])], dtype=np.int64)
+        return frame, self.hist[y, g, c]
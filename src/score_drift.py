@@ -0,0 +1,117 @@
+"""
+Module Phát hiện Dịch chuyển Phân phối Điểm giữa các Năm
+Tính thống kê KS, khoảng cách Wasserstein và độ dịch phân vị giữa hai năm liên tiếp
+cho mọi ô (địa bàn, tổ hợp, môn) trực tiếp từ histogram của khối tổng hợp, theo lô NumPy
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def histogram_drift(hist_prev, hist_curr, step, quantiles=QUANTILES):
+    """
+    So sánh từng cặp histogram (M, B) cùng lưới điểm bước `step`
+
+    Trả về dict các mảng (M,): ks, ks_p_value (xấp xỉ tiệm cận), wasserstein,
+    dich_tb và dich_q<phân vị> (điểm năm sau - năm trước)
+    """
+    hist_prev = np.asarray(hist_prev, dtype=np.float64)
+    hist_curr = np.asarray(hist_curr, dtype=np.float64)
+    n_prev, n_curr = hist_prev.sum(axis=1), hist_curr.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cdf_prev = np.cumsum(hist_prev, axis=1) / n_prev[:, None]
+        cdf_curr = np.cumsum(hist_curr, axis=1) / n_curr[:, None]
+
+        gap = np.abs(cdf_curr - cdf_prev)
+        ks = gap.max(axis=1)
+        effective_n = n_prev * n_curr / (n_prev + n_curr)
+        ks_p = stats.kstwobign.sf(ks * np.sqrt(effective_n))
+
+        # W1 trên đường thẳng thực = diện tích giữa hai hàm phân phối
+        wasserstein = gap.sum(axis=1) * step
+
+        grid = np.arange(hist_prev.shape[1]) * step
+        mean_shift = (hist_curr @ grid) / n_curr - (hist_prev @ grid) / n_prev
+
+    result = {'ks': ks, 'ks_p_value': ks_p, 'wasserstein': wasserstein, 'dich_tb': mean_shift}
+
+    # Phân vị: bin đầu tiên có CDF >= q (argmax trên mặt nạ boolean, cả lô cùng lúc)
+    for q in quantiles:
+        q_prev = np.argmax(cdf_prev >= q - 1e-12, axis=1) * step
+        q_curr = np.argmax(cdf_curr >= q - 1e-12, axis=1) * step
+        result[f'dich_q{int(round(q * 100))}'] = q_curr - q_prev
+
+    return result
+
+
+def yearly_drift(cube, dia_ban=None, ma_to_hop=None, mon=None, quantiles=QUANTILES, min_count=30,
+                 batch_size=20_000):
+    """
+    Dịch chuyển phân phối giữa các năm liên tiếp cho mọi ô của khối tổng hợp
+    (có thể lọc theo địa bàn/tổ hợp/môn như ScoreCube.slice); bỏ ô ít hơn min_count thí sinh
+    """
+    from combo_distribution import GRID_STEP
+
+    years = sorted(y for y in cube.nam if isinstance(y, int))
+    frame, hist = cube.histograms(nam=years, dia_ban=dia_ban, ma_to_hop=ma_to_hop, mon=mon)
+    frame = frame.reset_index(drop=True)
+
+    keys = ['dia_ban', 'ma_to_hop', 'mon']
+    frames = []
+    for prev_year, curr_year in zip(years, years[1:]):
+        prev = frame[frame['nam'] == prev_year]
+        curr = frame[frame['nam'] == curr_year]
+        pairs = prev.reset_index().merge(curr.reset_index(), on=keys, suffixes=('_truoc', '_sau'))
+        pairs = pairs[(pairs['so_thi_sinh_truoc'] >= min_count) & (pairs['so_thi_sinh_sau'] >= min_count)]
+        if pairs.empty:
+            continue
+
+        # Chia lô để mảng CDF (lô x bin) không vượt quá bộ nhớ
+        idx_prev, idx_curr = pairs['index_truoc'].to_numpy(), pairs['index_sau'].to_numpy()
+        parts = [
+            histogram_drift(hist[idx_prev[i:i + batch_size]], hist[idx_curr[i:i + batch_size]],
+                            GRID_STEP, quantiles)
+            for i in range(0, len(pairs), batch_size)
+        ]
+        drift = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+        out = pd.DataFrame({
+            'nam_truoc': prev_year,
+            'nam_sau': curr_year,
+            **{key: pairs[key].to_numpy() for key in keys},
+            'so_thi_sinh_truoc': pairs['so_thi_sinh_truoc'].to_numpy(),
+            'so_thi_sinh_sau': pairs['so_thi_sinh_sau'].to_numpy(),
+            'diem_tb_truoc': pairs['diem_tb_truoc'].to_numpy(),
+            'diem_tb_sau': pairs['diem_tb_sau'].to_numpy(),
+        })
+        for name, values in drift.items():
+            out[name] = values
+        frames.append(out)
+
+    if not frames:
+        return pd.DataFrame()
+
+    result = pd.concat(frames, ignore_index=True)
+    logger.info(f"Đã tính dịch chuyển phân phối cho {len(result)} cặp (ô, năm liên tiếp)")
+    return result
+
+
+def biggest_shifts(drift, top=20, by='ks'):
+    """
+    Xếp hạng các dịch chuyển lớn nhất
+    Mặc định theo KS (không phụ thuộc thang điểm môn/tổng 3 môn), hòa thì theo Wasserstein
+    """
+    if drift.empty:
+        return drift
+
+    ranked = drift.sort_values([by, 'wasserstein'], ascending=False).head(top).reset_index(drop=True)
+    ranked.insert(0, 'hang', np.arange(1, len(ranked) + 1))
+    return ranked
@@ -0,0 +1,196 @@
+"""
+Module Kho Điểm thi Nhị phân (Score Store)
+Lưu điểm từng thí sinh theo năm dưới dạng các cột .npy kiểu cố định,
+mở lại bằng np.load(mmap_mode='r') để khởi động gần như tức thì và
+chia sẻ trang bộ nhớ giữa nhiều tiến trình mà không cần sao chép
+"""
+
+import os
+import json
+import shutil
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Tên file cho từng môn (tránh ký tự có dấu trong tên file)
+MON_FILE = {
+    'Toán': 'toan',
+    'Văn': 'van',
+    'Anh': 'anh',
+    'Lý': 'ly',
+    'Hóa': 'hoa',
+    'Sinh': 'sinh',
+    'Sử': 'su',
+    'Địa': 'dia',
+    'GDCD': 'gdcd'
+}
+
+SCORE_DTYPE = 'float32'   # NaN = không thi môn đó
+SBD_DTYPE = 'int64'
+TINH_DTYPE = 'uint8'
+UU_TIEN_DTYPE = 'uint8'   # Mã khu vực/đối tượng ưu tiên, xem admission_score
+UU_TIEN_COLUMNS = ('khu_vuc', 'doi_tuong')
+MANIFEST = 'manifest.json'
+
+
+class ScoreYear:
+    """Dữ liệu điểm một năm, các cột là mảng memory-mapped chỉ đọc"""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.year = self.manifest['nam']
+        self.sbd = np.load(os.path.join(path, 'sbd.npy'), mmap_mode='r')
+        self.ma_tinh = np.load(os.path.join(path, 'ma_tinh.npy'), mmap_mode='r')
+        self.scores = {
+            mon: np.load(os.path.join(path, info['file']), mmap_mode='r')
+            for mon, info in self.manifest['mon'].items()
+        }
+        # Cột ưu tiên là tùy chọn (kho ghi trước khi có cột này thì rỗng)
+        self.uu_tien = {
+            name: np.load(os.path.join(path, info['file']), mmap_mode='r')
+            for name, info in self.manifest.get('uu_tien', {}).items()
+        }
+
+    def __len__(self):
+        return self.manifest['so_thi_sinh']
+
+    def __reduce__(self):
+        # Khi gửi sang tiến trình khác chỉ truyền đường dẫn, tiến trình đó tự mmap lại
+        return (ScoreYear, (self.path,))
+
+    @property
+    def subjects(self):
+        return list(self.scores)
+
+    def row_of(self, sbd):
+        """Tìm vị trí dòng của một hoặc nhiều số báo danh (-1 nếu không có)"""
+        sbd = np.asarray(sbd, dtype=SBD_DTYPE)
+        if len(self.sbd) == 0:
+            return np.full(sbd.shape, -1)
+        pos = np.searchsorted(self.sbd, sbd)
+        pos = np.clip(pos, 0, len(self.sbd) - 1)
+        return np.where(self.sbd[pos] == sbd, pos, -1)
+
+    def matrix(self, subjects=None):
+        """Ghép các môn thành ma trận (thí sinh x môn); thao tác này sao chép dữ liệu"""
+        subjects = subjects or self.subjects
+        return np.column_stack([self.scores[mon] for mon in subjects])
+
+    def to_frame(self, subjects=None):
+        """Chuyển sang DataFrame (sbd, ma_tinh, các môn)"""
+        subjects = subjects or self.subjects
+        df = pd.DataFrame({
+            'sbd': np.asarray(self.sbd),
+            'ma_tinh': np.char.zfill(np.asarray(self.ma_tinh).astype(str), 2)
+        })
+        for mon in subjects:
+            df[mon] = np.asarray(self.scores[mon])
+        return df
+
+
+class ScoreStore:
+    """Kho điểm thi: <root>/<năm>/{manifest.json, sbd.npy, ma_tinh.npy, <môn>.npy, [khu_vuc.npy, doi_tuong.npy]}"""
+
+    def __init__(self, root="data/score_store"):
+        self.root = root
+        self._opened = {}
+
+    def years(self):
+        """Danh sách các năm đã có trong kho"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            int(name) for name in os.listdir(self.root)
+            if name.isdigit() and os.path.exists(os.path.join(self.root, name, MANIFEST))
+        )
+
+    def versions(self):
+        """
+        Phiên bản từng năm trong kho: mtime (ns) của manifest
+        write_year luôn thay cả thư mục năm nên ghi lại một năm đổi phiên bản dù số thí sinh giữ nguyên
+        """
+        return {
+            str(year): os.stat(os.path.join(self.root, str(year), MANIFEST)).st_mtime_ns
+            for year in self.years()
+        }
+
+    def write_year(self, df, year=None):
+        """
+        Ghi điểm một năm từ DataFrame có cột sbd, ma_tinh, các cột môn và (tùy chọn) khu_vuc, doi_tuong
+        Dữ liệu được ghi vào thư mục tạm rồi đổi tên để người đọc không thấy file dở dang
+        """
+        from data_scraper import TINH_THANH
+
+        year = int(year if year is not None else df['nam'].iloc[0])
+        subjects = [c for c in df.columns if c in MON_FILE]
+
+        final_dir = os.path.join(self.root, str(year))
+        tmp_dir = final_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        # Sắp xếp theo SBD để tra cứu bằng tìm kiếm nhị phân
+        df = df.sort_values('sbd')
+
+        np.save(os.path.join(tmp_dir, 'sbd.npy'), df['sbd'].to_numpy(dtype=SBD_DTYPE))
+        ma_tinh = df['ma_tinh'].astype(str).str.zfill(2)
+        np.save(os.path.join(tmp_dir, 'ma_tinh.npy'), ma_tinh.astype(int).to_numpy(dtype=TINH_DTYPE))
+
+        mon_info = {}
+        for mon in subjects:
+            filename = f'{MON_FILE[mon]}.npy'
+            np.save(os.path.join(tmp_dir, filename), df[mon].to_numpy(dtype=SCORE_DTYPE))
+            mon_info[mon] = {'file': filename, 'dtype': SCORE_DTYPE}
+        
+        uu_tien_info = {}
+        if any(name in df.columns for name in UU_TIEN_COLUMNS):
+            from admission_score import KHU_VUC, DOI_TUONG, priority_codes
+            
+            for name, levels in zip(UU_TIEN_COLUMNS, (KHU_VUC, DOI_TUONG)):
+                if name in df.columns:
+                    filename = f'{name}.npy'
+                    np.save(os.path.join(tmp_dir, filename), priority_codes(df[name], levels))
+                    uu_tien_info[name] = {'file': filename, 'dtype': UU_TIEN_DTYPE, 'ma': list(levels)}
+
+        manifest = {
+            'nam': year,
+            'so_thi_sinh': int(len(df)),
+            'mon': mon_info,
+            'uu_tien': uu_tien_info,
+            'tinh': {
+                code: TINH_THANH.get(code, (code, None))[0]
+                for code in sorted(ma_tinh.unique())
+            },
+            'ngay_tao': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with open(os.path.join(tmp_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+        self._opened.pop(year, None)
+
+        logger.info(f"Đã lưu {len(df)} thí sinh năm {year} vào {final_dir}")
+        return final_dir
+
+    def open_year(self, year):
+        """Mở dữ liệu một năm (memory-mapped, chỉ đọc)"""
+        year = int(year)
+        if year not in self._opened:
+            path = os.path.join(self.root, str(year))
+            if not os.path.exists(os.path.join(path, MANIFEST)):
+                raise FileNotFoundError(f"Không có dữ liệu điểm thi năm {year} trong {self.root}")
+            self._opened[year] = ScoreYear(path)
+        return self._opened[year]
+
+    def open_all(self):
+        """Mở tất cả các năm có trong kho"""
+        return {year: self.open_year(year) for year in self.years()}
@@ -0,0 +1,112 @@
+"""
+Module Theo dõi Thay đổi Nguồn Dữ liệu
+Kiểm tra rẻ bằng HEAD (ETag/Last-Modified/Content-Length) xem nguồn điểm chuẩn,
+điểm thi có dữ liệu mới không; chỉ bảng thuộc nguồn thay đổi mới cần thu thập lại
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+import requests
+
+from http_cache import CachedSession
+
+logger = logging.getLogger(__name__)
+
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Content-Length')
+
+# Bảng -> các bảng/kết quả dẫn xuất phải dựng lại khi bảng đó đổi
+DERIVED_TABLES = {
+    'to_hop_mon': ('pho_diem', 'score_cube'),
+    'diem_thi': ('pho_diem', 'score_cube'),
+}
+
+
+def expand_changes(tables):
+    """Thêm các bảng dẫn xuất phụ thuộc vào những bảng đã thay đổi"""
+    expanded = list(tables)
+    for table in tables:
+        for derived in DERIVED_TABLES.get(table, ()):
+            if derived not in expanded:
+                expanded.append(derived)
+    return expanded
+
+
+class SourceWatcher:
+    """
+    Theo dõi các URL nguồn của từng bảng
+    sources: {bảng: [url, ...]}; trạng thái validator lần trước lưu ở state_path
+    """
+
+    def __init__(self, session, sources, state_path="data/source_state.json", timeout=30):
+        self.session = session
+        self.sources = sources
+        self.state_path = state_path
+        self.timeout = timeout
+        self.state = self._load_state()
+        self._pending = {}
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def fingerprint(self, url):
+        """
+        Dấu vân tay hiện tại của một URL: validator từ HEAD;
+        server không trả validator thì dùng hash nội dung: GET tải lại toàn bộ trang, bỏ qua
+        bản cache còn hạn (nếu không thay đổi sẽ bị che tới hết TTL); nội dung mới được ghi vào
+        cache nên lần thu thập ngay sau đó không phải tải lại
+        """
+        response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+        response.raise_for_status()
+
+        validators = {h: response.headers[h] for h in VALIDATOR_HEADERS if h in response.headers}
+        if 'ETag' in validators or 'Last-Modified' in validators:
+            return validators
+
+        options = {'refresh': True} if isinstance(self.session, CachedSession) else {}
+        response = self.session.get(url, timeout=self.timeout, **options)
+        response.raise_for_status()
+        return {'sha256': hashlib.sha256(response.content).hexdigest()}
+
+    def poll(self):
+        """
+        Kiểm tra mọi nguồn, trả về danh sách bảng có nguồn thay đổi
+        Nguồn lỗi mạng được coi là chưa đổi (thử lại ở chu kỳ sau).
+        Trạng thái mới chỉ được ghi nhận khi gọi commit() sau khi thu thập thành công.
+        """
+        changed = []
+        self._pending = {}
+        for table, urls in self.sources.items():
+            for url in urls:
+                try:
+                    current = self.fingerprint(url)
+                except requests.RequestException as e:
+                    logger.warning(f"Không kiểm tra được {url}: {e}")
+                    continue
+
+                if self.state.get(url) != current:
+                    logger.info(f"Nguồn {url} ({table}) có thay đổi")
+                    self._pending[url] = current
+                    if table not in changed:
+                        changed.append(table)
+
+        return changed
+
+    def commit(self):
+        """Ghi nhận dấu vân tay của các nguồn đã thu thập xong"""
+        if self._pending:
+            self.state.update(self._pending)
+            self._pending = {}
+            self._save_state()
@@ -0,0 +1,194 @@
+"""
+Module Lược đồ Hình sao (Star Schema)
+Tách các cột chuỗi lặp lại của bảng lớn (trường, ngành, tổ hợp, tỉnh/vùng, ngày cập nhật...)
+thành bảng chiều có khóa số nguyên; bảng sự kiện chỉ giữ số và khóa. Một VIEW cùng tên
+bảng gốc ghép lại các cột cũ để câu lệnh SQL hiện có vẫn chạy, còn load_data đọc thẳng
+mã khóa thành pandas Categorical
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bảng -> {chiều: các cột thuộc chiều đó}; các cột chuỗi khác tự thành chiều một cột
+STAR_TABLES = {
+    'diem_chuan': {
+        'truong': ('truong',),
+        'nganh': ('nganh',),
+        'to_hop': ('ma_to_hop',),
+        'tinh': ('ma_tinh', 'tinh', 'vung_mien'),
+    },
+}
+
+FACT_SUFFIX = '_fact'
+META_TABLE = 'star_columns'
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def fact_table(table):
+    return table + FACT_SUFFIX
+
+
+def dim_table(dimension):
+    return f"dim_{dimension}"
+
+
+def _object_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def is_star(conn, table):
+    """Bảng đã được lưu dạng hình sao (có bảng sự kiện và mô tả cột)"""
+    return (_object_type(conn, fact_table(table)) == 'table'
+            and _object_type(conn, META_TABLE) == 'table')
+
+
+def dimensions_for(df, table):
+    """Các chiều áp dụng cho DataFrame: chiều khai báo (cột có mặt) + mỗi cột chuỗi còn lại"""
+    dims = {}
+    for name, cols in STAR_TABLES.get(table, {}).items():
+        present = tuple(col for col in cols if col in df.columns)
+        if present:
+            dims[name] = present
+
+    covered = {col for cols in dims.values() for col in cols}
+    for col in df.columns:
+        if col not in covered and not pd.api.types.is_numeric_dtype(df[col]) \
+                and not pd.api.types.is_bool_dtype(df[col]):
+            dims[col] = (col,)
+    return dims
+
+
+def _encode_dimension(conn, name, cols, values):
+    """
+    Gán khóa cho các giá trị của một chiều; bảng chiều chỉ được thêm dòng mới
+    nên khóa cũ giữ nguyên giữa các lần lưu. Trả về mảng khóa (NaN cho dòng rỗng)
+    """
+    table = dim_table(name)
+    values = values.astype(object).where(values.notna(), None)
+
+    if _object_type(conn, table) == 'table':
+        existing = pd.read_sql_query(f"SELECT * FROM {_quote(table)}", conn)
+        missing = [col for col in cols if col not in existing.columns]
+        for col in missing:
+            conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)} TEXT")
+            existing[col] = None
+        existing = existing[['id', *cols]]
+    else:
+        existing = pd.DataFrame({'id': pd.Series(dtype='int64'), **{col: pd.Series(dtype=object) for col in cols}})
+
+    existing[list(cols)] = existing[list(cols)].astype(object).where(existing[list(cols)].notna(), None)
+
+    unique = values.drop_duplicates()
+    unique = unique[unique.notna().any(axis=1)]
+    known = unique.merge(existing, on=list(cols), how='left')
+    new = known[known['id'].isna()].drop(columns='id')
+    if len(new):
+        start = int(existing['id'].max()) + 1 if len(existing) else 0
+        new = new.assign(id=np.arange(start, start + len(new)))[['id', *cols]]
+        new.to_sql(table, conn, if_exists='append', index=False,
+                   dtype={'id': 'INTEGER PRIMARY KEY', **{col: 'TEXT' for col in cols}})
+        existing = pd.concat([existing, new], ignore_index=True)
+
+    keys = values.merge(existing, on=list(cols), how='left')['id']
+    return keys.astype('Int64').to_numpy()
+
+
+def save_star(conn, df, table):
+    """
+    Lưu DataFrame dạng hình sao: bảng chiều dim_*, bảng sự kiện <bảng>_fact (thay thế)
+    và VIEW <bảng> trả về đúng các cột ban đầu
+    """
+    dims = dimensions_for(df, table)
+    fact = fact_table(table)
+
+    fact_df = pd.DataFrame(index=df.index)
+    meta_rows = []
+    dim_of = {col: name for name, cols in dims.items() for col in cols}
+    for position, col in enumerate(df.columns):
+        meta_rows.append({'bang': table, 'cot': col, 'chieu': dim_of.get(col), 'vi_tri': position})
+        if col not in dim_of:
+            fact_df[col] = df[col].to_numpy()
+    for name, cols in dims.items():
+        fact_df[f"{name}_id"] = _encode_dimension(conn, name, cols, df[list(cols)].reset_index(drop=True))
+
+    # Bảng cũ cùng tên (trước khi chuẩn hóa) nhường chỗ cho VIEW
+    kind = _object_type(conn, table)
+    if kind == 'view':
+        conn.execute(f"DROP VIEW {_quote(table)}")
+    elif kind == 'table':
+        conn.execute(f"DROP TABLE {_quote(table)}")
+
+    fact_df.to_sql(fact, conn, if_exists='replace', index=False)
+
+    # Planner bỏ qua VIEW khi tạo index nên index các khóa chiều mà planner nhóm theo
+    # được tạo ngay trên bảng sự kiện
+    from query_planner import ANALYSIS_AGGREGATES
+
+    grouped = {col for specs in ANALYSIS_AGGREGATES.values()
+               for source, group_by, _ in specs if source == table for col in group_by}
+    for name in [name for name, cols in dims.items() if grouped & set(cols)]:
+        key = f"{name}_id"
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{fact}_{key}')} "
+                     f"ON {_quote(fact)} ({_quote(key)})")
+
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (bang TEXT, cot TEXT, chieu TEXT, vi_tri INTEGER)")
+    conn.execute(f"DELETE FROM {META_TABLE} WHERE bang = ?", (table,))
+    conn.executemany(f"INSERT INTO {META_TABLE} VALUES (?, ?, ?, ?)",
+                     [(r['bang'], r['cot'], r['chieu'], r['vi_tri']) for r in meta_rows])
+
+    select = [f"d_{dim_of[col]}.{_quote(col)}" if col in dim_of else f"f.{_quote(col)}" for col in df.columns]
+    joins = [f"LEFT JOIN {_quote(dim_table(name))} AS d_{name} ON d_{name}.id = f.{_quote(name + '_id')}"
+             for name in dims]
+    conn.execute(f"CREATE VIEW {_quote(table)} AS SELECT {', '.join(select)} "
+                 f"FROM {_quote(fact)} AS f {' '.join(joins)}")
+    conn.commit()
+
+    logger.info(f"Đã lưu {table} dạng hình sao: {len(fact_df)} dòng sự kiện, {len(dims)} chiều")
+
+
+def read_star(conn, table, columns=None):
+    """
+    Đọc bảng hình sao thành DataFrame, cột chiều là Categorical dựng thẳng từ khóa
+    (Categorical.from_codes), không ghép chuỗi trong SQL
+    """
+    meta = pd.read_sql_query(
+        f"SELECT cot, chieu FROM {META_TABLE} WHERE bang = ? ORDER BY vi_tri", conn, params=(table,))
+    if columns is not None:
+        meta = meta[meta['cot'].isin(columns)]
+
+    fact = pd.read_sql_query(f"SELECT * FROM {_quote(fact_table(table))}", conn)
+    dims = {}
+    result = {}
+    for col, name in zip(meta['cot'], meta['chieu']):
+        if pd.isna(name):
+            result[col] = fact[col]
+            continue
+
+        if name not in dims:
+            dims[name] = pd.read_sql_query(f"SELECT * FROM {_quote(dim_table(name))}", conn)
+        dim = dims[name]
+
+        # Khóa chiều -> mã Categorical (danh mục sắp xếp để groupby ra cùng thứ tự như chuỗi)
+        codes_in_dim, categories = pd.factorize(dim[col], sort=True)
+        # Ô cuối luôn là -1 để khóa NULL (điền -1) ra NaN
+        lookup = np.full(int(dim['id'].max()) + 2 if len(dim) else 1, -1, dtype=np.int64)
+        lookup[dim['id'].to_numpy()] = codes_in_dim
+        keys = fact[f"{name}_id"].fillna(-1).to_numpy(dtype=np.int64)
+        result[col] = pd.Categorical.from_codes(lookup[keys], categories=categories)
+
+    return pd.DataFrame(result)
+
+
+def read_table(conn, table):
+    """Đọc một bảng bất kỳ: bảng hình sao qua read_star, bảng thường bằng SELECT *"""
+    if is_star(conn, table):
+        return read_star(conn, table)
+    return pd.read_sql_query(f"SELECT * FROM {_quote(table)}", conn)
@@ -0,0 +1,246 @@
+"""
+Module So sánh Kết quả giữa hai Lần chạy
+Ghép dòng của hai phiên bản một bảng theo cột khóa bằng hash join (băm khóa một lần,
+tra chỉ mục hash), so các cột số theo sai số cho phép bằng phép toán mảng và tóm tắt
+dòng thêm/xóa/sửa cho từng bảng; dùng để xem thay đổi sau mỗi lần chạy hoặc làm
+kiểm tra hồi quy so với baseline khi nâng cấp pipeline
+"""
+
+import os
+import json
+import shutil
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bảng -> cột khóa; bảng không khai báo dùng các cột không phải số làm khóa
+TABLE_KEYS = {
+    'to_hop_popularity': ('ma_to_hop',),
+    'trend_analysis': ('ma_to_hop',),
+    'regional_t_test': ('ma_to_hop',),
+    'difficulty_ranking': ('ma_to_hop',),
+    'cluster_analysis': ('ma_to_hop',),
+    'combo_difficulty': ('combo',),
+    'diem_chuan_trends': ('nam', 'ma_to_hop'),
+    'regional_stats': ('vung_mien', 'ma_to_hop'),
+    'admission_reach': ('nam', 'truong', 'nganh', 'ma_to_hop'),
+    'score_drift': ('nam_truoc', 'nam_sau', 'dia_ban', 'ma_to_hop', 'mon'),
+    'score_drift_top': ('nam_truoc', 'nam_sau', 'dia_ban', 'ma_to_hop', 'mon'),
+    'subject_difficulty_by_province': ('nam', 'ma_tinh', 'mon'),
+    'combo_pairwise_tests': ('to_hop_1', 'to_hop_2'),
+    'combo_pairwise_tests_by_province': ('ma_tinh', 'to_hop_1', 'to_hop_2'),
+    'combo_scan': ('mon_1', 'mon_2', 'mon_3', 'bien_the'),
+    'cutoff_forecast': ('truong', 'nganh', 'ma_to_hop'),
+    'cutoff_backtest': ('pham_vi', 'nam_du_bao', 'mo_hinh'),
+}
+
+RTOL = 1e-9
+ATOL = 1e-9
+
+# Số dòng chi tiết tối đa mỗi bảng (dòng chênh lệch lớn nhất trước)
+MAX_DETAILS = 1000
+
+
+def table_names(root):
+    """Tên các bảng trong thư mục kết quả (bỏ đuôi định dạng)"""
+    from output_sink import TABLE_FORMATS
+
+    if not os.path.isdir(root):
+        return []
+    names = set()
+    for file_name in os.listdir(root):
+        for ext, _ in TABLE_FORMATS.values():
+            if file_name.endswith(ext):
+                names.add(file_name[:-len(ext)])
+    return sorted(names)
+
+
+def key_columns(df, table):
+    """Cột khóa của bảng: khai báo trong TABLE_KEYS hoặc mọi cột không phải số"""
+    declared = [col for col in TABLE_KEYS.get(table, ()) if col in df.columns]
+    if declared:
+        return declared
+    return [col for col in df.columns
+            if not pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])]
+
+
+def _key_hash(frame):
+    """Hash uint64 của khóa từng dòng; khóa trùng được phân biệt bằng thứ tự xuất hiện"""
+    if frame.columns.empty:
+        frame = pd.DataFrame({'_thu_tu': np.arange(len(frame))})
+    else:
+        # Số về float64 để 2020 và 2020.0 cho cùng hash giữa hai lần đọc
+        frame = pd.DataFrame({col: frame[col].astype(np.float64) if _numeric(frame[col]) else frame[col]
+                              for col in frame.columns})
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    if pd.Index(hashes).has_duplicates:
+        frame = frame.assign(_thu_tu=pd.Series(hashes).groupby(hashes).cumcount().to_numpy())
+        hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashes
+
+
+def _numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def diff_tables(old, new, table, rtol=RTOL, atol=ATOL, max_details=MAX_DETAILS):
+    """
+    So sánh hai phiên bản của một bảng
+    Trả về (tóm tắt dict, DataFrame chi tiết các ô thay đổi: khoa, cot, cu, moi, chenh_lech)
+    """
+    keys = [col for col in key_columns(new, table) if col in old.columns]
+    old_hash = _key_hash(old[keys])
+    new_hash = _key_hash(new[keys])
+
+    # Hash join: vị trí dòng cũ có cùng khóa với từng dòng mới (-1: dòng thêm)
+    position = pd.Index(old_hash).get_indexer(new_hash)
+    matched = position >= 0
+    deleted = ~np.isin(old_hash, new_hash)
+    old_rows = position[matched]
+
+    common = [col for col in new.columns if col in old.columns and col not in keys]
+    row_changed = np.zeros(int(matched.sum()), dtype=bool)
+    column_counts = {}
+    max_delta = 0.0
+    details = []
+
+    for col in common:
+        a, b = old[col].to_numpy()[old_rows], new[col].to_numpy()[matched]
+        if _numeric(old[col]) and _numeric(new[col]):
+            a, b = a.astype(np.float64), b.astype(np.float64)
+            both_nan = np.isnan(a) & np.isnan(b)
+            changed = ~(np.isclose(a, b, rtol=rtol, atol=atol) | both_nan)
+            delta = b - a
+        else:
+            a_missing, b_missing = pd.isna(a), pd.isna(b)
+            changed = (a_missing != b_missing) | (~a_missing & (a.astype(str) != b.astype(str)))
+            delta = np.full(len(a), np.nan)
+
+        n_changed = int(changed.sum())
+        if not n_changed:
+            continue
+        row_changed |= changed
+        column_counts[col] = n_changed
+        col_delta = np.abs(delta[changed])
+        if np.isfinite(col_delta).any():
+            max_delta = max(max_delta, float(np.nanmax(col_delta)))
+        details.append(pd.DataFrame({
+            'dong': np.flatnonzero(matched)[changed], 'cot': col,
+            'cu': a[changed], 'moi': b[changed], 'chenh_lech': delta[changed]
+        }))
+
+    summary = {
+        'bang': table,
+        'khoa': ','.join(keys),
+        'so_dong_cu': len(old),
+        'so_dong_moi': len(new),
+        'them': int((~matched).sum()),
+        'xoa': int(deleted.sum()),
+        'sua': int(row_changed.sum()),
+        'cot_thay_doi': json.dumps(column_counts, ensure_ascii=False) if column_counts else '',
+        'chenh_lech_lon_nhat': max_delta if column_counts else np.nan,
+        'cot_them': ','.join(col for col in new.columns if col not in old.columns),
+        'cot_bo': ','.join(col for col in old.columns if col not in new.columns),
+    }
+    summary['giong_nhau'] = not (summary['them'] or summary['xoa'] or summary['sua']
+                                 or summary['cot_them'] or summary['cot_bo'])
+
+    if details:
+        details = pd.concat(details, ignore_index=True)
+        # Chỉ giữ các ô chênh lệch lớn nhất, khóa JSON chỉ dựng cho các dòng được giữ
+        order = np.argsort(-np.nan_to_num(np.abs(details['chenh_lech'].to_numpy(dtype=np.float64)), nan=np.inf),
+                           kind='stable')
+        details = details.iloc[order[:max_details]].reset_index(drop=True)
+        key_frame = new[keys].iloc[details['dong']]
+        records = key_frame.astype(object).where(key_frame.notna(), None).to_dict(orient='records')
+        details.insert(0, 'khoa', [json.dumps(r, ensure_ascii=False, default=str) for r in records])
+        details.insert(0, 'bang', table)
+        details = details.drop(columns='dong')
+    else:
+        details = pd.DataFrame(columns=['bang', 'khoa', 'cot', 'cu', 'moi', 'chenh_lech'])
+
+    return summary, details
+
+
+def diff_runs(old_root, new_root, rtol=RTOL, atol=ATOL, max_details=MAX_DETAILS):
+    """
+    So sánh mọi bảng của hai thư mục kết quả (bảng chỉ có ở một bên được báo thêm/xóa cả bảng)
+    Trả về (DataFrame tóm tắt mỗi bảng một dòng, DataFrame chi tiết)
+    """
+    from output_sink import read_table
+
+    old_names, new_names = set(table_names(old_root)), set(table_names(new_root))
+    summaries, details = [], []
+
+    for table in sorted(old_names | new_names):
+        if table not in new_names or table not in old_names:
+            present = read_table(new_root if table in new_names else old_root, table)
+            summaries.append({
+                'bang': table, 'so_dong_cu': len(present) if table in old_names else 0,
+                'so_dong_moi': len(present) if table in new_names else 0,
+                'them': len(present) if table in new_names else 0,
+                'xoa': len(present) if table in old_names else 0,
+                'sua': 0, 'giong_nhau': False,
+                'trang_thai': 'bảng mới' if table in new_names else 'bảng bị xóa'
+            })
+            continue
+
+        summary, detail = diff_tables(read_table(old_root, table), read_table(new_root, table), table,
+                                      rtol=rtol, atol=atol, max_details=max_details)
+        summary['trang_thai'] = 'giống nhau' if summary['giong_nhau'] else 'thay đổi'
+        summaries.append(summary)
+        details.append(detail)
+        logger.info(f"  - {table}: +{summary['them']} -{summary['xoa']} ~{summary['sua']}")
+
+    summary = pd.DataFrame(summaries)
+    details = pd.concat(details, ignore_index=True) if details else pd.DataFrame()
+    return summary, details
+
+
+def save_baseline(root, baseline_root):
+    """
+    Chép các bảng kết quả hiện tại làm baseline (thay baseline cũ)
+    Chép vào thư mục tạm cạnh baseline rồi đổi tên, nên lỗi giữa chừng không làm mất baseline cũ;
+    ValueError nếu baseline trùng hoặc chứa thư mục kết quả (xóa baseline cũ sẽ xóa luôn bảng cần chép)
+    """
+    import tempfile
+    from output_sink import find_table
+
+    source = os.path.realpath(root)
+    target = os.path.realpath(baseline_root)
+    if source == target or source.startswith(target.rstrip(os.sep) + os.sep):
+        raise ValueError(f"Baseline {baseline_root} trùng hoặc chứa thư mục kết quả {root}")
+
+    names = table_names(root)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.baseline_', dir=parent)
+    try:
+        for name in names:
+            path = find_table(root, name)
+            shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # os.replace không ghi đè được thư mục khác rỗng: dời baseline cũ ra chỗ khác trước
+    old = None
+    if os.path.isdir(target):
+        old = tempfile.mkdtemp(prefix='.baseline_cu_', dir=parent)
+        os.replace(target, os.path.join(old, 'baseline'))
+    try:
+        os.replace(staging, target)
+    except OSError:
+        if old is not None:
+            os.replace(os.path.join(old, 'baseline'), target)
+            os.rmdir(old)
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if old is not None:
+        shutil.rmtree(old)
+
+    logger.info(f"Đã lưu {len(names)} bảng từ {root} làm baseline {baseline_root}")
+    return names
@@ -0,0 +1,6 @@
+"""Cấu hình pytest: các module nằm phẳng trong src/"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
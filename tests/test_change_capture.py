@@ -0,0 +1,104 @@
+"""Kiểm thử ghi nhận thay đổi khi lưu database (change_capture + THPTDataScraper.save_to_database)"""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import star_schema
+from change_capture import capture_changes
+from data_scraper import THPTDataScraper
+from db_backup import DatabaseBackup
+
+
+def _diem_chuan(diem):
+    return pd.DataFrame({
+        'nam': [2024, 2024],
+        'truong': ['Đại học Bách khoa Hà Nội', 'Đại học Kinh tế Quốc dân'],
+        'nganh': ['Công nghệ thông tin', 'Kinh tế'],
+        'ma_to_hop': ['A00', 'D01'],
+        'diem_chuan': diem,
+        'ngay_cap_nhat': ['2024-08-01', '2024-08-01'],
+    })
+
+
+def _read(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn)
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = {
+        'http_cache': {'enabled': False},
+        'database': {'backup_enabled': True, 'backup_path': str(tmp_path / 'backups')},
+    }
+    return THPTDataScraper(config=config)
+
+
+def test_failed_write_is_retried(scraper, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'thpt.db')
+    scraper.save_to_database(_diem_chuan([20.0, 21.0]), 'diem_chuan', db_path)
+    hashes_before = _read(db_path, "SELECT * FROM row_hashes ORDER BY khoa_hash")
+    runs_before = len(_read(db_path, "SELECT * FROM change_runs"))
+
+    def broken_save_star(conn, df, table):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(star_schema, 'save_star', broken_save_star)
+    with pytest.raises(sqlite3.OperationalError):
+        scraper.save_to_database(_diem_chuan([25.0, 26.0]), 'diem_chuan', db_path)
+
+    # Ghi lỗi: hash, change_runs và change_log giữ nguyên như trước lần ghi
+    pd.testing.assert_frame_equal(_read(db_path, "SELECT * FROM row_hashes ORDER BY khoa_hash"), hashes_before)
+    assert len(_read(db_path, "SELECT * FROM change_runs")) == runs_before
+    assert (_read(db_path, "SELECT loai FROM change_log")['loai'] == 'them').all()
+
+    monkeypatch.undo()
+    counts = scraper.save_to_database(_diem_chuan([25.0, 26.0]), 'diem_chuan', db_path)
+
+    assert (counts['so_them'], counts['so_sua'], counts['so_xoa']) == (0, 2, 0)
+    saved = _read(db_path, "SELECT diem_chuan FROM diem_chuan ORDER BY diem_chuan")
+    assert saved['diem_chuan'].tolist() == [25.0, 26.0]
+    log = _read(db_path, "SELECT loai FROM change_log WHERE lan_chay = (SELECT MAX(lan_chay) FROM change_runs)")
+    assert log['loai'].tolist() == ['sua', 'sua']
+
+
+def test_snapshot_taken_before_hashes_change(scraper, tmp_path):
+    db_path = str(tmp_path / 'thpt.db')
+    scraper.save_to_database(_diem_chuan([20.0, 21.0]), 'diem_chuan', db_path)
+    scraper._snapshotted = set()
+    scraper.save_to_database(_diem_chuan([25.0, 26.0]), 'diem_chuan', db_path)
+
+    snapshot = DatabaseBackup(db_path=db_path, backup_dir=str(tmp_path / 'backups')).snapshots()[-1]
+    restored = _read(snapshot, "SELECT diem_chuan FROM diem_chuan ORDER BY diem_chuan")
+    assert restored['diem_chuan'].tolist() == [20.0, 21.0]
+
+    # Hash trong snapshot khớp bảng trong snapshot: lần ghi sau khi khôi phục vẫn thấy thay đổi
+    conn = sqlite3.connect(snapshot)
+    try:
+        _, counts, _ = capture_changes(conn, _diem_chuan([25.0, 26.0]), 'diem_chuan')
+    finally:
+        conn.close()
+    assert counts['so_sua'] == 2
+
+
+def test_program_combos_are_separate_rows(scraper, tmp_path):
+    db_path = str(tmp_path / 'thpt.db')
+    both = pd.DataFrame({
+        'nam': [2024, 2024],
+        'truong': ['Đại học Bách khoa Hà Nội'] * 2,
+        'nganh': ['Công nghệ thông tin'] * 2,
+        'ma_to_hop': ['A00', 'A01'],
+        'diem_chuan': [28.5, 28.0],
+        'ngay_cap_nhat': ['2024-08-01'] * 2,
+    })
+    scraper.save_to_database(both, 'diem_chuan', db_path)
+
+    # Bỏ tổ hợp A00: chỉ một dòng bị xóa, dòng A01 không bị coi là sửa dòng A00
+    counts = scraper.save_to_database(both.iloc[1:].reset_index(drop=True), 'diem_chuan', db_path)
+    assert (counts['so_them'], counts['so_sua'], counts['so_xoa']) == (0, 0, 1)
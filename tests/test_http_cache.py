@@ -0,0 +1,35 @@
+"""Kiểm thử cache HTTP của scraper (http_cache) với máy chủ nguồn giả lập"""
+
+from fake_source import FakeSourceServer
+from http_cache import HTTPCache, CachedSession
+
+
+def test_params_are_part_of_cache_key(tmp_path):
+    session = CachedSession(HTTPCache(path=str(tmp_path / 'cache.db')))
+    with FakeSourceServer('nhanh') as server:
+        url = f"{server.url}/tra-cuu"
+        first = session.get(url, params={'sbd': '1000001', 'nam': '2024'})
+        second = session.get(url, params={'sbd': '1000002', 'nam': '2024'})
+        again = session.get(url, params={'sbd': '1000001', 'nam': '2024'})
+        same_url = session.get(server.lookup_url(1000001))
+
+    assert '1000001' in first.text and '1000002' in second.text
+    assert second.text != first.text
+    assert again.from_cache and again.text == first.text
+    assert same_url.from_cache and same_url.text == first.text
+    assert session.stats['misses'] == 2
+
+
+def test_refresh_bypasses_fresh_entry_and_updates_cache(tmp_path):
+    session = CachedSession(HTTPCache(path=str(tmp_path / 'cache.db')))
+    with FakeSourceServer('nhanh') as server:
+        url = server.cutoff_url(2024, 'BKA')
+        old = session.get(url)
+        server.seed = 1
+        cached = session.get(url)
+        refreshed = session.get(url, refresh=True)
+        after = session.get(url)
+
+    assert cached.from_cache and cached.text == old.text
+    assert not refreshed.from_cache and refreshed.text != old.text
+    assert after.from_cache and after.text == refreshed.text
@@ -0,0 +1,63 @@
+"""Kiểm thử thu thập tăng dần (THPTDataScraper.ingest)"""
+
+import sqlite3
+import time
+
+import pandas as pd
+import pytest
+
+from data_scraper import THPTDataScraper
+from fake_source import FakeSourceServer
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return THPTDataScraper(config={'http_cache': {'enabled': False}})
+
+
+def test_pho_diem_only_uses_requested_years(scraper, tmp_path):
+    db_path = str(tmp_path / 'thpt.db')
+    store_path = str(tmp_path / 'store')
+    cube_path = str(tmp_path / 'cube')
+
+    # Năm cũ còn trong kho từ lần thu thập trước
+    scraper.save_to_score_store(scraper.scrape_diem_thi_sample((2020, 2020), so_thi_sinh=2000), store_path)
+
+    scraper.ingest(['to_hop_mon', 'diem_thi', 'pho_diem'], (2023, 2024), db_path=db_path,
+                   store_path=store_path, cube_path=cube_path)
+
+    conn = sqlite3.connect(db_path)
+    years = pd.read_sql_query("SELECT DISTINCT nam FROM pho_diem ORDER BY nam", conn)['nam'].tolist()
+    conn.close()
+    assert years == [2023, 2024]
+    assert not (tmp_path / 'data' / 'score_store').exists()
+
+
+def test_articles_from_configured_sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FakeSourceServer('nhanh') as server:
+        sources = {'secondary': {'bao_1': server.article_url(1), 'bao_2': server.article_url(2)},
+                   'primary': {'bgddt': server.cutoff_url(2024, 'BKA')}}
+        scraper = THPTDataScraper(config={'http_cache': {'enabled': False}, 'data_sources': sources})
+        data = scraper.ingest(['bai_viet'])
+
+    articles = pd.read_csv(tmp_path / 'data' / 'raw' / 'bai_viet.csv')
+    assert len(articles) == len(data['bai_viet']) == 2
+    assert {'tieu_de', 'noi_dung'} <= set(articles.columns)
+    assert len(pd.read_csv(tmp_path / 'data' / 'raw' / 'diem_chuan_trang.csv'))
+
+
+def test_ingest_waits_for_previous_background_writes(scraper, tmp_path, monkeypatch):
+    saved = []
+
+    def slow_save(df, filename, folder="data/raw"):
+        time.sleep(0.2)
+        saved.append(filename)
+
+    monkeypatch.setattr(scraper, 'save_to_csv', slow_save)
+    scraper.ingest(['diem_chuan'], db_path=str(tmp_path / 'thpt.db'), background=True)
+    scraper.ingest([], db_path=str(tmp_path / 'thpt.db'))
+
+    assert saved == ['diem_chuan.csv']
+    assert scraper.changes == {}
@@ -0,0 +1,38 @@
+"""Kiểm thử đọc bảng điểm chuẩn (page_parser)"""
+
+from page_parser import _map_headers, parse_cutoff_tables
+
+MINISTRY_HEADERS = ['STT', 'Mã trường', 'Tên trường', 'Mã ngành', 'Tên ngành', 'Tổ hợp môn', 'Điểm chuẩn',
+                    'Ghi chú']
+
+
+def test_map_headers_ministry_layout():
+    assert _map_headers(MINISTRY_HEADERS) == {
+        2: 'truong', 3: 'ma_nganh', 4: 'nganh', 5: 'ma_to_hop', 6: 'diem_chuan'
+    }
+
+
+def test_map_headers_prefers_specific_alias_regardless_of_order():
+    assert _map_headers(['Trường', 'Ngành', 'Điểm chuẩn'])[0] == 'truong'
+    mapping = _map_headers(['Tên trường', 'Mã ngành', 'Ngành', 'Điểm', 'Chỉ tiêu'])
+    assert mapping == {0: 'truong', 1: 'ma_nganh', 2: 'nganh', 3: 'diem_chuan', 4: 'chi_tieu'}
+
+
+def test_map_headers_rejects_non_cutoff_tables():
+    assert _map_headers(['Môn', 'Điểm']) is None
+    assert _map_headers(['Tên trường', 'Địa chỉ', 'Điện thoại']) is None
+
+
+def test_parse_ministry_table_keeps_school_name():
+    header = ''.join(f'<th>{cell}</th>' for cell in MINISTRY_HEADERS)
+    html = ("<table><caption>Điểm chuẩn năm 2024</caption>"
+            f"<tr>{header}</tr>"
+            "<tr><td>1</td><td>BKA</td><td>Đại học Bách khoa Hà Nội</td><td>7480201</td>"
+            "<td>Công nghệ thông tin</td><td>A00, A01</td><td>28,53</td><td></td></tr></table>")
+
+    rows = parse_cutoff_tables(html, 'https://moet.gov.vn/diem-chuan')
+
+    assert [row['ma_to_hop'] for row in rows] == ['A00', 'A01']
+    assert all(row['truong'] == 'Đại học Bách khoa Hà Nội' for row in rows)
+    assert rows[0]['ma_nganh'] == '7480201' and rows[0]['nganh'] == 'Công nghệ thông tin'
+    assert rows[0]['diem_chuan'] == 28.53 and rows[0]['nam'] == 2024
@@ -0,0 +1,66 @@
+"""Kiểm thử tính tổng hợp: trong bộ nhớ, push-down và chia phân đoạn phải cho cùng kết quả"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_analyzer import THPTDataAnalyzer
+from data_scraper import THPTDataScraper
+from query_planner import exact_sum, merge_moments, moments_to_stats
+
+
+@pytest.fixture(scope='module')
+def workdir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('planner')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(path)
+        scraper = THPTDataScraper(config={'http_cache': {'enabled': False}})
+        scraper.ingest(['to_hop_mon', 'diem_chuan', 'diem_thi', 'pho_diem'], (2021, 2024),
+                       db_path=str(path / 'thpt.db'), store_path=str(path / 'store'),
+                       cube_path=str(path / 'cube'))
+    return path
+
+
+def _analyze(workdir, monkeypatch, pushdown=False, shard_by=None):
+    monkeypatch.chdir(workdir)
+    analyzer = THPTDataAnalyzer(db_path=str(workdir / 'thpt.db'), score_store_path=str(workdir / 'store'),
+                                shard_by=shard_by, workers=1, model_path=str(workdir / 'models'))
+    analyzer.run_full_analysis(pushdown=pushdown)
+    return analyzer.tables
+
+
+def test_pushdown_and_sharded_match_in_memory(workdir, monkeypatch):
+    expected = _analyze(workdir, monkeypatch)
+    for options in ({'pushdown': True}, {'shard_by': 'nam'}, {'shard_by': 'ma_tinh'}):
+        actual = _analyze(workdir, monkeypatch, **options)
+        assert sorted(actual) == sorted(expected)
+        for name, table in expected.items():
+            # Cột khóa là Categorical khi đọc bảng hình sao vào bộ nhớ, chuỗi khi đọc từ SQL
+            pd.testing.assert_frame_equal(actual[name].reset_index(drop=True).astype(object),
+                                          table.reset_index(drop=True).astype(object),
+                                          check_exact=True, obj=f"{name} {options}")
+
+
+def test_exact_sum_does_not_depend_on_order():
+    rng = np.random.default_rng(0)
+    values = np.round(rng.uniform(15, 30, 1000), 2)
+    assert exact_sum(values) == exact_sum(values[::-1]) == exact_sum(rng.permutation(values))
+    assert exact_sum([0.1] * 10) != 1.0 and float(exact_sum([0.1] * 10)) == 1.0
+    assert exact_sum([1, 2, 3]) == 6 and isinstance(exact_sum([1, 2, 3]), int)
+    assert exact_sum([1.5, np.nan, None]) == 1.5
+
+
+def test_merged_shards_equal_single_pass():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'nhom': rng.choice(['A00', 'D01'], 500), 'diem': np.round(rng.uniform(15, 30, 500), 2)})
+
+    def moments(frame):
+        grouped = frame.groupby('nhom')['diem']
+        return pd.DataFrame({'diem_count': grouped.count(), 'diem_sum': grouped.agg(exact_sum),
+                             'diem_sumsq': grouped.agg(lambda v: exact_sum(v, square=True))})
+
+    single = moments_to_stats(moments(df), ['diem'])
+    merged = moments_to_stats(merge_moments([moments(df.iloc[i::7]) for i in range(7)]), ['diem'])
+    pd.testing.assert_frame_equal(merged, single, check_exact=True)
+    np.testing.assert_allclose(single['diem_mean'], df.groupby('nhom')['diem'].mean(), rtol=1e-15)
+    np.testing.assert_allclose(single['diem_std'], df.groupby('nhom')['diem'].std(), rtol=1e-12)
@@ -0,0 +1,35 @@
+"""Kiểm thử khối tổng hợp điểm thi (score_cube) so với kho điểm"""
+
+import numpy as np
+import pandas as pd
+
+from score_cube import ScoreCube
+from score_store import ScoreStore
+
+
+def _write(store, scores, year=2024):
+    store.write_year(pd.DataFrame({
+        'sbd': np.arange(1000001, 1000001 + len(scores), dtype=np.int64),
+        'ma_tinh': ['01'] * len(scores),
+        'Toán': scores,
+    }), year=year)
+
+
+def test_rewritten_year_makes_cube_stale(tmp_path):
+    store = ScoreStore(str(tmp_path / 'store'))
+    _write(store, [5.0, 6.0, 7.0])
+    cube = ScoreCube.build(store, {})
+    cube.save(str(tmp_path / 'cube'))
+    assert ScoreCube.load(str(tmp_path / 'cube')).is_current(store)
+
+    # Cùng số thí sinh, điểm khác
+    _write(store, [8.0, 9.0, 10.0])
+    assert not ScoreCube.load(str(tmp_path / 'cube')).is_current(store)
+
+
+def test_new_year_makes_cube_stale(tmp_path):
+    store = ScoreStore(str(tmp_path / 'store'))
+    _write(store, [5.0, 6.0, 7.0])
+    cube = ScoreCube.build(store, {})
+    _write(store, [5.0, 6.0], year=2023)
+    assert not cube.is_current(store)
@@ -0,0 +1,27 @@
+"""Kiểm thử tra cứu số báo danh trong kho điểm (score_store)"""
+
+import numpy as np
+import pandas as pd
+
+from score_store import ScoreStore
+
+
+def _year(store, sbd):
+    df = pd.DataFrame({
+        'sbd': np.asarray(sbd, dtype=np.int64),
+        'ma_tinh': ['01'] * len(sbd),
+        'Toán': np.linspace(5, 9, len(sbd)),
+    })
+    store.write_year(df, year=2024)
+    return store.open_year(2024)
+
+
+def test_row_of_finds_and_misses(tmp_path):
+    year = _year(ScoreStore(str(tmp_path)), [1000003, 1000001, 1000002])
+    assert year.row_of([1000001, 1000003, 999, 2000000]).tolist() == [0, 2, -1, -1]
+
+
+def test_row_of_empty_year(tmp_path):
+    year = _year(ScoreStore(str(tmp_path)), [])
+    assert year.row_of([1000001, 1000002]).tolist() == [-1, -1]
+    assert year.row_of(1000001) == -1
@@ -0,0 +1,62 @@
+"""Kiểm thử lưu/đọc bảng hình sao (star_schema)"""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from star_schema import dim_table, read_star, read_table, save_star
+
+
+def _diem_chuan(truong, diem):
+    return pd.DataFrame({
+        'nam': [2024] * len(truong),
+        'truong': truong,
+        'nganh': ['Kinh tế', 'Luật', 'Kinh tế'][:len(truong)],
+        'ma_to_hop': ['A00', 'D01', 'A00'][:len(truong)],
+        'diem_chuan': diem,
+        'ma_tinh': ['01', '02', '01'][:len(truong)],
+        'tinh': ['Hà Nội', 'TP. Hồ Chí Minh', 'Hà Nội'][:len(truong)],
+        'vung_mien': ['Miền Bắc', 'Miền Nam', 'Miền Bắc'][:len(truong)],
+    })
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'thpt.db'))
+    yield conn
+    conn.close()
+
+
+def _plain(df):
+    return df.astype(object).where(df.notna(), None)
+
+
+def test_roundtrip_matches_input_and_view(conn):
+    df = _diem_chuan(['Đại học Y Hà Nội', None, 'Đại học Luật'], [27.5, 24.0, np.nan])
+    save_star(conn, df, 'diem_chuan')
+
+    star = read_star(conn, 'diem_chuan')
+    assert list(star.columns) == list(df.columns)
+    assert isinstance(star['truong'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(_plain(star), _plain(df))
+
+    # VIEW cùng tên trả về đúng các cột ban đầu
+    view = pd.read_sql_query("SELECT * FROM diem_chuan", conn)
+    pd.testing.assert_frame_equal(_plain(view), _plain(df))
+    pd.testing.assert_frame_equal(_plain(read_table(conn, 'diem_chuan')), _plain(df))
+
+
+def test_dimension_keys_are_stable_across_saves(conn):
+    save_star(conn, _diem_chuan(['Đại học Y Hà Nội', 'Đại học Luật'], [27.5, 24.0]), 'diem_chuan')
+    before = pd.read_sql_query(f"SELECT * FROM {dim_table('truong')}", conn)
+
+    df = _diem_chuan(['Đại học Luật', 'Học viện Ngân hàng', 'Đại học Y Hà Nội'], [24.5, 23.0, 27.0])
+    save_star(conn, df, 'diem_chuan')
+    after = pd.read_sql_query(f"SELECT * FROM {dim_table('truong')}", conn)
+
+    pd.testing.assert_frame_equal(after.iloc[:len(before)], before)
+    assert len(after) == 3
+    pd.testing.assert_frame_equal(_plain(read_star(conn, 'diem_chuan', columns=['truong', 'diem_chuan'])),
+                                  _plain(df[['truong', 'diem_chuan']]))
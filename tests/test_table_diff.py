@@ -0,0 +1,29 @@
+"""Kiểm thử so sánh bảng kết quả giữa hai lần chạy (table_diff)"""
+
+import numpy as np
+import pandas as pd
+
+from table_diff import diff_tables
+
+
+def _trends(rows):
+    return pd.DataFrame(rows, columns=['nam', 'ma_to_hop', 'diem_tb', 'so_nganh'])
+
+
+def test_counts_added_deleted_and_modified_rows():
+    old = _trends([(2023, 'A00', 24.1, 10), (2023, 'D01', 22.0, 8), (2024, 'A00', 24.5, 11)])
+    new = _trends([(2024, 'A00', 24.5, 12), (2023, 'A00', 24.1 + 1e-12, 10), (2024, 'B00', 25.0, 4)])
+
+    summary, details = diff_tables(old, new, 'diem_chuan_trends')
+
+    assert summary['khoa'] == 'nam,ma_to_hop'
+    assert (summary['them'], summary['xoa'], summary['sua']) == (1, 1, 1)
+    assert not summary['giong_nhau']
+    assert details['cot'].tolist() == ['so_nganh']
+    assert details['chenh_lech'].tolist() == [1]
+
+
+def test_reordered_table_is_identical():
+    old = _trends([(2023, 'A00', 24.1, 10), (2023, 'D01', np.nan, 8)])
+    summary, details = diff_tables(old, old.iloc[::-1].reset_index(drop=True), 'diem_chuan_trends')
+    assert summary['giong_nhau'] and details.empty